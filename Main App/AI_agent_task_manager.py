@@ -2,26 +2,40 @@
 import streamlit as st
 import sqlite3
 import datetime
-import spacy
-from dateparser import parse as date_parse
-from openai import OpenAI
-from sentence_transformers import SentenceTransformer
-import numpy as np
-from sklearn.cluster import KMeans
 import os
 from typing import Dict, List, Optional
 import json
-import uuid
 import time
 import random
-
-# Load models
-nlp = spacy.load("en_core_web_sm")
-sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
+from collections import deque
+from model_registry import registry as model_registry
+import schema
+import queries
+import query_cache
+import db
+import analytics
+import attachments
+import embeddings
+import vector_index
+import duplicates
+import categories
+import quick_add
+import reminders
+import ranking
+import verification_log
+import profiling
 
 # Database setup
 DB_NAME = 'tasks.db'
 UPLOAD_FOLDER = 'task_documents'
+BULK_CHUNK_SIZE = 500
+SEMANTIC_CANDIDATES = 200
+SIMILAR_TASKS = 5
+FOCUS_SIZES = [5, 10, 20, ranking.TOP_N]
+PRIORITIES = list(ranking.PRIORITY_SCORES)
+REMINDER_SINK = 'file:reminders.jsonl'
+PROFILE_TOP_ROWS = 15
+DUPLICATE_THRESHOLD = duplicates.DUPLICATE_THRESHOLD
 
 quotes = [
     "“The secret of getting ahead is getting started.” – Mark Twain",
@@ -43,14 +57,23 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+@profiling.instrument
 class AITaskManager:
     """Enhanced AI-powered task management system with Streamlit UI"""
     
     def __init__(self):
         self.setup_streamlit()
         self.setup_upload_folder()
-        self.migrate_database()
-        self.create_table()
+        self.bootstrap_database()
+        self.connections = db.get_manager(DB_NAME)
+        self.query_cache = query_cache.get_cache(DB_NAME)
+        self.sweeper = attachments.get_sweeper(DB_NAME, UPLOAD_FOLDER)
+        self.embedder = embeddings.get_embedder(DB_NAME)
+        self.semantic_index = vector_index.get_index(DB_NAME)
+        self.categorizer = categories.get_categorizer(DB_NAME)
+        self.reminders = reminders.get_scheduler(DB_NAME, REMINDER_SINK)
+        # Rows seen during this rerun, by task id; the manager lives for one rerun
+        self.task_rows: Dict[int, Dict] = {}
         
     def setup_streamlit(self):
         """Configure Streamlit interface"""
@@ -115,6 +138,14 @@ class AITaskManager:
                     color: #555;
                     margin-top: 5px;
                 }
+                .search-snippet {
+                    color: #555;
+                    font-size: 0.9em;
+                }
+                .search-snippet mark, .task-card h3 mark {
+                    background-color: #fff3b0;
+                    padding: 0 2px;
+                }
                 .verification-header {
                     color: #2c3e50;
                     border-bottom: 2px solid #3498db;
@@ -129,176 +160,165 @@ class AITaskManager:
         if not os.path.exists(UPLOAD_FOLDER):
             os.makedirs(UPLOAD_FOLDER)
     
-    def create_connection(self) -> sqlite3.Connection:
-        """Create and return a database connection."""
-        return sqlite3.connect(DB_NAME)
-    
-    def migrate_database(self):
-        """Migrate existing database to new schema with verification columns"""
-        with self.create_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tasks'")
-            if not cursor.fetchone():
-                return
-            
-            cursor.execute("PRAGMA table_info(tasks)")
-            columns = [col[1] for col in cursor.fetchall()]
-            
-            # Add verification-related columns if they don't exist
-            verification_columns = {
-                'verification_comments': 'TEXT',
-                'verification_evidence_path': 'TEXT',
-                'verified_at': 'TEXT'
-            }
-            
-            for column, col_type in verification_columns.items():
-                if column not in columns:
-                    try:
-                        conn.execute(f"ALTER TABLE tasks ADD COLUMN {column} {col_type}")
-                    except sqlite3.OperationalError as e:
-                        st.warning(f"Could not add column {column}: {str(e)}")
-            
-            # Original migration logic
-            regular_columns = {
-                'title': 'TEXT',
-                'description': 'TEXT',
-                'start_date': 'TEXT',
-                'due_date': 'TEXT',
-                'priority': 'TEXT DEFAULT "Normal"',
-                'category': 'TEXT DEFAULT "Other"',
-                'status': 'TEXT DEFAULT "Pending"',
-                'document_path': 'TEXT',
-                'verification_status': 'TEXT',
-                'reminder_sent': 'INTEGER DEFAULT 0'
-            }
-            
-            for column, col_type in regular_columns.items():
-                if column not in columns:
-                    try:
-                        conn.execute(f"ALTER TABLE tasks ADD COLUMN {column} {col_type}")
-                    except sqlite3.OperationalError as e:
-                        st.warning(f"Could not add column {column}: {str(e)}")
-            
-            # Special handling for created_at column
-            if 'created_at' not in columns:
-                try:
-                    conn.execute("ALTER TABLE tasks ADD COLUMN created_at TEXT")
-                    conn.execute("UPDATE tasks SET created_at = datetime('now') WHERE created_at IS NULL")
-                    conn.execute("PRAGMA foreign_keys=off")
-                    conn.execute("BEGIN TRANSACTION")
-                    conn.execute("""
-                        CREATE TABLE tasks_new (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                            title TEXT NOT NULL,
-                            description TEXT,
-                            category TEXT,
-                            status TEXT DEFAULT 'Pending',
-                            start_date TEXT,
-                            due_date TEXT,
-                            priority TEXT DEFAULT 'Normal',
-                            document_path TEXT,
-                            verification_status TEXT,
-                            verification_comments TEXT,
-                            verification_evidence_path TEXT,
-                            verified_at TEXT,
-                            reminder_sent INTEGER DEFAULT 0
-                        )
-                    """)
-                    conn.execute("""
-                        INSERT INTO tasks_new 
-                        SELECT id, created_at, title, description, category, status, 
-                               start_date, due_date, priority, document_path, 
-                               verification_status, NULL, NULL, NULL, reminder_sent
-                        FROM tasks
-                    """)
-                    conn.execute("DROP TABLE tasks")
-                    conn.execute("ALTER TABLE tasks_new RENAME TO tasks")
-                    conn.execute("COMMIT")
-                    conn.execute("PRAGMA foreign_keys=on")
-                except sqlite3.OperationalError as e:
-                    st.warning(f"Could not add column created_at: {str(e)}")
-            
-            conn.commit()
-    
-    def create_table(self) -> None:
-        """Create the tasks table if it doesn't exist."""
-        with self.create_connection() as conn:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    category TEXT,
-                    status TEXT DEFAULT 'Pending',
-                    start_date TEXT,
-                    due_date TEXT,
-                    priority TEXT DEFAULT 'Normal',
-                    document_path TEXT,
-                    verification_status TEXT,
-                    verification_comments TEXT,
-                    verification_evidence_path TEXT,
-                    verified_at TEXT,
-                    reminder_sent INTEGER DEFAULT 0
-                );
-            ''')
-            conn.commit()
+    def bootstrap_database(self):
+        """Apply pending schema migrations (only does work once per process)"""
+        try:
+            schema.bootstrap(DB_NAME)
+        except sqlite3.Error as e:
+            st.error(f"Database migration failed: {str(e)}")
 
     def save_uploaded_file(self, uploaded_file) -> Optional[str]:
         """Save uploaded file and return its path"""
         if uploaded_file is None:
             return None
             
-        file_ext = os.path.splitext(uploaded_file.name)[1]
-        filename = f"{uuid.uuid4()}{file_ext}"
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        
         try:
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            return file_path
+            uploaded_file.seek(0)
+            return attachments.store(UPLOAD_FOLDER, uploaded_file, uploaded_file.name)
         except Exception as e:
             st.error(f"Error saving file: {str(e)}")
             return None
 
-    def add_task(self, title: str, description: str, start_date: str, due_date: str, uploaded_file=None) -> None:
-        """Add a new task with all details"""
+    def add_task(self, title: str, description: str, start_date: str, due_date: str, uploaded_file=None,
+                 document_path: Optional[str] = None, check_duplicates: bool = True,
+                 priority: str = "Normal") -> None:
+        """Add a new task with all details, unless it looks like an open task"""
         if not title.strip():
             st.warning("Please provide a task title")
             return
             
-        document_path = self.save_uploaded_file(uploaded_file)
+        if check_duplicates:
+            try:
+                matches = duplicates.find_duplicates(
+                    self.semantic_index, self.connections, title, description, DUPLICATE_THRESHOLD
+                )
+            except Exception:
+                # Without the model or numpy the check is skipped, not the task
+                matches = []
+            if matches:
+                # The upload stays in memory; it is only stored if the task is kept
+                st.session_state["pending_duplicate_task"] = {
+                    'task': dict(title=title, description=description, start_date=start_date,
+                                 due_date=due_date, uploaded_file=uploaded_file,
+                                 document_path=document_path, priority=priority),
+                    'matches': [(m['id'], m['title'], m['similarity']) for m in matches],
+                }
+                return
+
+        if document_path is None:
+            document_path = self.save_uploaded_file(uploaded_file)
         
-        with self.create_connection() as conn:
+        try:
+            task_id = self.connections.run_write(lambda conn: conn.execute('''
+                INSERT INTO tasks 
+                (title, description, start_date, due_date, document_path, priority, verification_status)
+                VALUES (?, ?, ?, ?, ?, ?, ?);
+            ''', (
+                title,
+                description,
+                start_date,
+                due_date,
+                document_path,
+                priority,
+                "Not Verified"
+            )).lastrowid)
+            self.invalidate_reads()
+            self.embedder.enqueue([task_id])
+            self.reminders.schedule([task_id])
+            st.success(f"✅ Task added")
+            
+        except sqlite3.Error as e:
+            st.error(f"Database error: {str(e)}")
+
+    def add_parsed_tasks(self, parsed: List[quick_add.ParsedTask]) -> int:
+        """Insert quick-add tasks in one transaction"""
+        def insert(conn):
+            return [conn.execute('''
+                INSERT INTO tasks
+                (title, start_date, due_date, priority, verification_status)
+                VALUES (?, ?, ?, ?, ?);
+            ''', (task.title, task.start_date, task.due_date, task.priority, "Not Verified")).lastrowid
+                for task in parsed]
+
+        try:
+            task_ids = self.connections.run_write(insert)
+        except sqlite3.Error as e:
+            st.error(f"Database error: {str(e)}")
+            return 0
+        self.invalidate_reads()
+        self.embedder.enqueue(task_ids)
+        self.reminders.schedule(task_ids)
+        return len(task_ids)
+
+    def show_quick_add(self) -> None:
+        """One line per task, dates and priority read from the text"""
+        if st.session_state.pop("clear_quick_add", False):
+            st.session_state.pop("quick_add_text", None)
+        with st.expander("⚡ Quick Add", expanded=False):
+            text = st.text_area(
+                "Tasks (one per line)",
+                placeholder="Submit audit report to finance by next Friday, high priority",
+                key="quick_add_text"
+            )
+            lines = [line for line in text.splitlines() if line.strip()]
+            if not lines:
+                return
             try:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO tasks 
-                    (title, description, start_date, due_date, document_path, verification_status)
-                    VALUES (?, ?, ?, ?, ?, ?);
-                ''', (
-                    title,
-                    description,
-                    start_date,
-                    due_date,
-                    document_path,
-                    "Not Verified"
-                ))
-                conn.commit()
-                st.success(f"✅ Task added")
-                
-            except sqlite3.Error as e:
-                st.error(f"Database error: {str(e)}")
+                parsed = quick_add.parse_lines(lines)
+            except Exception as e:
+                st.error(f"Could not parse tasks: {str(e)}")
+                return
+            st.dataframe([task.as_dict() for task in parsed], use_container_width=True)
+            if len(parsed) == 1:
+                if st.button("Add task", key="quick_add_one"):
+                    task = parsed[0]
+                    self.add_task(task.title, "", task.start_date, task.due_date, priority=task.priority)
+                    st.session_state["clear_quick_add"] = True
+                    st.rerun()
+            elif st.button(f"Add {len(parsed)} tasks", key="quick_add_many"):
+                added = self.add_parsed_tasks(parsed)
+                st.success(f"✅ {added} tasks added")
+                if added:
+                    st.session_state["clear_quick_add"] = True
+                st.rerun()
+
+    def show_duplicate_warning(self) -> None:
+        """Ask whether to keep a new task that looks like an existing open one"""
+        pending = st.session_state.get("pending_duplicate_task")
+        if not pending:
+            return
+        task = pending['task']
+        st.warning(f"⚠️ \"{task['title']}\" looks like tasks that are already open:")
+        for task_id, title, similarity in pending['matches']:
+            st.write(f"• {title} (#{task_id}, {similarity:.0%} similar)")
+        cols = st.columns(2)
+        with cols[0]:
+            if st.button("Assign anyway", key="duplicate_assign_anyway"):
+                del st.session_state["pending_duplicate_task"]
+                self.add_task(**task, check_duplicates=False)
+                st.rerun()
+        with cols[1]:
+            if st.button("Discard", key="duplicate_discard"):
+                del st.session_state["pending_duplicate_task"]
+                st.rerun()
+
+    def get_task(self, task_id: int) -> Optional[Dict]:
+        """Return a task row, reusing one already fetched during this rerun"""
+        task = self.task_rows.get(task_id)
+        if task is None:
+            task = self.query_cache.query_one(queries.SELECT_TASK_BY_ID, (task_id,))
+            if task is not None:
+                self.task_rows[task_id] = task
+        return task
+
+    def invalidate_reads(self) -> None:
+        """Drop cached query results and rows after a write"""
+        self.query_cache.invalidate()
+        self.task_rows.clear()
 
     def verify_task(self, task_id: int) -> None:
         """Enhanced verification workflow with comments and evidence"""
-        with self.create_connection() as conn:
-            conn.row_factory = sqlite3.Row
-            task = conn.execute(
-                "SELECT * FROM tasks WHERE id=?",
-                (task_id,)
-            ).fetchone()
+        task = self.get_task(task_id)
             
         if task:
             with st.expander(f"🔍 Verify Task: {task['title']}", expanded=True):
@@ -320,7 +340,7 @@ class AITaskManager:
                 # Verification options
                 verification_status = st.selectbox(
                     "Verification Outcome*",
-                    ["Verified - Approved", "Verified - Needs Revision", "Verified - Rejected"],
+                    verification_log.OUTCOMES,
                     index=0,
                     key=f"verify_status_{task_id}"
                 )
@@ -349,22 +369,11 @@ class AITaskManager:
                     if verification_evidence:
                         evidence_path = self.save_uploaded_file(verification_evidence)
                     
-                    # Update task with verification details
-                    with self.create_connection() as conn:
-                        conn.execute('''
-                            UPDATE tasks SET 
-                            verification_status=?,
-                            verification_comments=?,
-                            verification_evidence_path=?,
-                            verified_at=datetime('now')
-                            WHERE id=?
-                        ''', (
-                            verification_status,
-                            verification_comments,
-                            evidence_path,
-                            task_id
-                        ))
-                        conn.commit()
+                    # Append to the history; a trigger copies it onto the task
+                    self.connections.run_write(lambda conn: verification_log.record(
+                        conn, task_id, verification_status, verification_comments, evidence_path
+                    ))
+                    self.invalidate_reads()
                     
                     st.success("✅ Task verification submitted!")
                     st.balloons()
@@ -373,7 +382,16 @@ class AITaskManager:
 
     def visualize_tasks(self, tasks: List[Dict]) -> None:
         """Enhanced task display with verification status"""
+        # Histories of every verified card on the page, in one query
+        verified_ids = [task['id'] for task in tasks
+                        if (task.get('verification_status') or '').startswith('Verified')]
+        histories = verification_log.group_timelines(
+            self.query_cache.query(*queries.verification_timelines_query(verified_ids))
+        ) if verified_ids else {}
+
         for task in tasks:
+            # Later point lookups in this rerun (edit, verify) reuse the card's row
+            self.task_rows[task['id']] = task
             # Set default values
             task.setdefault('description', '')
             task.setdefault('start_date', '')
@@ -416,13 +434,26 @@ class AITaskManager:
                         </span>
                     """
                 
+                # Search results carry highlighted matches from the FTS index
+                title_html = task.get('title_highlight') or task['title']
+                snippet_html = ""
+                if task.get('search_snippet'):
+                    snippet_html = f"<p class='search-snippet'>…{task['search_snippet']}…</p>"
+                elif task.get('similarity') is not None:
+                    snippet_html = f"<p class='search-snippet'>Similarity: {task['similarity']:.2f}</p>"
+                elif task.get('focus') is not None:
+                    snippet_html = (f"<p class='search-snippet'>Focus score {task['focus']['score']:.1f}: "
+                                    f"{', '.join(ranking.reasons(task['focus']))}</p>")
+
                 # Main task card
                 st.markdown(f"""
                     <div class="{task_class}">
-                        <h3>{task['title']} {verification_badge}</h3>
+                        <h3>{title_html} {verification_badge}</h3>
                         <p><strong>Description:</strong> {task['description']}</p>
+                        {snippet_html}
                         <p><strong>Dates:</strong> {task['start_date']} to {task['due_date']}</p>
-                        <p><strong>Status:</strong> {task['status']}</p>
+                        <p><strong>Status:</strong> {task['status']} | <strong>Priority:</strong> {task['priority']}</p>
+                        {f"<p><strong>Category:</strong> {task['category']}</p>" if task.get('category') else ''}
                         {f'<p><a href="{task["document_path"]}" target="_blank">View Document</a></p>' if task["document_path"] else ''}
                 
                 """, unsafe_allow_html=True)
@@ -436,6 +467,16 @@ class AITaskManager:
                             st.write(f"**Comments:** {task['verification_comments']}")
                         if task['verification_evidence_path']:
                             st.markdown(f"**Evidence:** [View File]({task['verification_evidence_path']})")
+                        history = histories.get(task['id'], [])
+                        if len(history) > 1:
+                            st.markdown("**History:**")
+                            for entry in history:
+                                repeats = f" ×{entry['events']}" if entry['events'] > 1 else ""
+                                st.write(f"• {entry['first_at']}: {entry['status']}{repeats}"
+                                         + (f" — {entry['comments']}" if entry['comments'] else ""))
+
+                if st.checkbox("Show similar tasks", key=f"similar_{task['id']}"):
+                    self.show_similar_tasks(task['id'])
                 
                 # Action buttons
                 cols = st.columns(4)
@@ -452,54 +493,152 @@ class AITaskManager:
                         self.delete_task_and_file(task['id'])
                         st.rerun()
                 with cols[3]:
-                    if task['status'] == 'Completed' and task['verification_status'] in [None, 'Not Verified']:
+                    if verification_log.can_verify(task):
                         if st.button("Verify", key=f"verify_{task['id']}"):
                             st.session_state['verify_task'] = task['id']
                             st.rerun()
 
     def delete_task_and_file(self, task_id: int) -> None:
         """Delete task and its associated documents"""
-        with self.create_connection() as conn:
-            conn.row_factory = sqlite3.Row
-            task = conn.execute(
-                "SELECT document_path, verification_evidence_path FROM tasks WHERE id=?",
-                (task_id,)
-            ).fetchone()
-            
-            # Delete associated files
-            for file_path in [task['document_path'], task['verification_evidence_path']]:
-                if file_path and os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                    except Exception as e:
-                        st.error(f"Error deleting file: {str(e)}")
-            
-            try:
-                conn.execute("DELETE FROM tasks WHERE id=?", (task_id,))
-                conn.commit()
-            except sqlite3.Error as e:
-                st.error(f"Database error: {str(e)}")
+        task = self.get_task(task_id)
+        if task is None:
+            return
+        
+        def delete(conn):
+            evidence = verification_log.evidence_paths(conn, [task_id])
+            conn.execute("DELETE FROM tasks WHERE id=?", (task_id,))
+            return evidence
+
+        try:
+            evidence = self.connections.run_write(delete)
+            self.invalidate_reads()
+        except sqlite3.Error as e:
+            st.error(f"Database error: {str(e)}")
+            return
+
+        # Files may be shared with other tasks; only unreferenced ones go
+        self.release_files([task['document_path'], task['verification_evidence_path'], *evidence])
+
+    def release_files(self, file_paths: List[str]) -> None:
+        """Hand files to the background sweeper, which removes the unreferenced ones"""
+        self.sweeper.release(file_paths)
 
     def update_task_status(self, task_id: int, status: str) -> None:
         """Update task status"""
-        with self.create_connection() as conn:
-            try:
-                conn.execute(
-                    "UPDATE tasks SET status=? WHERE id=?",
-                    (status, task_id)
-                )
-                conn.commit()
-            except sqlite3.Error as e:
-                st.error(f"Database error: {str(e)}")
+        try:
+            self.connections.run_write(lambda conn: conn.execute(
+                "UPDATE tasks SET status=? WHERE id=?",
+                (status, task_id)
+            ).rowcount)
+            self.invalidate_reads()
+            if status == "Pending":
+                self.reminders.schedule([task_id])
+        except sqlite3.Error as e:
+            st.error(f"Database error: {str(e)}")
+
+    def bulk_update_status(self, task_ids: List[int], status: str) -> int:
+        """Set the status of many tasks in one transaction"""
+        params = [(status, task_id) for task_id in task_ids]
+        try:
+            updated = self.connections.run_write(
+                lambda conn: conn.executemany("UPDATE tasks SET status=? WHERE id=?", params).rowcount
+            )
+            self.invalidate_reads()
+            if status == "Pending":
+                self.reminders.schedule(task_ids)
+            return updated
+        except sqlite3.Error as e:
+            st.error(f"Database error: {str(e)}")
+            return 0
+
+    def bulk_verify(self, task_ids: List[int], verification_status: str, verification_comments: str) -> int:
+        """Record the same verification outcome for many tasks in one transaction
+
+        Tasks that can't be verified (pending, or already approved) are
+        skipped; returns how many were verified.
+        """
+        try:
+            verified = self.connections.run_write(lambda conn: verification_log.record_many(
+                conn, task_ids, verification_status, verification_comments
+            ))
+            self.invalidate_reads()
+            return verified
+        except sqlite3.Error as e:
+            st.error(f"Database error: {str(e)}")
+            return 0
+
+    def bulk_delete(self, task_ids: List[int]) -> int:
+        """Delete many tasks in one transaction, then remove their files"""
+        file_paths = []
+        with self.connections.read() as conn:
+            for start in range(0, len(task_ids), BULK_CHUNK_SIZE):
+                chunk = task_ids[start:start + BULK_CHUNK_SIZE]
+                placeholders = ", ".join("?" * len(chunk))
+                for row in conn.execute(
+                    f"SELECT document_path, verification_evidence_path FROM tasks WHERE id IN ({placeholders})",
+                    chunk
+                ):
+                    file_paths.extend(path for path in row if path)
+
+        def delete(conn):
+            # The tasks' verification history goes with them, and its evidence with it
+            file_paths.extend(verification_log.evidence_paths(conn, task_ids))
+            return conn.executemany("DELETE FROM tasks WHERE id=?", [(task_id,) for task_id in task_ids]).rowcount
+
+        try:
+            deleted = self.connections.run_write(delete)
+            self.invalidate_reads()
+        except sqlite3.Error as e:
+            st.error(f"Database error: {str(e)}")
+            return 0
+
+        # Only touch the files once the rows are gone for good
+        self.release_files(file_paths)
+        return deleted
+
+    def show_bulk_actions(self, tasks: List[Dict]) -> None:
+        """Multi-select actions applied to tasks on the current page"""
+        with st.expander("☑️ Bulk Actions", expanded=False):
+            # The outcome of the last action, kept across the rerun it triggered
+            if 'bulk_result' in st.session_state:
+                st.success(st.session_state.pop('bulk_result'))
+            titles = {task['id']: task['title'] for task in tasks}
+            select_all = st.checkbox("Select all on this page", key="bulk_select_all")
+            selected = st.multiselect(
+                "Tasks",
+                list(titles),
+                default=list(titles) if select_all else [],
+                format_func=lambda task_id: titles[task_id],
+                key=f"bulk_selected_{select_all}"
+            )
+            action = st.selectbox("Action", [
+                "Mark Completed", "Mark Pending", *verification_log.OUTCOMES, "Delete"
+            ], key="bulk_action")
+            comments = ""
+            if action.startswith("Verified"):
+                comments = st.text_area("Verification Comments*", key="bulk_verify_comments")
+
+            if st.button(f"Apply to {len(selected)} task(s)", key="bulk_apply", disabled=not selected):
+                if action.startswith("Verified") and not comments:
+                    st.error("Please provide verification comments")
+                    return
+                if action == "Mark Completed":
+                    count = self.bulk_update_status(selected, "Completed")
+                elif action == "Mark Pending":
+                    count = self.bulk_update_status(selected, "Pending")
+                elif action == "Delete":
+                    count = self.bulk_delete(selected)
+                else:
+                    count = self.bulk_verify(selected, action, comments)
+                result = f"✅ {action}: {count} task(s) updated"
+                if action.startswith("Verified") and count < len(selected):
+                    result += f", {len(selected) - count} skipped (not completed, or already approved)"
+                st.session_state['bulk_result'] = result
+                st.rerun()
 
     def edit_task(self, task_id: int) -> None:
         """Edit task details"""
-        with self.create_connection() as conn:
-            conn.row_factory = sqlite3.Row
-            task = conn.execute(
-                "SELECT * FROM tasks WHERE id=?",
-                (task_id,)
-            ).fetchone()
+        task = self.get_task(task_id)
             
         if task:
             with st.form(f"edit_{task_id}"):
@@ -513,47 +652,38 @@ class AITaskManager:
                 with col2:
                     due_date = st.date_input("Due Date", 
                         value=datetime.datetime.strptime(task['due_date'], '%Y-%m-%d').date() if task['due_date'] else datetime.date.today())
+                priority = st.selectbox("Priority", PRIORITIES,
+                    index=PRIORITIES.index(task['priority']) if task['priority'] in PRIORITIES else PRIORITIES.index("Normal"))
                 
                 submitted = st.form_submit_button("Update")
                 if submitted:
-                    with self.create_connection() as conn:
-                        try:
-                            conn.execute('''
-                                UPDATE tasks SET 
-                                title=?, description=?, start_date=?, due_date=?
-                                WHERE id=?
-                            ''', (
-                                title,
-                                description,
-                                start_date.isoformat(),
-                                due_date.isoformat(),
-                                task_id
-                            ))
-                            conn.commit()
-                            st.rerun()
-                        except sqlite3.Error as e:
-                            st.error(f"Database error: {str(e)}")
+                    try:
+                        self.connections.run_write(lambda conn: conn.execute('''
+                            UPDATE tasks SET 
+                            title=?, description=?, start_date=?, due_date=?, priority=?
+                            WHERE id=?
+                        ''', (
+                            title,
+                            description,
+                            start_date.isoformat(),
+                            due_date.isoformat(),
+                            priority,
+                            task_id
+                        )).rowcount)
+                        self.invalidate_reads()
+                        self.embedder.enqueue([task_id])
+                        self.reminders.schedule([task_id])
+                        st.rerun()
+                    except sqlite3.Error as e:
+                        st.error(f"Database error: {str(e)}")
 
     def show_verification_analytics(self):
         """Enhanced verification analytics dashboard"""
-        with self.create_connection() as conn:
-            conn.row_factory = sqlite3.Row
-            stats = conn.execute("""
-                SELECT 
-                    COUNT(*) as total,
-                    SUM(CASE WHEN status = 'Completed' THEN 1 ELSE 0 END) as completed,
-                    SUM(CASE WHEN verification_status LIKE 'Verified%' THEN 1 ELSE 0 END) as verified,
-                    SUM(CASE WHEN verification_status = 'Verified - Approved' THEN 1 ELSE 0 END) as approved,
-                    SUM(CASE WHEN verification_status = 'Verified - Needs Revision' THEN 1 ELSE 0 END) as needs_revision,
-                    SUM(CASE WHEN verification_status = 'Verified - Rejected' THEN 1 ELSE 0 END) as rejected,
-                    SUM(CASE WHEN verification_evidence_path IS NOT NULL THEN 1 ELSE 0 END) as with_evidence
-                FROM tasks
-            """).fetchall()
+        stats = self.query_cache.query_one(queries.VERIFICATION_STATS)
         
-        if stats and stats[0]['total'] > 0:
-            stats = stats[0]
+        if stats and stats['total'] > 0:
             with st.expander("📊 Verification Analytics Dashboard", expanded=True):
-                tab1, tab2 = st.tabs(["Summary Metrics", "Detailed Insights"])
+                tab1, tab2, tab3 = st.tabs(["Summary Metrics", "Detailed Insights", "Trends"])
                 
                 with tab1:
                     cols = st.columns(4)
@@ -579,13 +709,7 @@ class AITaskManager:
                         
                         # Recent verifications
                         st.subheader("Recent Verification Activity")
-                        recent = conn.execute("""
-                            SELECT title, verification_status, verified_at 
-                            FROM tasks 
-                            WHERE verified_at IS NOT NULL
-                            ORDER BY verified_at DESC
-                            LIMIT 5
-                        """).fetchall()
+                        recent = self.query_cache.query(queries.RECENT_VERIFICATIONS)
                         for task in recent:
                             status_color = {
                                 'Verified - Approved': 'green',
@@ -601,6 +725,171 @@ class AITaskManager:
                                 </div>
                             """, unsafe_allow_html=True)
 
+                with tab3:
+                    self.show_trends()
+
+    def show_trends(self):
+        """Productivity trends served from the precomputed daily buckets"""
+        import pandas as pd
+
+        period = st.radio("Group by", ["Day", "Week"], horizontal=True, key="trend_period")
+        start, end = analytics.trend_window()
+        rows = self.query_cache.query(analytics.DAILY_TRENDS, (start, end))
+        overdue_before = self.query_cache.query_one(analytics.OVERDUE_BEFORE, (start,))['overdue']
+        series = analytics.trend_series(rows, overdue_before, start, end, period.lower())
+
+        st.subheader("Completed, Verified and Overdue Tasks")
+        chart = pd.DataFrame(series).set_index('period')
+        st.line_chart(chart[['completed', 'verified', 'overdue']])
+
+        cols = st.columns(2)
+        with cols[0]:
+            st.subheader("Time to Complete")
+            st.bar_chart(analytics.duration_distribution(rows, 'ttc'))
+        with cols[1]:
+            st.subheader("Time to Verify")
+            st.bar_chart(analytics.duration_distribution(rows, 'ttv'))
+
+    def show_similar_tasks(self, task_id: int) -> None:
+        """List the tasks closest to this one in embedding space"""
+        try:
+            hits = self.semantic_index.similar(task_id, SIMILAR_TASKS)
+        except Exception as e:
+            # numpy or the index may be unavailable; the rest of the card still works
+            st.caption(f"Similar tasks unavailable: {str(e)}")
+            return
+        if not hits:
+            st.caption("No similar tasks yet")
+            return
+        query, params = queries.tasks_by_ids_query("All", [hit_id for hit_id, _ in hits])
+        titles = {row['id']: row['title'] for row in self.query_cache.query(query, params)}
+        for hit_id, score in hits:
+            if hit_id in titles:
+                st.write(f"• {titles[hit_id]} ({score:.2f})")
+
+    def show_semantic_results(self, filter_option: str, search_query: str, page_size: int,
+                              category: Optional[str] = None) -> None:
+        """Rank tasks by embedding similarity to the search text"""
+        try:
+            hits = self.semantic_index.search_text(search_query, SEMANTIC_CANDIDATES)
+        except Exception as e:
+            st.error(f"Semantic search unavailable: {str(e)}")
+            return
+        if hits:
+            query, params = queries.tasks_by_ids_query(filter_option, [task_id for task_id, _ in hits], category)
+            rows = {row['id']: row for row in self.query_cache.query(query, params)}
+            tasks = [dict(rows[task_id], similarity=score) for task_id, score in hits if task_id in rows]
+        else:
+            tasks = []
+        if not tasks:
+            st.info("No tasks found matching your criteria")
+            return
+
+        tasks = tasks[:page_size]
+        self.show_bulk_actions(tasks)
+        self.visualize_tasks(tasks)
+        st.caption(f"Top {len(tasks)} semantic matches "
+                   f"(index lookup {self.semantic_index.stats()['last_query_ms']:.1f} ms)")
+
+    def show_task_list(self) -> None:
+        """Filterable, searchable task list"""
+        col1, col2, col3, col4, col5 = st.columns([2, 2, 3, 1, 1])
+        
+        with col1:
+            filter_option = st.selectbox("Filter by:", queries.FILTER_OPTIONS)
+
+        with col2:
+            category_options = [row['category'] for row in self.query_cache.query(queries.CATEGORY_OPTIONS)]
+            category = st.selectbox("Category:", ["All"] + category_options)
+            category = None if category == "All" else category
+        
+        with col3:
+            search_query = st.text_input("Search tasks:", placeholder="Enter title or description")
+
+        with col4:
+            semantic = st.checkbox("Semantic", help="Rank by meaning instead of matching words")
+
+        with col5:
+            page_size = st.selectbox("Per page:", queries.PAGE_SIZES,
+                                     index=queries.PAGE_SIZES.index(queries.DEFAULT_PAGE_SIZE))
+        
+        # Task display with filtering
+        if semantic and search_query.strip():
+            self.show_semantic_results(filter_option, search_query, page_size, category)
+        else:
+            self.show_task_page(filter_option, search_query, page_size, category)
+
+    def show_focus(self) -> None:
+        """Open tasks ranked by what to work on next"""
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            grouped = st.checkbox("Group related tasks", help="Boost categories with a lot of urgent work")
+        with col2:
+            count = st.selectbox("Show:", FOCUS_SIZES, index=1)
+        try:
+            focus = ranking.get_ranking(DB_NAME, grouped)
+            ranked = focus.top(count)
+        except Exception as e:
+            st.error(f"Focus ranking unavailable: {str(e)}")
+            return
+        if not ranked:
+            st.info("No open tasks. All caught up!")
+            return
+
+        query, params = queries.tasks_by_ids_query("Pending", [result['id'] for result in ranked])
+        rows = {row['id']: row for row in self.query_cache.query(query, params)}
+        tasks = [dict(rows[result['id']], focus=result) for result in ranked if result['id'] in rows]
+        self.show_bulk_actions(tasks)
+        self.visualize_tasks(tasks)
+        stats = focus.stats()
+        st.caption(f"Top {len(tasks)} of {stats['open_tasks']} open tasks "
+                   f"(ranking refreshed in {stats['last_sync_ms']:.1f} ms)")
+
+    def show_task_page(self, filter_option: str, search_query: str, page_size: int,
+                       category: Optional[str] = None) -> None:
+        """Fetch and render only the current page of the task list"""
+        # Start from the first page whenever the filter, search or page size changes
+        page_key = (filter_option, search_query, page_size, category)
+        if st.session_state.get("task_page_key") != page_key:
+            st.session_state["task_page_key"] = page_key
+            st.session_state["task_page_cursors"] = [None]
+        cursors = st.session_state["task_page_cursors"]
+        searching = queries.fts_match_expression(search_query) is not None
+
+        try:
+            count_query, count_params = queries.task_count_query(filter_option, search_query, category)
+            total = self.query_cache.query_one(count_query, count_params)['total']
+            query, params = queries.task_page_query(filter_option, search_query, cursors[-1], page_size, category)
+            rows = self.query_cache.query(query, params)
+        except sqlite3.Error as e:
+            st.error(f"Database error: {str(e)}")
+            return
+
+        has_next = len(rows) > page_size
+        tasks = rows[:page_size]
+        if not tasks:
+            st.info("No tasks found matching your criteria")
+            return
+
+        self.show_bulk_actions(tasks)
+        self.visualize_tasks(tasks)
+
+        first = (len(cursors) - 1) * page_size + 1
+        cols = st.columns([1, 2, 1])
+        with cols[0]:
+            if len(cursors) > 1 and st.button("◀ Previous", key="tasks_prev_page"):
+                cursors.pop()
+                st.rerun()
+        with cols[1]:
+            st.caption(f"Showing {first}–{first + len(tasks) - 1} of {total} tasks")
+        with cols[2]:
+            if has_next and st.button("Next ▶", key="tasks_next_page"):
+                if searching:
+                    cursors.append((cursors[-1] or 0) + page_size)
+                else:
+                    cursors.append((tasks[-1]['due_date'], tasks[-1]['id']))
+                st.rerun()
+
     def run(self):
         # Only set/reset session state before widgets are created!
         if st.session_state.get("clear_new_task_form"):
@@ -608,6 +897,7 @@ class AITaskManager:
             st.session_state["new_task_description"] = ""
             st.session_state["new_task_start_date"] = datetime.date.today()
             st.session_state["new_task_due_date"] = datetime.date.today() + datetime.timedelta(days=7)
+            st.session_state["new_task_priority"] = "Normal"
             st.session_state["clear_new_task_form"] = False
 
         if "new_task_title" not in st.session_state:
@@ -620,6 +910,8 @@ class AITaskManager:
             st.session_state["new_task_due_date"] = datetime.date.today() + datetime.timedelta(days=7)
 
         # Now create your widgets
+        self.show_duplicate_warning()
+        self.show_quick_add()
         with st.expander("➕ Assign New Task", expanded=True):
             with st.form("task_input"):
                 title = st.text_input("Task Title*", placeholder="Enter task title", key="new_task_title")
@@ -629,6 +921,7 @@ class AITaskManager:
                     start_date = st.date_input("Start Date", datetime.date.today(), key="new_task_start_date")
                 with col2:
                     due_date = st.date_input("Due Date", datetime.date.today() + datetime.timedelta(days=7), key="new_task_due_date")
+                priority = st.selectbox("Priority", PRIORITIES, index=PRIORITIES.index("Normal"), key="new_task_priority")
                 uploaded_file = st.file_uploader(
                     "Attach Document (Optional)",
                     type=['pdf', 'docx', 'txt', 'ppt', 'pptx', 'xls', 'xlsx']
@@ -643,51 +936,20 @@ class AITaskManager:
                             description,
                             start_date.isoformat(),
                             due_date.isoformat(),
-                            uploaded_file
+                            uploaded_file,
+                            priority=priority
                         )
                         st.session_state["clear_new_task_form"] = True
                         st.rerun()
         
         # Task management section
         st.subheader("📋 Your Tasks")
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            filter_option = st.selectbox("Filter by:", ["All", "Pending", "Completed", "Verified"])
-        
-        with col2:
-            search_query = st.text_input("Search tasks:", placeholder="Enter title or description")
-        
-        # Task display with filtering
-        with self.create_connection() as conn:
-            conn.row_factory = sqlite3.Row
-            try:
-                query = "SELECT * FROM tasks"
-                conditions = []
-                
-                if filter_option != "All":
-                    if filter_option == "Verified":
-                        conditions.append("verification_status LIKE 'Verified%'")
-                    elif filter_option == "Completed":
-                        conditions.append("status = 'Completed'")
-                    else:
-                        conditions.append(f"status = '{filter_option}'")
-                
-                if search_query:
-                    conditions.append(f"(title LIKE '%{search_query}%' OR description LIKE '%{search_query}%')")
-                
-                if conditions:
-                    query += " WHERE " + " AND ".join(conditions)
-                
-                query += " ORDER BY due_date ASC"
-                tasks = conn.execute(query).fetchall()
-                
-                if tasks:
-                    self.visualize_tasks([dict(task) for task in tasks])
-                else:
-                    st.info("No tasks found matching your criteria")
-            except sqlite3.Error as e:
-                st.error(f"Database error: {str(e)}")
+        view = st.radio("View:", ["All tasks", "🎯 Focus"], horizontal=True,
+                        help="Focus ranks open tasks by priority, due date, age and rework")
+        if view == "🎯 Focus":
+            self.show_focus()
+        else:
+            self.show_task_list()
         
         # Verification analytics
         self.show_verification_analytics()
@@ -709,18 +971,104 @@ class AITaskManager:
             """)
             st.success("Tip: Use the search and filter options to quickly find tasks!")
             st.markdown("---")
+            self.show_model_status()
+            cache_stats = self.query_cache.stats()
+            st.caption(f"Query cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                       f"{cache_stats['entries']} entries ({cache_stats['bytes'] / 1024:.0f} KB)")
+            pool_stats = self.connections.stats()
+            st.caption(f"DB pool: read wait avg {pool_stats['read']['avg_wait_ms']:.2f} ms "
+                       f"(max {pool_stats['read']['max_wait_ms']:.1f}), "
+                       f"write wait avg {pool_stats['write']['avg_wait_ms']:.2f} ms "
+                       f"(max {pool_stats['write']['max_wait_ms']:.1f}), "
+                       f"{pool_stats['group_commit']['avg_group_size']:.1f} writes per commit")
+            sweeper_stats = self.sweeper.stats()
+            last_sweep = sweeper_stats['last_sweep']
+            st.caption(f"Attachment GC: {sweeper_stats['reclaimed_bytes'] / 2**20:.1f} MB reclaimed"
+                       + (f", last sweep scanned {last_sweep['scanned']} files in {last_sweep['seconds']:.1f}s"
+                          if last_sweep else ", first sweep pending")
+                       + (f", last error: {sweeper_stats['last_error']}" if sweeper_stats['last_error'] else ""))
+
+    def show_model_status(self):
+        """Show load time and memory use of the shared NLP models"""
+        with st.expander("🧠 Model Status", expanded=False):
+            for name, stats in model_registry.stats().items():
+                if stats['status'] == 'loaded':
+                    st.write(f"**{name}:** loaded in {stats['load_seconds']:.2f}s, "
+                             f"+{stats['rss_delta_bytes'] / 2**20:.0f} MB RSS")
+                    if stats['parameter_bytes']:
+                        st.caption(f"{stats['parameter_bytes'] / 2**20:.0f} MB of parameters")
+                elif stats['status'] == 'failed':
+                    st.write(f"**{name}:** failed to load ({stats['error']})")
+                else:
+                    st.write(f"**{name}:** not loaded yet")
+            embedder_stats = self.embedder.stats()
+            st.caption(f"Embeddings: {embedder_stats['encoded']} encoded, {embedder_stats['pending']} queued"
+                       + (f", last error: {embedder_stats['last_error']}" if embedder_stats['last_error'] else ""))
+            index_stats = self.semantic_index.stats()
+            if index_stats['queries']:
+                layout = f"IVF, {index_stats['ivf_lists']} lists" if index_stats['ivf_lists'] else "exact"
+                st.caption(f"Vector index: {index_stats['vectors']} vectors ({layout}), "
+                           f"last query {index_stats['last_query_ms']:.1f} ms")
+            reminder_stats = self.reminders.stats()
+            st.caption(f"Reminders: {reminder_stats['sent']['due soon']} due soon, "
+                       f"{reminder_stats['sent']['overdue']} overdue sent, {reminder_stats['scheduled']} scheduled"
+                       + (f", last error: {reminder_stats['last_error']}" if reminder_stats['last_error'] else ""))
+            phrase_cache = quick_add.cache_info()
+            if phrase_cache.hits or phrase_cache.misses:
+                st.caption(f"Date phrases: {phrase_cache.hits} cached, {phrase_cache.misses} parsed")
+
+    def show_profiler(self, profiles: List[profiling.Recorder]) -> None:
+        """Sidebar panel with the timings of recent reruns and their export"""
+        with st.sidebar.expander("⏱️ Profiler", expanded=False):
+            st.checkbox("Profile reruns", key="profile_reruns",
+                        help=f"Times every method and SQL statement; {profiling.ENV_VAR}=1 turns it on by default")
+            if not profiles:
+                st.caption("No recorded reruns yet")
+                return
+            latest = profiles[-1]
+            st.write(f"**Last rerun:** {latest.elapsed_ms:.1f} ms, {len(latest.spans)} spans"
+                     + (f" ({latest.dropped} dropped)" if latest.dropped else ""))
+            st.dataframe([
+                {"what": f"{entry['category']}: {entry['name']}", "calls": entry['calls'],
+                 "total ms": round(entry['total_ms'], 2), "max ms": round(entry['max_ms'], 2),
+                 "rows": entry['rows']}
+                for entry in latest.summary()[:PROFILE_TOP_ROWS]
+            ], use_container_width=True)
+            st.download_button("Download JSON", json.dumps([p.as_dict() for p in profiles], default=str),
+                               file_name="rerun_profile.json", mime="application/json")
+            st.download_button("Download Chrome trace", json.dumps(profiling.chrome_trace(profiles), default=str),
+                               file_name="rerun_trace.json", mime="application/json")
 
 if __name__ == "__main__":
-    manager = AITaskManager()
-    manager.run()
-    
-    # Handle task verification if triggered
-    if 'verify_task' in st.session_state:
-        task_id = st.session_state['verify_task']
-        with manager.create_connection() as conn:
-            conn.row_factory = sqlite3.Row
-            task = conn.execute("SELECT * FROM tasks WHERE id=?", (task_id,)).fetchone()
-        if task:
-            # If not verified, show the verification form
-            if task['verification_status'] in [None, '', 'None', 'Not Verified']:
-                manager.verify_task(task_id)
\ No newline at end of file
+    # Models live in a process-wide registry so reruns don't reload them;
+    # warm them in the background the first time the server runs this script
+    model_registry.warm()
+    st.session_state.setdefault('profile_reruns', profiling.enabled_from_env())
+    profiling_enabled = st.session_state['profile_reruns']
+    # Recent recordings stay in the session, oldest dropped first
+    profiles = st.session_state.setdefault('profiles', deque(maxlen=profiling.HISTORY_SIZE))
+    profile = None
+    try:
+        with profiling.record("rerun", profiling_enabled) as profile, db.count_statements() as statements:
+            manager = AITaskManager()
+            manager.run()
+
+            # Handle task verification if triggered
+            if 'verify_task' in st.session_state:
+                task = manager.get_task(st.session_state['verify_task'])
+                # If not verified, show the verification form
+                if task and verification_log.can_verify(task):
+                    manager.verify_task(task['id'])
+    finally:
+        # st.rerun() ends a rerun by raising; those are often the slow ones
+        if profile is not None:
+            profiles.append(profile)
+
+    # SQL issued by this rerun, so a change that adds per-card queries shows up
+    previous = st.session_state.get('statement_count')
+    st.session_state['statement_count'] = statements.total
+    kinds = ", ".join(f"{count} {kind}" for kind, count in statements.by_kind.most_common())
+    change = f" ({statements.total - previous:+d} vs last rerun)" if previous is not None else ""
+    st.sidebar.caption(f"SQL this rerun: {statements.total} statements{change}" + (f": {kinds}" if kinds else ""))
+
+    manager.show_profiler(list(profiles))
@@ -0,0 +1,156 @@
+"""Precomputed analytics: dashboard counters and per-day trend buckets.
+
+``task_stats`` and ``task_daily_stats`` are kept current by triggers (see
+``schema.py``), so the dashboard reads at most one row per day of history
+no matter how many tasks exist. If the rollups ever drift, for example
+after rows were changed with the triggers dropped, ``reconcile``
+recomputes them from ``tasks`` and reports the difference::
+
+    python analytics.py reconcile tasks.db
+"""
+import argparse
+import datetime
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+import schema
+
+TREND_DAYS = 365
+
+_BIN_COUNT = len(schema.DURATION_BIN_LABELS)
+
+DAILY_TRENDS = f"""
+    SELECT day, created, completed, verified, overdue_delta,
+        {", ".join(f"ttc_bin{i}" for i in range(_BIN_COUNT))},
+        {", ".join(f"ttv_bin{i}" for i in range(_BIN_COUNT))}
+    FROM task_daily_stats
+    WHERE day BETWEEN ? AND ?
+    ORDER BY day
+"""
+
+# Tasks already overdue when the window opens
+OVERDUE_BEFORE = "SELECT COALESCE(SUM(overdue_delta), 0) AS overdue FROM task_daily_stats WHERE day < ?"
+
+
+def trend_window(days: int = TREND_DAYS, today: Optional[datetime.date] = None):
+    """Return ``(start, end)`` ISO dates covering the last ``days`` days."""
+    end = today or datetime.datetime.utcnow().date()
+    start = end - datetime.timedelta(days=days - 1)
+    return start.isoformat(), end.isoformat()
+
+
+def trend_series(rows: List[Dict[str, Any]], overdue_before: int, start: str, end: str,
+                 period: str = "day") -> List[Dict[str, Any]]:
+    """Turn daily bucket rows into a gap-free series.
+
+    ``period`` is ``"day"`` or ``"week"``. Created, completed and verified are
+    summed per period; overdue is the number of overdue tasks at the end of
+    each period.
+    """
+    by_day = {row['day']: row for row in rows}
+    day = datetime.date.fromisoformat(start)
+    last = datetime.date.fromisoformat(end)
+    overdue = overdue_before
+    series: List[Dict[str, Any]] = []
+
+    while day <= last:
+        row = by_day.get(day.isoformat(), {})
+        overdue += row.get('overdue_delta', 0)
+        if period == "week":
+            # Label each week by its Monday
+            label = (day - datetime.timedelta(days=day.weekday())).isoformat()
+        else:
+            label = day.isoformat()
+
+        if not series or series[-1]['period'] != label:
+            series.append({'period': label, 'created': 0, 'completed': 0, 'verified': 0, 'overdue': 0})
+        point = series[-1]
+        point['created'] += row.get('created', 0)
+        point['completed'] += row.get('completed', 0)
+        point['verified'] += row.get('verified', 0)
+        point['overdue'] = overdue
+        day += datetime.timedelta(days=1)
+    return series
+
+
+def duration_distribution(rows: List[Dict[str, Any]], kind: str) -> Dict[str, int]:
+    """Sum the ``ttc`` (time to complete) or ``ttv`` (time to verify) histogram."""
+    return {
+        label: sum(row[f"{kind}_bin{i}"] for row in rows)
+        for i, label in enumerate(schema.DURATION_BIN_LABELS)
+    }
+
+
+def _daily_snapshot(conn: sqlite3.Connection) -> Dict[str, tuple]:
+    # Buckets decremented back to zero are equivalent to missing ones
+    return {
+        row[0]: tuple(row[1:])
+        for row in conn.execute("SELECT * FROM task_daily_stats")
+        if any(row[1:])
+    }
+
+
+def reconcile(conn: sqlite3.Connection, dry_run: bool = False) -> Dict[str, Any]:
+    """Rebuild the rollups from a full scan and return what drifted.
+
+    ``conn`` must be in autocommit mode (``isolation_level=None``). The
+    result maps each task_stats counter that drifted to
+    ``{"stored": ..., "actual": ...}``; drifted trend buckets are listed
+    under ``"daily_buckets"``.
+    """
+    conn.row_factory = sqlite3.Row
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        stored = conn.execute("SELECT * FROM task_stats WHERE id = 1").fetchone()
+        actual = conn.execute(schema.task_stats_scan_sql()).fetchone()
+        drift: Dict[str, Any] = {}
+        for name in schema.TASK_STATS_CONTRIBUTIONS:
+            stored_value = stored[name] if stored else 0
+            if stored_value != actual[name]:
+                drift[name] = {"stored": stored_value, "actual": actual[name]}
+        schema.rebuild_task_stats(conn)
+
+        stored_days = _daily_snapshot(conn)
+        schema.rebuild_daily_stats(conn)
+        actual_days = _daily_snapshot(conn)
+        drifted_days = sorted(
+            day for day in set(stored_days) | set(actual_days)
+            if stored_days.get(day) != actual_days.get(day)
+        )
+        if drifted_days:
+            drift["daily_buckets"] = drifted_days
+
+        conn.execute("ROLLBACK" if dry_run else "COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return drift
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain task manager analytics tables")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    reconcile_parser = subparsers.add_parser("reconcile", help="rebuild the rollups and report drift")
+    schema.add_db_argument(reconcile_parser)
+    reconcile_parser.add_argument("--dry-run", action="store_true", help="report drift without fixing it")
+    args = schema.parse_cli_args(parser, argv)
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    try:
+        drift = reconcile(conn, dry_run=args.dry_run)
+    finally:
+        conn.close()
+
+    if not drift:
+        print("Rollups are consistent with tasks.")
+        return
+    for name, values in drift.items():
+        if name == "daily_buckets":
+            print(f"daily buckets: {len(values)} days drifted ({values[0]} .. {values[-1]})")
+        else:
+            print(f"{name}: stored {values['stored']}, actual {values['actual']}")
+    print("Drift reported only (dry run)." if args.dry_run else "Rollups rebuilt.")
+
+
+if __name__ == "__main__":
+    main()
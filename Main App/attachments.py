@@ -0,0 +1,374 @@
+"""Content-addressed storage for task attachments.
+
+Uploads are streamed to disk in fixed-size chunks and hashed on the way,
+then stored under their SHA-256 digest::
+
+    task_documents/ab/ab12...ef.pdf
+
+so the same evidence file uploaded for fifty tasks is kept once. Each blob
+is written to a temporary file, fsynced and renamed into place, so a crash
+never leaves a half-written file under a real name.
+
+Tasks reference blobs through ``document_path`` and
+``verification_evidence_path``; the ``attachment_refs`` table (maintained by
+triggers, see ``schema.py``) counts those references. After tasks are
+deleted, ``release`` removes the blobs nobody references any more.
+
+Anything that slips through (a save whose INSERT failed, a crashed delete,
+stray temp files) is collected by ``sweep``, which the app runs on a
+background ``Sweeper`` thread and which can also be run by hand::
+
+    python attachments.py sweep tasks.db --root task_documents --dry-run
+"""
+import argparse
+import hashlib
+import logging
+import os
+import queue
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Set
+
+import db
+import schema
+
+CHUNK_SIZE = 1024 * 1024
+
+logger = logging.getLogger("attachments")
+
+# A blob stored (or re-stored) this recently is never deleted, even with no
+# references: the task that will point at it may not have committed yet
+ORPHAN_GRACE_SECONDS = 3600
+
+SWEEP_INTERVAL_SECONDS = 6 * 3600
+SWEEP_BATCH_SIZE = 100
+# Upper bound on unlinks per second, so a big sweep doesn't starve the
+# disk the app is serving from
+SWEEP_MAX_DELETES_PER_SECOND = 200
+
+_TMP_DIR = "tmp"
+# Serializes "reuse an existing blob" in store() with "check the references,
+# then unlink" in release() and sweep(), so a blob is never deleted between
+# being handed out again and its new reference committing
+_blob_lock = threading.Lock()
+_EXTENSION = re.compile(r"^\.[A-Za-z0-9]{1,10}$")
+
+
+def _extension(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if _EXTENSION.match(ext) else ""
+
+
+def _fsync_dir(path: str) -> None:
+    # Makes the rename itself durable; not supported on every platform
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def blob_path(root: str, digest: str, ext: str = "") -> str:
+    return os.path.join(root, digest[:2], f"{digest}{ext}")
+
+
+def store(root: str, stream: BinaryIO, filename: str) -> str:
+    """Stream ``stream`` into the store and return the blob's path.
+
+    If a blob with the same content and extension already exists, the
+    upload is discarded and the existing path is returned.
+    """
+    tmp_dir = os.path.join(root, _TMP_DIR)
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+
+        path = blob_path(root, digest.hexdigest(), _extension(filename))
+        with _blob_lock:
+            try:
+                # Deduplicated; refresh the mtime so release() leaves it
+                # alone until the new reference has committed
+                os.utime(path)
+            except FileNotFoundError:
+                # New content, or a blob another process just deleted
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+            else:
+                os.remove(tmp_path)
+                return path
+        _fsync_dir(os.path.dirname(path))
+        return path
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def is_referenced(conn: sqlite3.Connection, path: str) -> bool:
+    return conn.execute("SELECT 1 FROM attachment_refs WHERE path = ?", (path,)).fetchone() is not None
+
+
+def unreferenced(conn: sqlite3.Connection, paths: Iterable[str]) -> List[str]:
+    """Return the paths in ``paths`` that no task references."""
+    return [path for path in dict.fromkeys(p for p in paths if p) if not is_referenced(conn, path)]
+
+
+def _remove_if_stale(path: str, cutoff: float) -> Optional[int]:
+    """Unlink ``path`` unless it was touched after ``cutoff``; returns its size.
+
+    Call with ``_blob_lock`` held, after checking the references.
+    """
+    try:
+        st = os.stat(path)
+        if st.st_mtime > cutoff:
+            return None
+        os.remove(path)
+    except FileNotFoundError:
+        return None
+    return st.st_size
+
+
+def release(conn: sqlite3.Connection, paths: Iterable[str],
+            grace_seconds: float = ORPHAN_GRACE_SECONDS) -> List[str]:
+    """Delete the blobs among ``paths`` that have no references left.
+
+    Call after the transaction that dropped the references has committed.
+    Blobs touched within ``grace_seconds`` are kept for the garbage
+    collector instead. Returns the paths removed.
+    """
+    cutoff = time.time() - grace_seconds
+    removed = []
+    for path in dict.fromkeys(p for p in paths if p):
+        with _blob_lock:
+            if is_referenced(conn, path) or _remove_if_stale(path, cutoff) is None:
+                continue
+        removed.append(path)
+    return removed
+
+
+def _walk_files(root: str) -> Iterator[os.DirEntry]:
+    stack = [root]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+        except FileNotFoundError:
+            continue
+
+
+def referenced_paths(conn: sqlite3.Connection) -> Set[str]:
+    return {os.path.realpath(row[0]) for row in conn.execute("SELECT path FROM attachment_refs")}
+
+
+def sweep(conn: sqlite3.Connection, root: str, grace_seconds: float = ORPHAN_GRACE_SECONDS,
+          batch_size: int = SWEEP_BATCH_SIZE,
+          max_deletes_per_second: Optional[float] = SWEEP_MAX_DELETES_PER_SECOND,
+          dry_run: bool = False) -> Dict[str, int]:
+    """Delete files under ``root`` that no task references.
+
+    Only files last modified more than ``grace_seconds`` ago are considered,
+    and references are re-checked for each batch right before it is
+    deleted. Returns counts of scanned, orphaned and deleted files and the
+    bytes reclaimed (with ``dry_run``, what would be).
+    """
+    data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    referenced = referenced_paths(conn)
+    cutoff = time.time() - grace_seconds
+    result = {"scanned": 0, "orphaned": 0, "deleted": 0, "reclaimed_bytes": 0}
+
+    def flush(batch: List[os.DirEntry]) -> None:
+        nonlocal referenced, data_version
+        # A task may have picked up one of these since the snapshot was taken
+        current_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if current_version != data_version:
+            data_version = current_version
+            referenced = referenced_paths(conn)
+        started = time.perf_counter()
+        for entry in batch:
+            if os.path.realpath(entry.path) in referenced:
+                continue
+            if dry_run:
+                try:
+                    size = entry.stat(follow_symlinks=False).st_size
+                except FileNotFoundError:
+                    continue
+            else:
+                # store() may have handed the file out again since the scan
+                with _blob_lock:
+                    size = _remove_if_stale(entry.path, cutoff)
+                if size is None:
+                    continue
+            result["deleted"] += 1
+            result["reclaimed_bytes"] += size
+        if max_deletes_per_second and not dry_run:
+            remaining = len(batch) / max_deletes_per_second - (time.perf_counter() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    batch: List[os.DirEntry] = []
+    for entry in _walk_files(root):
+        result["scanned"] += 1
+        try:
+            if entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        if os.path.realpath(entry.path) in referenced:
+            continue
+        result["orphaned"] += 1
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    return result
+
+
+class Sweeper:
+    """Background thread that releases and garbage-collects attachments.
+
+    ``release()`` hands paths over from a request so the files are checked
+    and removed off the UI thread; a full ``sweep`` runs every
+    ``interval`` seconds.
+    """
+
+    def __init__(self, db_path: str, root: str, interval: float = SWEEP_INTERVAL_SECONDS):
+        self.db_path = db_path
+        self.root = root
+        self.interval = interval
+        self._pending: "queue.Queue[Optional[List[str]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._last_sweep: Optional[Dict[str, Any]] = None
+        self.released = 0
+        self.reclaimed_bytes = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="attachment-sweeper", daemon=True)
+                self._thread.start()
+
+    def release(self, paths: Iterable[str]) -> None:
+        """Queue paths whose references were just dropped."""
+        paths = [path for path in paths if path]
+        if paths:
+            self._pending.put(paths)
+
+    def sweep_now(self) -> None:
+        """Run a full sweep on the background thread as soon as possible."""
+        self._pending.put(None)
+
+    def _run(self) -> None:
+        conn = db.connect(self.db_path, readonly=True)
+        next_sweep = time.monotonic()
+        while True:
+            try:
+                paths = self._pending.get(timeout=max(next_sweep - time.monotonic(), 0))
+            except queue.Empty:
+                paths = None
+            try:
+                if paths is None:
+                    started = time.perf_counter()
+                    result = sweep(conn, self.root)
+                    with self._stats_lock:
+                        self._last_sweep = dict(result, seconds=time.perf_counter() - started,
+                                                finished_at=time.time())
+                        self.reclaimed_bytes += result["reclaimed_bytes"]
+                    next_sweep = time.monotonic() + self.interval
+                else:
+                    sizes = {path: _size(path) for path in paths}
+                    removed = release(conn, paths)
+                    with self._stats_lock:
+                        self.released += len(removed)
+                        self.reclaimed_bytes += sum(sizes[path] for path in removed)
+            except Exception as e:
+                # Try again on the next sweep rather than kill the thread
+                logger.exception("Attachment %s failed", "sweep" if paths is None else "release")
+                with self._stats_lock:
+                    self.failures += 1
+                    self.last_error = str(e)
+                next_sweep = time.monotonic() + self.interval
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "released": self.released,
+                "reclaimed_bytes": self.reclaimed_bytes,
+                "last_sweep": dict(self._last_sweep) if self._last_sweep else None,
+                "pending": self._pending.qsize(),
+                "failures": self.failures,
+                "last_error": self.last_error,
+            }
+
+
+def _size(path: str) -> int:
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return 0
+
+
+@db.per_db_singleton(key=lambda root: os.path.realpath(root))
+def get_sweeper(db_path: str, root: str) -> Sweeper:
+    """Return the running sweeper for ``db_path`` and ``root``, starting it on first use."""
+    sweeper = Sweeper(db_path, root)
+    sweeper.start()
+    return sweeper
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain the task attachment store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    sweep_parser = subparsers.add_parser("sweep", help="delete attachment files no task references")
+    schema.add_db_argument(sweep_parser)
+    sweep_parser.add_argument("--root", default="task_documents", help="attachment folder")
+    sweep_parser.add_argument("--grace-seconds", type=float, default=ORPHAN_GRACE_SECONDS,
+                              help="keep files modified more recently than this")
+    sweep_parser.add_argument("--max-deletes-per-second", type=float, default=SWEEP_MAX_DELETES_PER_SECOND,
+                              help="rate limit for unlinks (0 = unlimited)")
+    sweep_parser.add_argument("--dry-run", action="store_true", help="report orphans without deleting them")
+    args = schema.parse_cli_args(parser, argv)
+
+    conn = db.connect(args.db, readonly=True)
+    started = time.perf_counter()
+    try:
+        result = sweep(conn, args.root, grace_seconds=args.grace_seconds,
+                       max_deletes_per_second=args.max_deletes_per_second, dry_run=args.dry_run)
+    finally:
+        conn.close()
+    verb = "Would delete" if args.dry_run else "Deleted"
+    print(f"Scanned {result['scanned']} files in {time.perf_counter() - started:.2f}s; "
+          f"{verb} {result['deleted']} orphans, {result['reclaimed_bytes'] / 2**20:.1f} MB reclaimed")
+
+
+if __name__ == "__main__":
+    main()
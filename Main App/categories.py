@@ -0,0 +1,220 @@
+"""Automatic task categories learned from the task embeddings.
+
+``build`` clusters every stored task vector with KMeans and names each
+cluster after the noun chunks (from spaCy) that are most distinctive for
+its tasks. The centroids and labels are kept in ``task_categories``, and
+every auto-categorized task is written back in bulk::
+
+    python categories.py build tasks.db --clusters 12 --workers 4
+
+spaCy is the slow part, so titles are parsed on a process pool, each
+worker loading the model once.
+
+After that, new and edited tasks are categorized as soon as the background
+``Embedder`` has encoded them, by nearest centroid, which costs one small
+matrix product. Only tasks with no category, or with one that was filled
+in automatically (``category_auto = 1``), are ever overwritten.
+"""
+import argparse
+import math
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import db
+import embeddings
+import schema
+from model_registry import SENTENCE_MODEL, SPACY_MODEL
+
+DEFAULT_CLUSTERS = 12
+KMEANS_TRAIN_SAMPLE = 50_000
+ASSIGN_CHUNK_ROWS = 65_536
+LABEL_CHUNK_SIZE = 1_000
+UPDATE_BATCH_SIZE = 5_000
+# Tasks less similar than this to every centroid don't fit any category
+MIN_SIMILARITY = 0.25
+FALLBACK_LABEL = "Other"
+
+_UPDATE_CATEGORY = """
+    UPDATE tasks SET category = ?, category_auto = 1
+    WHERE id = ? AND (category IS NULL OR category_auto = 1)
+"""
+
+_worker_nlp = None
+
+
+def _init_worker() -> None:
+    global _worker_nlp
+    import spacy
+    _worker_nlp = spacy.load(SPACY_MODEL, disable=["ner"])
+
+
+def _noun_phrases(texts: Sequence[str]) -> List[List[str]]:
+    """Lemmatized noun chunks of each text, minus determiners and stop words."""
+    phrases = []
+    for doc in _worker_nlp.pipe(texts):
+        chunks = []
+        for chunk in doc.noun_chunks:
+            words = [token.lemma_.lower() for token in chunk
+                     if not token.is_stop and token.is_alpha and token.pos_ not in ("DET", "PRON")]
+            if words:
+                chunks.append(" ".join(words))
+        phrases.append(chunks)
+    return phrases
+
+
+def cluster_labels(phrases: List[List[str]], assignments: Sequence[int], n_clusters: int) -> List[str]:
+    """Name each cluster after its most distinctive noun phrase.
+
+    Phrases are scored by how often they occur in the cluster, weighted by
+    how few clusters use them (tf-idf over clusters), so a phrase common to
+    every task, like "task", never becomes a label. Labels are unique.
+    """
+    counts = [Counter() for _ in range(n_clusters)]
+    for chunks, cluster in zip(phrases, assignments):
+        counts[cluster].update(set(chunks))
+    spread = Counter(phrase for counter in counts for phrase in counter)
+
+    labels: List[str] = []
+    for counter in counts:
+        ranked = sorted(
+            counter,
+            key=lambda phrase: (-counter[phrase] * math.log(1 + n_clusters / spread[phrase]), phrase),
+        )
+        label = next((p.title() for p in ranked if p.title() not in labels), None)
+        labels.append(label or f"{FALLBACK_LABEL} {len(labels) + 1}")
+    return labels
+
+
+def nearest_categories(vectors, centroids, labels: Sequence[str]) -> List[str]:
+    import numpy as np
+
+    similarity = vectors @ centroids.T
+    best = np.argmax(similarity, axis=1)
+    return [
+        labels[cluster] if similarity[row, cluster] >= MIN_SIMILARITY else FALLBACK_LABEL
+        for row, cluster in enumerate(best.tolist())
+    ]
+
+
+def load_categories(conn, model_name: str = SENTENCE_MODEL):
+    """Return ``(labels, centroids)`` for ``model_name``; centroids is None if not built."""
+    import numpy as np
+
+    rows = conn.execute(
+        "SELECT label, centroid FROM task_categories WHERE model = ? ORDER BY id", (model_name,)
+    ).fetchall()
+    if not rows:
+        return [], None
+    centroids = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+    return [row[0] for row in rows], centroids
+
+
+def _write_categories(manager: db.ConnectionManager, pairs: List[tuple]) -> int:
+    updated = 0
+    for start in range(0, len(pairs), UPDATE_BATCH_SIZE):
+        batch = pairs[start:start + UPDATE_BATCH_SIZE]
+        with manager.write() as conn:
+            updated += conn.executemany(_UPDATE_CATEGORY, batch).rowcount
+    return updated
+
+
+def build(manager: db.ConnectionManager, n_clusters: int = DEFAULT_CLUSTERS, workers: Optional[int] = None,
+          model_name: str = SENTENCE_MODEL, log=print) -> Dict[str, int]:
+    """Cluster all task vectors, label the clusters and categorize every task."""
+    import numpy as np
+    from sklearn.cluster import KMeans
+
+    with manager.read() as conn:
+        task_ids, matrix = embeddings.load_matrix(conn, model_name)
+    if len(task_ids) < n_clusters:
+        raise ValueError(f"Need at least {n_clusters} embedded tasks, have {len(task_ids)}")
+
+    started = time.perf_counter()
+    rng = np.random.default_rng(0)
+    sample = matrix[rng.choice(len(matrix), min(len(matrix), KMEANS_TRAIN_SAMPLE), replace=False)]
+    centroids = KMeans(n_clusters=n_clusters, n_init=3, random_state=0).fit(sample).cluster_centers_
+    centroids = (centroids / np.linalg.norm(centroids, axis=1, keepdims=True)).astype(np.float32)
+    assignments = np.concatenate([
+        np.argmax(matrix[start:start + ASSIGN_CHUNK_ROWS] @ centroids.T, axis=1)
+        for start in range(0, len(matrix), ASSIGN_CHUNK_ROWS)
+    ])
+    log(f"Clustered {len(task_ids)} tasks in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    titles: Dict[int, str] = {}
+    with manager.read() as conn:
+        ids = task_ids.tolist()
+        for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+            chunk = ids[start:start + UPDATE_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(chunk))
+            titles.update(conn.execute(f"SELECT id, title FROM tasks WHERE id IN ({placeholders})", chunk))
+    texts = [titles.get(task_id, "") for task_id in ids]
+    chunks = [texts[start:start + LABEL_CHUNK_SIZE] for start in range(0, len(texts), LABEL_CHUNK_SIZE)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        phrases = [p for chunk_phrases in pool.map(_noun_phrases, chunks) for p in chunk_phrases]
+    labels = cluster_labels(phrases, assignments.tolist(), n_clusters)
+    log(f"Labelled clusters in {time.perf_counter() - started:.1f}s: {', '.join(labels)}")
+
+    sizes = np.bincount(assignments, minlength=n_clusters)
+    with manager.write() as conn:
+        conn.execute("DELETE FROM task_categories")
+        conn.executemany(
+            "INSERT INTO task_categories (id, label, model, centroid, size) VALUES (?, ?, ?, ?, ?)",
+            [(i, labels[i], model_name, centroids[i].tobytes(), int(sizes[i])) for i in range(n_clusters)],
+        )
+
+    started = time.perf_counter()
+    categories = nearest_categories(matrix, centroids, labels)
+    updated = _write_categories(manager, list(zip(categories, ids)))
+    log(f"Categorized {updated} tasks in {time.perf_counter() - started:.1f}s")
+    return {"tasks": len(ids), "updated": updated, "clusters": n_clusters}
+
+
+class Categorizer:
+    """Assigns categories to freshly encoded tasks; registered with the Embedder."""
+
+    def __init__(self, db_path: str, model_name: str = SENTENCE_MODEL):
+        self.db_path = db_path
+        self.model_name = model_name
+        self.categorized = 0
+
+    def __call__(self, task_ids: List[int], vectors) -> None:
+        manager = db.get_manager(self.db_path)
+        with manager.read() as conn:
+            labels, centroids = load_categories(conn, self.model_name)
+        if centroids is None or centroids.shape[1] != vectors.shape[1]:
+            return
+        categories = nearest_categories(vectors, centroids, labels)
+        params = list(zip(categories, task_ids))
+        self.categorized += manager.run_write(lambda conn: conn.executemany(_UPDATE_CATEGORY, params).rowcount)
+
+
+@db.per_db_singleton
+def get_categorizer(db_path: str) -> Categorizer:
+    """Return the categorizer for ``db_path``, hooked into its Embedder on first use."""
+    categorizer = Categorizer(db_path)
+    embeddings.get_embedder(db_path).add_listener(categorizer)
+    return categorizer
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Learn and assign task categories")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="cluster task embeddings and categorize every task")
+    schema.add_db_argument(build_parser)
+    build_parser.add_argument("--clusters", type=int, default=DEFAULT_CLUSTERS, help="number of categories")
+    build_parser.add_argument("--workers", type=int, default=None, help="spaCy worker processes")
+    args = schema.parse_cli_args(parser, argv)
+
+    try:
+        build(db.get_manager(args.db), args.clusters, args.workers,
+              log=lambda message: print(message, file=sys.stderr))
+    except ValueError as e:
+        sys.exit(str(e))
+
+
+if __name__ == "__main__":
+    main()
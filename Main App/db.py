@@ -0,0 +1,423 @@
+"""Per-process SQLite connection management.
+
+Every operation used to open a fresh ``sqlite3.connect`` with default
+settings. Instead, each database file gets one ``ConnectionManager`` per
+process with:
+
+* a pool of read-only connections, handed out one thread at a time;
+* a single writer connection behind a lock, so writes in this process
+  never fight each other for SQLite's write lock;
+* WAL journaling, so readers don't block the writer and vice versa;
+* tuned pragmas (``busy_timeout``, ``synchronous=NORMAL``, ``mmap_size``,
+  ``cache_size``);
+* long-lived connections, so sqlite3's per-connection statement cache
+  actually gets reused between reruns;
+* a write queue: small mutations are handed to one writer thread, which
+  commits whatever is pending as a group, so a burst of writes from many
+  sessions pays for one fsync instead of one each.
+
+``count_statements()`` counts the statements issued on behalf of the code
+inside it, including its queued writes, so a rerun can report its own
+SQL traffic. Statements are also timed inside ``profiling.record()``.
+
+Also shared by the other modules: ``per_db_singleton`` for their
+process-wide ``get_*`` accessors, and ``ChangeLog`` for the trigger-filled
+change logs that in-memory indexes sync from.
+"""
+import contextlib
+import contextvars
+from collections import Counter
+from concurrent.futures import Future
+import functools
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import profiling
+
+READ_POOL_SIZE = 4
+BUSY_TIMEOUT_MS = 5000
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KIB = 64 * 1024
+CACHED_STATEMENTS = 256
+SYNCHRONOUS = "NORMAL"
+GROUP_COMMIT_MAX_BATCH = 256
+GROUP_COMMIT_MAX_WAIT_MS = 2
+
+
+
+class StatementCounter:
+    """SQL statements run within one ``count_statements()`` block, by leading keyword"""
+
+    def __init__(self):
+        self.by_kind: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, sql: str) -> None:
+        kind = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else "?"
+        with self._lock:
+            self.by_kind[kind] += 1
+
+    @property
+    def total(self) -> int:
+        with self._lock:
+            return sum(self.by_kind.values())
+
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.by_kind.most_common())
+
+
+_statement_counter: "contextvars.ContextVar[Optional[StatementCounter]]" = contextvars.ContextVar(
+    "sql_statement_counter", default=None
+)
+
+
+class _InstrumentedConnection(sqlite3.Connection):
+    """Reports each execute/executemany call to the active StatementCounter,
+    and times it when a profiling recorder is active"""
+
+    def execute(self, sql, *args):
+        counter = _statement_counter.get()
+        if counter is not None:
+            counter.record(sql)
+        recorder = profiling.current()
+        if recorder is None:
+            return super().execute(sql, *args)
+        started = time.perf_counter_ns()
+        cursor = super().execute(sql, *args)
+        # rowcount is -1 for SELECTs; their rows are counted where they are fetched
+        recorder.add(profiling.sql_label(sql), "sql", started, time.perf_counter_ns(), {"rows": cursor.rowcount})
+        return cursor
+
+    def executemany(self, sql, *args):
+        counter = _statement_counter.get()
+        if counter is not None:
+            counter.record(sql)
+        recorder = profiling.current()
+        if recorder is None:
+            return super().executemany(sql, *args)
+        started = time.perf_counter_ns()
+        cursor = super().executemany(sql, *args)
+        recorder.add(profiling.sql_label(sql), "sql", started, time.perf_counter_ns(), {"rows": cursor.rowcount})
+        return cursor
+
+
+@contextlib.contextmanager
+def count_statements() -> Iterator[StatementCounter]:
+    """Count the SQL statements issued by the enclosed code."""
+    counter = StatementCounter()
+    token = _statement_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _statement_counter.reset(token)
+
+
+def connect(db_path: str, readonly: bool = False) -> sqlite3.Connection:
+    """Open a connection with the app's pragmas applied.
+
+    The connection is in autocommit mode; use explicit transactions.
+    """
+    conn = sqlite3.connect(
+        db_path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=CACHED_STATEMENTS,
+        factory=_InstrumentedConnection,
+    )
+    # Setup runs once per connection, not on behalf of whoever opened it
+    token = _statement_counter.set(None)
+    try:
+        with profiling.paused():
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+            conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+            conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            if readonly:
+                conn.execute("PRAGMA query_only = 1")
+    finally:
+        _statement_counter.reset(token)
+    return conn
+
+
+class _WaitStats:
+    """Running totals for how long callers waited for a connection"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "acquisitions": self.count,
+            "avg_wait_ms": self.total_seconds / self.count * 1000 if self.count else 0.0,
+            "max_wait_ms": self.max_seconds * 1000,
+        }
+
+
+class ConnectionManager:
+    """Read pool plus a single serialized writer for one database file"""
+
+    def __init__(self, db_path: str, read_pool_size: int = READ_POOL_SIZE):
+        self.db_path = db_path
+        self.read_pool_size = read_pool_size
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._readers_created = 0
+        self._readers_lock = threading.Lock()
+        self._writer = connect(db_path)
+        self._writer_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._read_waits = _WaitStats()
+        self._write_waits = _WaitStats()
+        self._write_queue: "queue.Queue[Tuple[Callable[[sqlite3.Connection], Any], Future]]" = queue.Queue()
+        self._writer_thread: Optional[threading.Thread] = None
+        self._writer_thread_lock = threading.Lock()
+        self._group_commits = 0
+        self._queued_writes = 0
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        # Open connections lazily up to the pool size, then wait for one
+        with self._readers_lock:
+            if self._readers_created < self.read_pool_size:
+                self._readers_created += 1
+                return connect(self.db_path, readonly=True)
+        return self._readers.get()
+
+    @contextlib.contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a read-only connection from the pool."""
+        started = time.perf_counter()
+        conn = self._acquire_reader()
+        waited = time.perf_counter() - started
+        with self._stats_lock:
+            self._read_waits.record(waited)
+        try:
+            yield conn
+        finally:
+            conn.row_factory = None
+            self._readers.put(conn)
+
+    @contextlib.contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """Run a write transaction on the single writer connection.
+
+        Commits when the block exits normally and rolls back on error.
+        """
+        started = time.perf_counter()
+        with self._writer_lock:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self._write_waits.record(waited)
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                # SQLite may already have rolled back after some errors
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+            finally:
+                conn.row_factory = None
+
+    def submit(self, operation: Callable[[sqlite3.Connection], Any]) -> "Future[Any]":
+        """Queue ``operation(conn)`` for the group-commit writer.
+
+        The returned future resolves to the operation's return value once
+        the group it ran in has committed, or to the exception it raised.
+        A failing operation is rolled back on its own and does not affect
+        the others in its group.
+        """
+        future: "Future[Any]" = Future()
+        if _statement_counter.get() is not None or profiling.current() is not None:
+            # Run in the caller's context so its statements are counted and timed there
+            operation = functools.partial(contextvars.copy_context().run, operation)
+        self._ensure_writer_thread()
+        self._write_queue.put((operation, future))
+        return future
+
+    def run_write(self, operation: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Submit ``operation`` and wait for it to commit."""
+        return self.submit(operation).result()
+
+    def _ensure_writer_thread(self) -> None:
+        if self._writer_thread is not None:
+            return
+        with self._writer_thread_lock:
+            if self._writer_thread is None:
+                self._writer_thread = threading.Thread(
+                    target=self._drain_writes, name="sqlite-group-writer", daemon=True
+                )
+                self._writer_thread.start()
+
+    def _next_group(self) -> List[Tuple[Callable[[sqlite3.Connection], Any], Future]]:
+        """Block for one write, then collect more until the batch or wait bound."""
+        group = [self._write_queue.get()]
+        deadline = time.perf_counter() + GROUP_COMMIT_MAX_WAIT_MS / 1000
+        while len(group) < GROUP_COMMIT_MAX_BATCH:
+            remaining = deadline - time.perf_counter()
+            try:
+                group.append(self._write_queue.get(timeout=max(remaining, 0)) if remaining > 0
+                             else self._write_queue.get_nowait())
+            except queue.Empty:
+                break
+        return group
+
+    def _drain_writes(self) -> None:
+        while True:
+            group = self._next_group()
+            with self._writer_lock:
+                self._commit_group(group)
+
+    def _commit_group(self, group) -> None:
+        conn = self._writer
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for operation, future in group:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT queued_write")
+                try:
+                    result = operation(conn)
+                except BaseException as e:
+                    conn.execute("ROLLBACK TO queued_write")
+                    conn.execute("RELEASE queued_write")
+                    outcomes.append((future, None, e))
+                else:
+                    conn.execute("RELEASE queued_write")
+                    outcomes.append((future, result, None))
+                finally:
+                    conn.row_factory = None
+            conn.execute("COMMIT")
+        except BaseException as e:
+            # The whole group is lost: every caller still waiting gets the error
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, future in group:
+                if future.done():
+                    continue
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return
+
+        with self._stats_lock:
+            self._group_commits += 1
+            self._queued_writes += len(outcomes)
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Pool wait-time and group-commit metrics for the debug sidebar."""
+        with self._stats_lock:
+            return {
+                "read": dict(self._read_waits.as_dict(),
+                             pool_size=self.read_pool_size,
+                             open=self._readers_created,
+                             idle=self._readers.qsize()),
+                "write": self._write_waits.as_dict(),
+                "group_commit": {
+                    "commits": self._group_commits,
+                    "writes": self._queued_writes,
+                    "avg_group_size": self._queued_writes / self._group_commits
+                    if self._group_commits else 0.0,
+                    "pending": self._write_queue.qsize(),
+                },
+            }
+
+
+def per_db_singleton(create: Optional[Callable] = None, *, key: Optional[Callable] = None):
+    """Decorator for ``get_*(db_path, ...)`` accessors of process-wide objects.
+
+    ``create`` runs once per database file, under a lock, and later calls
+    return what it returned without locking. Databases are told apart by
+    the real path of ``db_path``; ``key``, if given, is called with the
+    remaining arguments and its result tells apart several objects for one
+    database. Without it those arguments only matter on the first call.
+    """
+    if create is None:
+        return functools.partial(per_db_singleton, key=key)
+    instances: Dict[Tuple[str, Any], Any] = {}
+    lock = threading.Lock()
+
+    @functools.wraps(create)
+    def get(db_path: str, *args, **kwargs):
+        instance_key = (os.path.realpath(db_path), key(*args, **kwargs) if key else None)
+        instance = instances.get(instance_key)
+        if instance is None:
+            with lock:
+                instance = instances.get(instance_key)
+                if instance is None:
+                    instance = instances[instance_key] = create(db_path, *args, **kwargs)
+        return instance
+    return get
+
+
+@per_db_singleton
+def get_manager(db_path: str) -> ConnectionManager:
+    """Return the shared connection manager for ``db_path``."""
+    return ConnectionManager(db_path)
+
+
+class ChangeLog:
+    """Reader for a change log table ``(seq INTEGER PRIMARY KEY AUTOINCREMENT, task_id)``.
+
+    Triggers append a row per change. A reader remembers the last ``seq``
+    it applied and asks for the tasks changed since; once rows it hasn't
+    seen have been trimmed, it has to reload instead.
+    """
+
+    def __init__(self, table: str):
+        self.table = table
+
+    def latest(self, conn: sqlite3.Connection) -> int:
+        """The newest ``seq`` ever handed out; trimming doesn't lower it."""
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (self.table,)).fetchone()
+        return row[0] if row else 0
+
+    def changed_since(self, conn: sqlite3.Connection, seq: int) -> Optional[Tuple[int, List[int]]]:
+        """Return ``(latest, task_ids changed after seq)``, or None if some were trimmed."""
+        latest = self.latest(conn)
+        if latest <= seq:
+            return latest, []
+        oldest = conn.execute(f"SELECT MIN(seq) FROM {self.table}").fetchone()[0]
+        if oldest is None or oldest > seq + 1:
+            return None
+        changed = [row[0] for row in conn.execute(
+            f"SELECT DISTINCT task_id FROM {self.table} WHERE seq > ? AND seq <= ?", (seq, latest)
+        )]
+        return latest, changed
+
+    def trim(self, manager: ConnectionManager, synced_seq: int, max_rows: int) -> None:
+        """Drop the rows up to ``synced_seq`` once the log passes ``max_rows``.
+
+        Readers in other processes that hadn't got that far notice the gap
+        and reload.
+        """
+        with manager.read() as conn:
+            oldest, newest = conn.execute(f"SELECT MIN(seq), MAX(seq) FROM {self.table}").fetchone()
+        if oldest is None or newest - oldest < max_rows or synced_seq < oldest:
+            return
+        manager.run_write(lambda conn: conn.execute(f"DELETE FROM {self.table} WHERE seq <= ?", (synced_seq,)))
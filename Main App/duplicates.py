@@ -0,0 +1,156 @@
+"""Near-duplicate task detection on the stored embeddings.
+
+At submit time, ``find_duplicates`` encodes only the new task's text and
+looks it up in the shared ``vector_index.SemanticIndex``, so the check is one
+encode plus a top-k query (a wider one only when completed tasks fill the
+top k).
+
+``duplicate_clusters`` finds groups of near-duplicates across the whole
+database. Comparing every pair is quadratic, so the vectors are first
+partitioned into IVF lists, and each list is only compared with the few
+lists whose centroids are closest to it. That costs about
+``n * sqrt(n) * probes`` dot products instead of ``n * n``::
+
+    python duplicates.py report tasks.db --threshold 0.9
+"""
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+import db
+import embeddings
+import queries
+import schema
+import vector_index
+
+DUPLICATE_THRESHOLD = 0.9
+DUPLICATE_CANDIDATES = 10
+# Near-duplicates sit very close together, so few neighbouring lists suffice
+CLUSTER_PROBES = 3
+# Below this, one exact block is cheaper than clustering
+CLUSTER_EXACT_MAX_ROWS = 2_000
+
+
+def find_duplicates(index: vector_index.SemanticIndex, manager: db.ConnectionManager,
+                    title: str, description: str, threshold: float = DUPLICATE_THRESHOLD,
+                    k: int = DUPLICATE_CANDIDATES) -> List[Dict]:
+    """Return up to ``k`` open tasks whose text is at least ``threshold`` similar, best first.
+
+    Each result is the task row plus a ``similarity`` key. Completed tasks
+    can crowd the nearest neighbours, so the search widens until it has
+    ``k`` open ones or runs out of hits above ``threshold``.
+    """
+    query = embeddings.encode([embeddings.embedding_text(title, description)])[0]
+    wanted = k
+    while True:
+        hits = index.search(query, wanted)
+        close = [(task_id, score) for task_id, score in hits if score >= threshold]
+        rows = _open_tasks(manager, [task_id for task_id, _ in close]) if close else {}
+        found = [dict(rows[task_id], similarity=score) for task_id, score in close if task_id in rows]
+        if len(found) >= k or len(close) < wanted:
+            return found[:k]
+        wanted *= 4
+
+
+def _open_tasks(manager: db.ConnectionManager, task_ids: List[int]) -> Dict[int, Dict]:
+    query, params = queries.tasks_by_ids_query("Pending", task_ids)
+    with manager.read() as conn:
+        cursor = conn.execute(query, params)
+        columns = [d[0] for d in cursor.description]
+        return {row[0]: dict(zip(columns, row)) for row in cursor}
+
+
+class _DisjointSet:
+    def __init__(self):
+        self.parent: Dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        parent = self.parent.setdefault(item, item)
+        while parent != item:
+            grandparent = self.parent[parent]
+            self.parent[item] = grandparent
+            item, parent = parent, grandparent
+        return item
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def duplicate_pairs(task_ids, matrix, threshold: float = DUPLICATE_THRESHOLD,
+                    probes: int = CLUSTER_PROBES) -> List[Tuple[int, int, float]]:
+    """Return ``(task_id, task_id, similarity)`` for every pair at or above ``threshold``.
+
+    Pairs in lists that aren't probed from each other are missed, so this
+    is approximate above ``CLUSTER_EXACT_MAX_ROWS`` vectors.
+    """
+    import numpy as np
+
+    base = vector_index._Base(task_ids, matrix)
+    if len(base) > CLUSTER_EXACT_MAX_ROWS:
+        base = vector_index.build_ivf(base)
+        lists = [slice(base.offsets[i], base.offsets[i + 1]) for i in range(len(base.centroids))]
+        neighbours = [vector_index.top_k(base.centroids @ centroid, probes) for centroid in base.centroids]
+    else:
+        lists = [slice(0, len(base))]
+        neighbours = [np.array([0])]
+
+    pairs: Dict[Tuple[int, int], float] = {}
+    for own, near in zip(lists, neighbours):
+        block = base.matrix[own]
+        if not len(block):
+            continue
+        others = np.concatenate([np.arange(lists[j].start, lists[j].stop) for j in near])
+        similarity = block @ base.matrix[others].T
+        rows, cols = np.nonzero(similarity >= threshold)
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            a, b = int(base.task_ids[own.start + row]), int(base.task_ids[others[col]])
+            # Lists that probe each other see a pair twice; a task always matches itself
+            if a != b:
+                pairs[min(a, b), max(a, b)] = float(similarity[row, col])
+    return [(a, b, score) for (a, b), score in pairs.items()]
+
+
+def duplicate_clusters(task_ids, matrix, threshold: float = DUPLICATE_THRESHOLD) -> List[List[int]]:
+    """Group tasks connected by near-duplicate pairs, largest groups first."""
+    groups = _DisjointSet()
+    for a, b, _ in duplicate_pairs(task_ids, matrix, threshold):
+        groups.union(a, b)
+    clusters: Dict[int, List[int]] = {}
+    for task_id in groups.parent:
+        clusters.setdefault(groups.find(task_id), []).append(task_id)
+    return sorted((sorted(members) for members in clusters.values()), key=lambda c: (-len(c), c[0]))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Find near-duplicate tasks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report_parser = subparsers.add_parser("report", help="list clusters of near-duplicate tasks")
+    schema.add_db_argument(report_parser)
+    report_parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD,
+                               help="minimum cosine similarity")
+    args = schema.parse_cli_args(parser, argv)
+
+    manager = db.get_manager(args.db)
+    with manager.read() as conn:
+        task_ids, matrix = embeddings.load_matrix(conn)
+    clusters = duplicate_clusters(task_ids, matrix, args.threshold)
+    if not clusters:
+        print(f"No near-duplicates among {len(task_ids)} embedded tasks.")
+        return
+
+    print(f"{len(clusters)} clusters of near-duplicates among {len(task_ids)} embedded tasks:")
+    with manager.read() as conn:
+        for members in clusters:
+            query, params = queries.tasks_by_ids_query("All", members)
+            titles = {row[0]: (row[1], row[2]) for row in conn.execute(
+                f"SELECT id, title, status FROM ({query})", params
+            )}
+            print()
+            for task_id in members:
+                title, status = titles.get(task_id, ("(deleted)", ""))
+                print(f"  #{task_id} [{status}] {title}")
+
+
+if __name__ == "__main__":
+    main()
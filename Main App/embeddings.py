@@ -0,0 +1,268 @@
+"""Persistent sentence embeddings for tasks.
+
+Each task's title and description are encoded once with the shared
+SentenceTransformer and stored in ``task_embeddings`` as a float32 BLOB,
+together with the model name and a SHA-256 of the text that was encoded.
+A task needs (re-)encoding only when it has no row, or when its text or
+the model no longer match that row.
+
+New and edited tasks are queued on a background ``Embedder`` thread, so
+requests never wait for the model. Re-indexing everything, e.g. after a
+model change, is a batch job that commits as it goes and picks up where
+it stopped when run again::
+
+    python embeddings.py reindex tasks.db
+
+numpy is imported lazily, like the models themselves, so importing this
+module costs nothing at app startup.
+"""
+import argparse
+import hashlib
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import db
+import schema
+from model_registry import SENTENCE_MODEL, get_sentence_model
+
+ENCODE_BATCH_SIZE = 64
+REINDEX_BATCH_SIZE = 1024
+
+_PENDING_SQL = """
+    SELECT t.id, t.title, t.description, e.model, e.content_hash
+    FROM tasks t LEFT JOIN task_embeddings e ON e.task_id = t.id
+"""
+
+
+def embedding_text(title: Optional[str], description: Optional[str]) -> str:
+    return f"{title or ''}\n{description or ''}".strip()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _stale(rows: Iterable[tuple], model_name: str) -> List[Tuple[int, str, str]]:
+    """Keep the ``(id, text, hash)`` of rows whose stored embedding is out of date."""
+    stale = []
+    for task_id, title, description, model, stored_hash in rows:
+        text = embedding_text(title, description)
+        digest = content_hash(text)
+        if model != model_name or stored_hash != digest:
+            stale.append((task_id, text, digest))
+    return stale
+
+
+def encode(texts: Sequence[str], batch_size: int = ENCODE_BATCH_SIZE):
+    """Encode texts into an (n, dim) float32 matrix of unit vectors."""
+    import numpy as np
+
+    vectors = get_sentence_model().encode(
+        list(texts), batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True
+    )
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def _save(conn: sqlite3.Connection, model_name: str, tasks: List[Tuple[int, str, str]], vectors) -> int:
+    dim = vectors.shape[1]
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO task_embeddings (task_id, model, content_hash, dim, vector, updated_at)
+        SELECT ?, ?, ?, ?, ?, datetime('now') WHERE EXISTS (SELECT 1 FROM tasks WHERE id = ?)
+        """,
+        [
+            (task_id, model_name, digest, dim, vector.tobytes(), task_id)
+            for (task_id, _, digest), vector in zip(tasks, vectors)
+        ],
+    )
+    return len(tasks)
+
+
+def _encode_and_save(manager: db.ConnectionManager, model_name: str,
+                     tasks: List[Tuple[int, str, str]],
+                     on_saved: Optional[Callable[[List[int], Any], None]] = None) -> int:
+    if not tasks:
+        return 0
+    # Identical texts (templated tasks, duplicates) are encoded once
+    unique = list(dict.fromkeys(text for _, text, _ in tasks))
+    unique_vectors = encode(unique)
+    position = {text: i for i, text in enumerate(unique)}
+    vectors = unique_vectors[[position[text] for _, text, _ in tasks]]
+    saved = manager.run_write(lambda conn: _save(conn, model_name, tasks, vectors))
+    if on_saved is not None:
+        on_saved([task_id for task_id, _, _ in tasks], vectors)
+    return saved
+
+
+def embed_tasks(manager: db.ConnectionManager, task_ids: Sequence[int],
+                model_name: str = SENTENCE_MODEL,
+                on_saved: Optional[Callable[[List[int], Any], None]] = None) -> int:
+    """Encode the given tasks if their embedding is missing or stale.
+
+    ``on_saved(task_ids, vectors)`` is called with what was written, for
+    stages that work off fresh vectors.
+    """
+    stale = []
+    with manager.read() as conn:
+        for start in range(0, len(task_ids), REINDEX_BATCH_SIZE):
+            chunk = list(task_ids[start:start + REINDEX_BATCH_SIZE])
+            placeholders = ", ".join("?" * len(chunk))
+            rows = conn.execute(f"{_PENDING_SQL} WHERE t.id IN ({placeholders})", chunk).fetchall()
+            stale.extend(_stale(rows, model_name))
+    return _encode_and_save(manager, model_name, stale, on_saved)
+
+
+def reindex(manager: db.ConnectionManager, model_name: str = SENTENCE_MODEL,
+            batch_size: int = REINDEX_BATCH_SIZE, progress=None) -> int:
+    """Bring every task's embedding up to date, one committed batch at a time.
+
+    Tasks are walked in id order; batches already done are skipped by the
+    hash check, so an interrupted run resumes cheaply. The change log is
+    cleared at the end, which makes vector indexes reload in full. ``progress``, if
+    given, is called with ``(last_task_id, encoded_so_far)`` after each
+    batch.
+    """
+    encoded = 0
+    last_id = 0
+    while True:
+        with manager.read() as conn:
+            rows = conn.execute(
+                f"{_PENDING_SQL} WHERE t.id > ? ORDER BY t.id LIMIT ?", (last_id, batch_size)
+            ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        encoded += _encode_and_save(manager, model_name, _stale(rows, model_name))
+        if progress is not None:
+            progress(last_id, encoded)
+    # Every vector index resyncs from scratch after this anyway
+    manager.run_write(lambda conn: conn.execute("DELETE FROM task_embedding_changes").rowcount)
+    return encoded
+
+
+def load_matrix(conn: sqlite3.Connection, model_name: str = SENTENCE_MODEL):
+    """Return ``(task_ids, matrix)`` for every stored embedding of ``model_name``.
+
+    ``matrix`` is a read-only (n, dim) float32 array laid over one
+    contiguous buffer with ``np.frombuffer``, so no per-row arrays are
+    built. Rows are in task id order.
+    """
+    import numpy as np
+
+    rows = conn.execute(
+        "SELECT task_id, dim, vector FROM task_embeddings WHERE model = ? ORDER BY task_id",
+        (model_name,),
+    ).fetchall()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+    dim = rows[0][1]
+    task_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    matrix = np.frombuffer(b"".join(row[2] for row in rows), dtype=np.float32).reshape(len(rows), dim)
+    return task_ids, matrix
+
+
+class Embedder:
+    """Background thread that encodes tasks queued by ``enqueue``.
+
+    Ids that arrive close together are encoded as one batch.
+    """
+
+    def __init__(self, db_path: str, model_name: str = SENTENCE_MODEL):
+        self.db_path = db_path
+        self.model_name = model_name
+        self._queue: "queue.Queue[int]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.encoded = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._listeners: List[Callable[[List[int], Any], None]] = []
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="task-embedder", daemon=True)
+                self._thread.start()
+
+    def add_listener(self, callback: Callable[[List[int], Any], None]) -> None:
+        """Call ``callback(task_ids, vectors)`` after each batch is saved."""
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def _notify(self, task_ids: List[int], vectors) -> None:
+        for callback in list(self._listeners):
+            callback(task_ids, vectors)
+
+    def enqueue(self, task_ids: Iterable[int]) -> None:
+        for task_id in task_ids:
+            if task_id is not None:
+                self._queue.put(task_id)
+
+    def _run(self) -> None:
+        manager = db.get_manager(self.db_path)
+        while True:
+            task_ids = [self._queue.get()]
+            while len(task_ids) < ENCODE_BATCH_SIZE:
+                try:
+                    task_ids.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                encoded = embed_tasks(manager, list(dict.fromkeys(task_ids)), self.model_name, self._notify)
+            except Exception as e:
+                # The model may be unavailable; the reindex job catches up later
+                with self._stats_lock:
+                    self.failures += 1
+                    self.last_error = str(e)
+                continue
+            with self._stats_lock:
+                self.encoded += encoded
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "encoded": self.encoded,
+                "pending": self._queue.qsize(),
+                "failures": self.failures,
+                "last_error": self.last_error,
+            }
+
+
+@db.per_db_singleton
+def get_embedder(db_path: str) -> Embedder:
+    """Return the running embedder for ``db_path``, starting it on first use."""
+    embedder = Embedder(db_path)
+    embedder.start()
+    return embedder
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain task embeddings")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    reindex_parser = subparsers.add_parser("reindex", help="encode every task whose embedding is missing or stale")
+    schema.add_db_argument(reindex_parser)
+    reindex_parser.add_argument("--batch-size", type=int, default=REINDEX_BATCH_SIZE, help="tasks per commit")
+    args = schema.parse_cli_args(parser, argv)
+
+    manager = db.get_manager(args.db)
+    started = time.perf_counter()
+
+    def progress(last_id: int, encoded: int) -> None:
+        elapsed = time.perf_counter() - started
+        print(f"\rup to task {last_id}: {encoded} encoded ({encoded / elapsed:.0f}/s)",
+              end="", file=sys.stderr, flush=True)
+
+    encoded = reindex(manager, batch_size=args.batch_size, progress=progress)
+    print(f"\nEncoded {encoded} tasks in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
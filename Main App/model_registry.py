@@ -0,0 +1,150 @@
+"""Process-wide registry for the NLP models used by the task manager.
+
+Streamlit re-executes the app script on every interaction, but imported
+modules stay in ``sys.modules`` for the lifetime of the server process.
+Keeping the models here means they are loaded once and shared by every
+session and rerun.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import profiling
+
+SPACY_MODEL = "en_core_web_sm"
+SENTENCE_MODEL = "all-MiniLM-L6-v2"
+
+
+def _rss_bytes() -> int:
+    """Return the resident set size of this process in bytes (0 if unknown)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak RSS: kilobytes on Linux, bytes on macOS
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if os.uname().sysname == "Darwin" else usage * 1024
+    except (ImportError, AttributeError):
+        return 0
+
+
+def _parameter_bytes(model: Any) -> Optional[int]:
+    """Return the size of a torch model's parameters, if it has any."""
+    parameters = getattr(model, "parameters", None)
+    if not callable(parameters):
+        return None
+    try:
+        return sum(p.numel() * p.element_size() for p in parameters())
+    except Exception:
+        return None
+
+
+class ModelRegistry:
+    """Lazily load named models once per process and record load metrics"""
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._warm_thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, loader: Callable[[], Any]) -> None:
+        """Register a zero-argument loader for a model name."""
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def get(self, name: str) -> Any:
+        """Return the model, loading it on first use."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model: {name}")
+
+        # Per-model lock so a background warm-up and a request never load twice
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            rss_before = _rss_bytes()
+            started = time.perf_counter()
+            try:
+                with profiling.span(f"load {name}", "model"):
+                    model = self._loaders[name]()
+            except Exception as e:
+                self._stats[name] = {"status": "failed", "error": str(e)}
+                raise
+            elapsed = time.perf_counter() - started
+
+            self._models[name] = model
+            self._stats[name] = {
+                "status": "loaded",
+                "load_seconds": elapsed,
+                "rss_delta_bytes": max(_rss_bytes() - rss_before, 0),
+                "parameter_bytes": _parameter_bytes(model),
+                "thread": threading.current_thread().name,
+            }
+            return model
+
+    def warm(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        """Load models in a daemon thread; safe to call on every rerun."""
+        with self._lock:
+            if self._warm_thread is not None:
+                return self._warm_thread
+            targets = list(names) if names is not None else list(self._loaders)
+
+            def _warm():
+                for name in targets:
+                    try:
+                        self.get(name)
+                    except Exception:
+                        # Failure is recorded in stats; the request path retries
+                        pass
+
+            self._warm_thread = threading.Thread(target=_warm, name="model-warmup", daemon=True)
+            self._warm_thread.start()
+            return self._warm_thread
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return load time and memory figures for every registered model."""
+        return {
+            name: dict(self._stats.get(name, {"status": "not loaded"}))
+            for name in self._loaders
+        }
+
+
+def _load_spacy():
+    import spacy
+    return spacy.load(SPACY_MODEL)
+
+
+def _load_sentence_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(SENTENCE_MODEL)
+
+
+registry = ModelRegistry()
+registry.register("nlp", _load_spacy)
+registry.register("sentence_model", _load_sentence_model)
+
+
+def get_nlp():
+    """Return the shared spaCy pipeline."""
+    return registry.get("nlp")
+
+
+def get_sentence_model():
+    """Return the shared SentenceTransformer model."""
+    return registry.get("sentence_model")
@@ -0,0 +1,220 @@
+"""Opt-in timing of one Streamlit rerun.
+
+Inside ``record()``, every ``AITaskManager`` method (see ``instrument``),
+every SQL statement run through a ``db`` connection, every cached read and
+every model load is recorded as a span: name, category, start and end from
+``time.perf_counter_ns`` and a few arguments such as the row count. Spans
+go into a bounded deque, so a runaway loop cannot grow a recording without
+limit; the oldest spans are dropped instead.
+
+Outside ``record()`` an instrumented call costs a wrapper call and one
+``ContextVar.get``, well under a microsecond
+(``benchmarks/bench_profiling.py``).
+Turn recording on from the sidebar, or for every session with::
+
+    TASK_MANAGER_PROFILE=1 streamlit run AI_agent_task_manager.py
+
+A recording exports as JSON, or as a Chrome trace that opens in
+``chrome://tracing`` or https://ui.perfetto.dev.
+"""
+import contextlib
+import contextvars
+import functools
+import inspect
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+ENV_VAR = "TASK_MANAGER_PROFILE"
+SPAN_BUFFER_SIZE = 20_000
+HISTORY_SIZE = 10
+SQL_LABEL_CHARS = 80
+
+
+class Span(NamedTuple):
+    name: str
+    category: str
+    start_ns: int
+    end_ns: int
+    thread: int
+    args: Optional[Dict[str, Any]]
+
+
+class Recorder:
+    """Spans recorded during one rerun, newest ``capacity`` kept"""
+
+    def __init__(self, label: str, capacity: int = SPAN_BUFFER_SIZE):
+        self.label = label
+        self.spans: "deque[Span]" = deque(maxlen=capacity)
+        self.recorded = 0
+        # The writer thread records too; the count and the buffer move together
+        self._lock = threading.Lock()
+        self.thread = threading.get_ident()
+        self.started_ns = time.perf_counter_ns()
+        self.ended_ns: Optional[int] = None
+
+    def add(self, name: str, category: str, start_ns: int, end_ns: int,
+            args: Optional[Dict[str, Any]] = None) -> None:
+        span = Span(name, category, start_ns, end_ns, threading.get_ident(), args)
+        with self._lock:
+            self.spans.append(span)
+            self.recorded += 1
+
+    @property
+    def dropped(self) -> int:
+        with self._lock:
+            return self.recorded - len(self.spans)
+
+    @property
+    def elapsed_ms(self) -> float:
+        return ((self.ended_ns or time.perf_counter_ns()) - self.started_ns) / 1e6
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Calls, total/max time and rows per span name, slowest total first.
+
+        Times include nested spans, so a method's total covers its queries.
+        """
+        totals: Dict[tuple, Dict[str, Any]] = {}
+        for span in list(self.spans):
+            entry = totals.get((span.category, span.name))
+            if entry is None:
+                entry = totals[(span.category, span.name)] = {
+                    "category": span.category, "name": span.name,
+                    "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0,
+                }
+            ms = (span.end_ns - span.start_ns) / 1e6
+            entry["calls"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+            if span.args and span.args.get("rows", -1) > 0:
+                entry["rows"] += span.args["rows"]
+        return sorted(totals.values(), key=lambda entry: -entry["total_ms"])
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "label": self.label,
+            "elapsed_ms": self.elapsed_ms,
+            "dropped_spans": self.dropped,
+            "summary": self.summary(),
+            "spans": [
+                {"name": span.name, "category": span.category,
+                 "start_ms": (span.start_ns - self.started_ns) / 1e6,
+                 "duration_ms": (span.end_ns - span.start_ns) / 1e6,
+                 "thread": span.thread, "args": span.args or {}}
+                for span in list(self.spans)
+            ],
+        }
+
+
+_recorder: "contextvars.ContextVar[Optional[Recorder]]" = contextvars.ContextVar(
+    "profile_recorder", default=None
+)
+
+
+def current() -> Optional[Recorder]:
+    """The recorder of the enclosing ``record()`` block, if any."""
+    return _recorder.get()
+
+
+def enabled_from_env() -> bool:
+    return os.environ.get(ENV_VAR, "").lower() in ("1", "true", "yes", "on")
+
+
+@contextlib.contextmanager
+def record(label: str, enabled: bool = True) -> Iterator[Optional[Recorder]]:
+    """Record the enclosed code; yields None when not ``enabled``."""
+    if not enabled:
+        yield None
+        return
+    recorder = Recorder(label)
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+        recorder.ended_ns = time.perf_counter_ns()
+
+
+@contextlib.contextmanager
+def paused() -> Iterator[None]:
+    """Record nothing inside, e.g. for work done once per connection."""
+    token = _recorder.set(None)
+    try:
+        yield
+    finally:
+        _recorder.reset(token)
+
+
+@contextlib.contextmanager
+def span(name: str, category: str = "app", **args) -> Iterator[None]:
+    """Record the enclosed code as one span, when recording."""
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+    started = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        recorder.add(name, category, started, time.perf_counter_ns(), args or None)
+
+
+def profiled(function: Callable, name: Optional[str] = None) -> Callable:
+    """Wrap ``function`` so each call is a "method" span while recording."""
+    name = name or function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        recorder = _recorder.get()
+        if recorder is None:
+            return function(*args, **kwargs)
+        started = time.perf_counter_ns()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            recorder.add(name, "method", started, time.perf_counter_ns())
+    return wrapper
+
+
+def instrument(cls: type) -> type:
+    """Class decorator: profile every plain method defined on ``cls``."""
+    for attr, value in list(vars(cls).items()):
+        if inspect.isfunction(value) and (attr == "__init__" or not attr.startswith("__")):
+            setattr(cls, attr, profiled(value))
+    return cls
+
+
+def sql_label(sql: str) -> str:
+    """One-line, shortened form of a statement, used as its span name."""
+    label = re.sub(r"\s+", " ", sql).strip()
+    return label if len(label) <= SQL_LABEL_CHARS else label[:SQL_LABEL_CHARS - 1] + "…"
+
+
+def chrome_trace(recorders: Iterable[Recorder]) -> Dict[str, Any]:
+    """Complete ("X") events for the Trace Event Format, one track per thread.
+
+    Timestamps share one clock, so several reruns line up one after another.
+    """
+    recorders = list(recorders)
+    if not recorders:
+        return {"traceEvents": [], "displayTimeUnit": "ms"}
+    base = min(recorder.started_ns for recorder in recorders)
+    pid = os.getpid()
+    events = []
+    for recorder in recorders:
+        events.append({
+            "name": recorder.label, "cat": "rerun", "ph": "X", "pid": pid,
+            "tid": recorder.thread,
+            "ts": (recorder.started_ns - base) / 1000,
+            "dur": ((recorder.ended_ns or recorder.started_ns) - recorder.started_ns) / 1000,
+        })
+        for span in list(recorder.spans):
+            events.append({
+                "name": span.name, "cat": span.category, "ph": "X", "pid": pid, "tid": span.thread,
+                "ts": (span.start_ns - base) / 1000, "dur": (span.end_ns - span.start_ns) / 1000,
+                "args": span.args or {},
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
@@ -0,0 +1,219 @@
+"""Read queries issued by the task manager UI.
+
+Keeping the statements in one place lets benchmarks/explain_queries.py run
+``EXPLAIN QUERY PLAN`` over every one of them. Writes all target a single
+row by ``id`` (a rowid lookup) and stay next to the code that issues them.
+"""
+import re
+from typing import List, Optional, Tuple, Union
+
+FILTER_OPTIONS = ["All", "Pending", "Completed", "Verified"]
+PAGE_SIZES = [10, 25, 50, 100]
+DEFAULT_PAGE_SIZE = 25
+
+SELECT_TASK_BY_ID = "SELECT * FROM tasks WHERE id=?"
+
+# Dashboard counters come from the task_stats rollup, an O(1) read
+VERIFICATION_STATS = """
+    SELECT total, completed, verified, approved, needs_revision, rejected, with_evidence
+    FROM task_stats
+    WHERE id = 1
+"""
+
+# Distinct values straight off idx_tasks_category_due
+CATEGORY_OPTIONS = "SELECT DISTINCT category FROM tasks WHERE category IS NOT NULL ORDER BY category"
+
+RECENT_VERIFICATIONS = """
+    SELECT title, verification_status, verified_at
+    FROM tasks
+    WHERE verified_at IS NOT NULL
+    ORDER BY verified_at DESC
+    LIMIT 5
+"""
+
+# One task's verification history, straight off idx_verification_events_task_ts
+VERIFICATION_TIMELINE = """
+    SELECT ts, status, comments, evidence_path
+    FROM verification_events
+    WHERE task_id = ?
+    ORDER BY ts, id
+"""
+
+def verification_timelines_query(task_ids: List[int]) -> Tuple[str, List]:
+    """Build the query for the histories of several tasks at once, grouped by task.
+
+    Each id is one probe of idx_verification_events_task_ts, so a page of
+    cards costs one statement instead of one per card.
+    """
+    return f"""
+        SELECT task_id, ts, status, comments, evidence_path
+        FROM verification_events
+        WHERE task_id IN ({', '.join('?' * len(task_ids))})
+        ORDER BY task_id, ts, id
+    """, list(task_ids)
+
+
+# The audit log for a date range, in order off idx_verification_events_ts
+VERIFICATION_EVENTS_RANGE = """
+    SELECT e.id, e.task_id, tasks.title, e.ts, e.status, e.comments, e.evidence_path
+    FROM verification_events AS e LEFT JOIN tasks ON tasks.id = e.task_id
+    WHERE e.ts >= ? AND e.ts < ?
+    ORDER BY e.ts, e.id
+"""
+
+
+# Ranked full-text search; rank is bm25 with the column weights set in schema.py
+TASK_SEARCH_COLUMNS = """
+    SELECT tasks.*,
+        highlight(tasks_fts, 0, '<mark>', '</mark>') AS title_highlight,
+        snippet(tasks_fts, -1, '<mark>', '</mark>', '…', 16) AS search_snippet
+"""
+
+_SEARCH_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_match_expression(search_query: str) -> Optional[str]:
+    """Turn free text from the search box into a safe FTS5 prefix query.
+
+    Every word becomes a quoted prefix term, so user input can never be
+    parsed as FTS5 syntax. Returns None if there is nothing to search for.
+    """
+    tokens = _SEARCH_TOKEN.findall(search_query or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def _task_filter(filter_option: str, search_query: str, by_id: bool = False,
+                 category: Optional[str] = None) -> Tuple[str, List[str], List]:
+    """Return ``(from_clause, conditions, params)`` shared by list and count.
+
+    ``by_id`` means the caller narrows to a list of ids, which should drive
+    the query instead of a status index.
+    """
+    conditions = []
+    params: List = []
+
+    match = fts_match_expression(search_query)
+    if match:
+        from_clause = "FROM tasks_fts JOIN tasks ON tasks.id = tasks_fts.rowid"
+        conditions.append("tasks_fts MATCH ?")
+        params.append(match)
+    else:
+        from_clause = "FROM tasks"
+
+    if filter_option != "All":
+        # When searching, the unary + keeps the planner driving from the FTS
+        # index (or the id list) instead of probing it once per row of a
+        # status index
+        prefix = "+" if match or by_id or category else ""
+        if filter_option == "Verified":
+            # is_verified is a generated column so this can use an index
+            conditions.append(f"{prefix}tasks.is_verified = 1")
+        else:
+            conditions.append(f"{prefix}tasks.status = ?")
+            params.append(filter_option)
+
+    if category:
+        # idx_tasks_category_due serves this in due-date order
+        prefix = "+" if match or by_id else ""
+        conditions.append(f"{prefix}tasks.category = ?")
+        params.append(category)
+
+    return from_clause, conditions, params
+
+
+def task_page_query(filter_option: str, search_query: str = "",
+                    cursor: Optional[Union[Tuple[Optional[str], int], int]] = None,
+                    page_size: int = DEFAULT_PAGE_SIZE, category: Optional[str] = None) -> Tuple[str, List]:
+    """Build the query for one page of the task list.
+
+    Without a search the list is ordered by ``(due_date, id)`` and ``cursor``
+    is the key of the last row on the previous page (keyset pagination), so
+    pages stay stable when rows are added or completed in between. Search
+    results are ordered by rank, which has no stable key, so there
+    ``cursor`` is a row offset. One extra row is fetched to tell whether a
+    next page exists. ``category``, if given, narrows to one category.
+    """
+    from_clause, conditions, params = _task_filter(filter_option, search_query, category=category)
+    searching = from_clause != "FROM tasks"
+
+    if searching:
+        query = f"{TASK_SEARCH_COLUMNS} {from_clause}"
+    else:
+        query = f"SELECT * {from_clause}"
+        if cursor is not None:
+            due_date, task_id = cursor
+            if due_date is None:
+                # NULL due dates sort first, so everything dated comes after them
+                conditions.append("((tasks.due_date IS NULL AND tasks.id > ?) OR tasks.due_date IS NOT NULL)")
+                params.append(task_id)
+            else:
+                conditions.append("(tasks.due_date, tasks.id) > (?, ?)")
+                params.extend([due_date, task_id])
+
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    if searching:
+        query += " ORDER BY tasks_fts.rank LIMIT ? OFFSET ?"
+        params.extend([page_size + 1, cursor or 0])
+    else:
+        query += " ORDER BY tasks.due_date ASC, tasks.id ASC LIMIT ?"
+        params.append(page_size + 1)
+    return query, params
+
+
+def task_count_query(filter_option: str, search_query: str = "",
+                     category: Optional[str] = None) -> Tuple[str, List]:
+    """Build the query counting all tasks that match the filter and search."""
+    from_clause, conditions, params = _task_filter(filter_option, search_query, category=category)
+    query = f"SELECT COUNT(*) AS total {from_clause}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query, params
+
+
+def tasks_by_ids_query(filter_option: str, task_ids: List[int],
+                       category: Optional[str] = None) -> Tuple[str, List]:
+    """Build the query fetching specific tasks (e.g. semantic search hits) that pass the filter.
+
+    Rows come back in no particular order; callers re-rank them.
+    """
+    from_clause, conditions, params = _task_filter(filter_option, "", by_id=True, category=category)
+    conditions.append(f"tasks.id IN ({', '.join('?' * len(task_ids))})")
+    params.extend(task_ids)
+    return f"SELECT * {from_clause} WHERE {' AND '.join(conditions)}", params
+
+
+def all_read_queries() -> List[Tuple[str, str, List]]:
+    """Return ``(name, sql, params)`` for every read the UI can issue."""
+    reads = [
+        ("task by id", SELECT_TASK_BY_ID, [1]),
+        ("verification stats", VERIFICATION_STATS, []),
+        ("recent verifications", RECENT_VERIFICATIONS, []),
+        ("category options", CATEGORY_OPTIONS, []),
+        ("verification timeline", VERIFICATION_TIMELINE, [1]),
+        ("verification events by date", VERIFICATION_EVENTS_RANGE, ["2025-01-01", "2025-07-01"]),
+        ("verification timelines", *verification_timelines_query(list(range(1, 26)))),
+    ]
+    for option in FILTER_OPTIONS:
+        sql, params = task_page_query(option)
+        reads.append((f"task list ({option})", sql, params))
+        sql, params = task_page_query(option, cursor=("2025-06-01", 1000))
+        reads.append((f"task list next page ({option})", sql, params))
+        sql, params = task_count_query(option)
+        reads.append((f"task count ({option})", sql, params))
+        sql, params = task_page_query(option, "report", cursor=50)
+        reads.append((f"task search ({option})", sql, params))
+        sql, params = task_count_query(option, "report")
+        reads.append((f"task search count ({option})", sql, params))
+        sql, params = tasks_by_ids_query(option, list(range(1, 201)))
+        reads.append((f"semantic hits ({option})", sql, params))
+        sql, params = task_page_query(option, cursor=("2025-06-01", 1000), category="Reports")
+        reads.append((f"task list by category ({option})", sql, params))
+        sql, params = task_count_query(option, category="Reports")
+        reads.append((f"task count by category ({option})", sql, params))
+        sql, params = task_page_query(option, "report", cursor=50, category="Reports")
+        reads.append((f"task search by category ({option})", sql, params))
+    return reads
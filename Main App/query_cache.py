@@ -0,0 +1,142 @@
+"""Process-wide cache of read query results.
+
+Most Streamlit reruns are read-only: a filter change or an expander click
+re-issues exactly the same SELECTs as the previous run. Results are cached
+by ``(sql, params)`` and stay valid while the database is unchanged, which
+is tracked by two counters:
+
+* ``PRAGMA data_version`` on the cache's own connection, which changes
+  whenever any other connection (in this process or another) commits;
+* a write counter bumped by ``invalidate()``, which the app's write
+  methods call right after they commit.
+
+When either counter moves, every entry is dropped.
+
+The lock only guards the entries. A miss runs its SQL on a pooled read
+connection with the lock released, so one slow query never stalls cache
+hits in other sessions, and its result is stored only if the version is
+still the one seen before the query ran.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import db
+import profiling
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def _estimate_size(columns: Sequence[str], rows: List[tuple]) -> int:
+    """Rough memory footprint of a result set in bytes."""
+    size = sys.getsizeof(rows) + sum(sys.getsizeof(c) for c in columns)
+    for row in rows:
+        size += sys.getsizeof(row)
+        for value in row:
+            size += sys.getsizeof(value)
+    return size
+
+
+class QueryCache:
+    """LRU cache of query results for one database file"""
+
+    def __init__(self, db_path: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._conn = db.connect(db_path, readonly=True)
+        self._manager = db.get_manager(db_path)
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[Tuple[str, tuple], Tuple[Sequence[str], List[tuple], int]]" = OrderedDict()
+        self._bytes = 0
+        self._write_counter = 0
+        self._version: Optional[Tuple[int, int]] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _current_version(self) -> Tuple[int, int]:
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return data_version, self._write_counter
+
+    def _check_version(self) -> Tuple[int, int]:
+        version = self._current_version()
+        if version != self._version:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+        return version
+
+    def invalidate(self) -> None:
+        """Drop all cached results; call after committing a write."""
+        with self._lock:
+            self._write_counter += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def query(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        """Return the rows of ``sql`` as fresh dicts, from cache if possible."""
+        key = (sql, tuple(params))
+        recorder = profiling.current()
+        started = time.perf_counter_ns() if recorder is not None else 0
+        with self._lock:
+            version = self._check_version()
+            entry = self._entries.get(key)
+            hit = entry is not None
+            if hit:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not hit:
+            with self._manager.read() as conn:
+                cursor = conn.execute(sql, key[1])
+                columns = [d[0] for d in cursor.description]
+                rows = cursor.fetchall()
+            entry = (columns, rows, _estimate_size(columns, rows))
+            with self._lock:
+                # A commit during the query may or may not be in ``rows``
+                if self._check_version() == version:
+                    self._store(key, entry)
+        columns, rows, _ = entry
+
+        if recorder is not None:
+            recorder.add(profiling.sql_label(sql), "query", started, time.perf_counter_ns(),
+                         {"rows": len(rows), "cached": hit})
+        # Callers may mutate the dicts, so never hand out shared objects
+        return [dict(zip(columns, row)) for row in rows]
+
+    def query_one(self, sql: str, params: Sequence[Any] = ()) -> Optional[Dict[str, Any]]:
+        rows = self.query(sql, params)
+        return rows[0] if rows else None
+
+    def _store(self, key, entry) -> None:
+        size = entry[2]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+@db.per_db_singleton
+def get_cache(db_path: str) -> QueryCache:
+    """Return the shared cache for ``db_path``, creating it on first use."""
+    return QueryCache(db_path)
@@ -0,0 +1,211 @@
+"""Turn free-text lines into task fields.
+
+    "Submit audit report to finance by next Friday, high priority"
+    -> title "Submit audit report to finance", due date next Friday, priority High
+
+Dates are found in three steps, cheapest first:
+
+1. a regex pass for the phrases people actually type ("tomorrow",
+   "next friday", "in 3 days", "2026-01-31", "end of month"), resolved
+   with plain date arithmetic;
+2. for lines that pass misses, spaCy's DATE entities, with the pipeline run
+   over all such lines at once through ``nlp.pipe``;
+3. ``dateparser`` on each entity's text, behind an LRU cache, since the
+   same few phrases come up again and again and dateparser takes
+   milliseconds per call.
+"""
+import calendar
+import datetime
+import functools
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from model_registry import get_nlp
+
+NLP_BATCH_SIZE = 64
+PHRASE_CACHE_SIZE = 1024
+
+PRIORITIES = {
+    "urgent": "High", "critical": "High", "high": "High", "asap": "High",
+    "medium": "Normal", "normal": "Normal",
+    "low": "Low",
+}
+
+_WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+_PRIORITY = re.compile(
+    r"\b(?:(urgent|critical|high|medium|normal|low)\s+priority"
+    r"|priority\s*[:=]?\s*(urgent|critical|high|medium|normal|low)"
+    r"|(urgent|asap))\b",
+    re.IGNORECASE,
+)
+
+_DATE_PHRASE = (
+    r"today|tonight|tomorrow"
+    r"|(?:next\s+|this\s+)?(?:" + "|".join(_WEEKDAYS) + r")"
+    r"|next\s+(?:week|month)"
+    r"|end\s+of\s+(?:the\s+)?(?:week|month)"
+    r"|in\s+\d+\s+(?:day|week|month)s?"
+    r"|\d{4}-\d{2}-\d{2}"
+)
+_START_WORDS = ("from", "starting", "start", "beginning")
+_DATE = re.compile(
+    r"(?:\b(?P<connector>by|due|before|until|on|from|starting|start|beginning)\s+)?"
+    r"\b(?P<phrase>" + _DATE_PHRASE + r")\b",
+    re.IGNORECASE,
+)
+_CONNECTOR_BEFORE = re.compile(r"\b(by|due|before|until|on|from|starting|start|beginning)\s*$", re.IGNORECASE)
+_LEFTOVER = re.compile(r"[\s,;:.\-–]+$|^[\s,;:\-–]+")
+
+
+class ParsedTask:
+    """Task fields pulled out of one quick-add line"""
+
+    def __init__(self, text: str, title: str, start_date: Optional[str],
+                 due_date: Optional[str], priority: str):
+        self.text = text
+        self.title = title
+        self.start_date = start_date
+        self.due_date = due_date
+        self.priority = priority
+
+    def as_dict(self) -> Dict[str, Optional[str]]:
+        return {
+            "title": self.title,
+            "start_date": self.start_date,
+            "due_date": self.due_date,
+            "priority": self.priority,
+        }
+
+    def __repr__(self):
+        return f"ParsedTask({self.as_dict()!r})"
+
+
+def _add_months(day: datetime.date, months: int) -> datetime.date:
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def resolve_phrase(phrase: str, today: datetime.date) -> Optional[datetime.date]:
+    """Resolve one of the regex-recognised phrases relative to ``today``."""
+    words = phrase.lower().split()
+    if words == ["today"] or words == ["tonight"]:
+        return today
+    if words == ["tomorrow"]:
+        return today + datetime.timedelta(days=1)
+    if words[-1] in _WEEKDAYS:
+        ahead = (_WEEKDAYS.index(words[-1]) - today.weekday()) % 7 or 7
+        day = today + datetime.timedelta(days=ahead)
+        # "next friday" said on a Monday means the one after this week's
+        if words[0] == "next" and day.isocalendar()[1] == today.isocalendar()[1]:
+            day += datetime.timedelta(days=7)
+        return day
+    if words == ["next", "week"]:
+        return today + datetime.timedelta(days=7)
+    if words == ["next", "month"]:
+        return _add_months(today, 1)
+    if words[:2] == ["end", "of"]:
+        if words[-1] == "week":
+            return today + datetime.timedelta(days=(4 - today.weekday()) % 7)
+        return today.replace(day=calendar.monthrange(today.year, today.month)[1])
+    if words[0] == "in":
+        count, unit = int(words[1]), words[2].rstrip("s")
+        if unit == "day":
+            return today + datetime.timedelta(days=count)
+        if unit == "week":
+            return today + datetime.timedelta(weeks=count)
+        return _add_months(today, count)
+    try:
+        return datetime.date.fromisoformat(phrase)
+    except ValueError:
+        return None
+
+
+@functools.lru_cache(maxsize=PHRASE_CACHE_SIZE)
+def parse_date_phrase(phrase: str, today_iso: str) -> Optional[str]:
+    """dateparser fallback for free-form phrases, cached per (phrase, day)."""
+    from dateparser import parse as date_parse
+
+    parsed = date_parse(phrase, settings={
+        "PREFER_DATES_FROM": "future",
+        "RELATIVE_BASE": datetime.datetime.fromisoformat(today_iso),
+    })
+    return parsed.date().isoformat() if parsed else None
+
+
+def _strip_spans(text: str, spans: List[Tuple[int, int]]) -> str:
+    for start, end in sorted(spans, reverse=True):
+        text = text[:start] + " " + text[end:]
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\s+([,;:.!?])", r"\1", text)
+    text = re.sub(r"([,;:])(?:\s*[,;:])+", r"\1", text)
+    text = _LEFTOVER.sub("", text).strip()
+    return text[:1].upper() + text[1:]
+
+
+def _regex_pass(text: str, today: datetime.date):
+    """Return ``(start, due, priority, spans)`` found without any NLP."""
+    spans: List[Tuple[int, int]] = []
+    start = due = None
+    priority = "Normal"
+
+    for match in _PRIORITY.finditer(text):
+        word = next(group for group in match.groups() if group)
+        priority = PRIORITIES[word.lower()]
+        spans.append(match.span())
+
+    for match in _DATE.finditer(text):
+        day = resolve_phrase(match.group("phrase"), today)
+        if day is None:
+            continue
+        connector = (match.group("connector") or "").lower()
+        if connector in _START_WORDS:
+            start = start or day.isoformat()
+        else:
+            due = due or day.isoformat()
+        spans.append(match.span())
+    return start, due, priority, spans
+
+
+def parse_lines(lines: Sequence[str], today: Optional[datetime.date] = None) -> List[ParsedTask]:
+    """Parse quick-add lines; blank lines are skipped."""
+    today = today or datetime.date.today()
+    texts = [line.strip() for line in lines if line and line.strip()]
+    found = [_regex_pass(text, today) for text in texts]
+
+    # Only lines with no date from the regex pass go through spaCy, all in one pipe
+    needs_nlp = [i for i, (start, due, _, _) in enumerate(found) if start is None and due is None]
+    if needs_nlp:
+        nlp = get_nlp()
+        docs = nlp.pipe((texts[i] for i in needs_nlp), batch_size=NLP_BATCH_SIZE)
+        for i, doc in zip(needs_nlp, docs):
+            start, due, priority, spans = found[i]
+            for ent in doc.ents:
+                if ent.label_ != "DATE":
+                    continue
+                day = parse_date_phrase(ent.text.lower(), today.isoformat())
+                if day is None:
+                    continue
+                connector = _CONNECTOR_BEFORE.search(texts[i][:ent.start_char])
+                if connector and connector.group(1).lower() in _START_WORDS:
+                    start = start or day
+                else:
+                    due = due or day
+                spans.append((connector.start() if connector else ent.start_char, ent.end_char))
+            found[i] = (start, due, priority, spans)
+
+    tasks = []
+    for text, (start, due, priority, spans) in zip(texts, found):
+        title = _strip_spans(text, spans) or text
+        tasks.append(ParsedTask(text, title, start or today.isoformat(), due, priority))
+    return tasks
+
+
+def parse_line(line: str, today: Optional[datetime.date] = None) -> Optional[ParsedTask]:
+    parsed = parse_lines([line], today)
+    return parsed[0] if parsed else None
+
+
+def cache_info():
+    return parse_date_phrase.cache_info()
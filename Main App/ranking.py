@@ -0,0 +1,360 @@
+"""Focus ranking: which open task to work on next.
+
+The score is a weighted sum of
+
+* priority (High / Normal / Low);
+* urgency: decays with the days left until the due date and keeps rising,
+  up to a cap, once the task is overdue;
+* age since ``created_at``, so old tasks don't sink forever;
+* rework: a task sent back as "Verified - Needs Revision" (or rejected)
+  goes to the front;
+* optionally, grouping: tasks in a category with a lot of urgent work get
+  a boost, so related tasks come up together.
+
+All open tasks are held as NumPy columns and scored in one vectorized
+pass, and the ``TOP_N`` best are kept on a min-heap. The ranking is kept
+current through ``task_changes``:
+
+* before each read, only the tasks changed since the last one are re-read
+  and rescored, and the heap is patched in place;
+* the heap is rebuilt, with one ``partition``, only when a task in it
+  closes or drops in score;
+* everything is rescored once a day, as urgency and age move with the
+  date.
+
+Ties go to the older task (lower id).
+"""
+import datetime
+import heapq
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import db
+
+TOP_N = 50
+WEIGHTS = {"priority": 3.0, "urgency": 4.0, "age": 1.0, "rework": 2.5, "group": 1.5}
+PRIORITY_SCORES = {"High": 1.0, "Normal": 0.5, "Low": 0.0}
+REWORK_SCORES = {"Verified - Needs Revision": 1.0, "Verified - Rejected": 0.5}
+# Urgency falls to 1/e this many days before the due date
+URGENCY_DAYS = 3.0
+# Overdue tasks gain up to this much extra urgency, over URGENCY_DAYS days
+OVERDUE_BONUS = 1.0
+AGE_CAP_DAYS = 30.0
+CHANGE_BATCH_SIZE = 500
+# Past this share of open tasks changed, a reload is cheaper than patching
+RELOAD_FRACTION = 0.2
+# Rows task_changes may reach before the applied ones are trimmed
+CHANGE_LOG_MAX_ROWS = 100_000
+
+CHANGES = db.ChangeLog("task_changes")
+_OPEN_TASKS = """
+    SELECT id, priority, substr(due_date, 1, 10), substr(created_at, 1, 10),
+           verification_status, category
+    FROM tasks WHERE status = 'Pending'
+"""
+
+
+def _days(values):
+    """ISO dates as float days since the epoch; NaN where missing or invalid."""
+    import numpy as np
+
+    try:
+        days = np.array(values, dtype="datetime64[D]")
+    except ValueError:
+        days = np.array([_parse_day(value) for value in values], dtype="datetime64[D]")
+    result = days.astype(np.int64).astype(np.float64)
+    result[np.isnat(days)] = np.nan
+    return result
+
+
+def _parse_day(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _today() -> int:
+    return (datetime.date.today() - datetime.date(1970, 1, 1)).days
+
+
+def urgency_scores(due, today: int):
+    """0 with no due date, 1 on the due date, up to ``1 + OVERDUE_BONUS`` when overdue."""
+    import numpy as np
+
+    days_left = due - today
+    upcoming = np.exp(-np.clip(days_left, 0, None) / URGENCY_DAYS)
+    overdue = 1 + OVERDUE_BONUS * np.clip(-days_left, 0, URGENCY_DAYS) / URGENCY_DAYS
+    return np.nan_to_num(np.where(days_left < 0, overdue, upcoming), nan=0.0)
+
+
+def age_scores(created, today: int):
+    import numpy as np
+
+    return np.nan_to_num(np.clip(today - created, 0, AGE_CAP_DAYS) / AGE_CAP_DAYS, nan=0.0)
+
+
+class FocusRanking:
+    """Process-wide ranking of the open tasks in one database."""
+
+    def __init__(self, db_path: str, grouped: bool = False, top_n: int = TOP_N):
+        self.db_path = db_path
+        self.grouped = grouped
+        self.top_n = top_n
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._day: Optional[int] = None
+        self._positions: Dict[int, int] = {}
+        self._columns: Optional[Dict[str, Any]] = None
+        self._categories: Dict[str, int] = {}
+        self._group_means = None
+        self._top: List[Tuple[float, int]] = []
+        self._top_ids: set = set()
+        self.loads = 0
+        self.patches = 0
+        self.top_rebuilds = 0
+        self.last_sync_ms = 0.0
+
+    # Loading and scoring
+
+    def _rows_to_columns(self, rows) -> Dict[str, Any]:
+        import numpy as np
+
+        codes = []
+        for row in rows:
+            category = row[5]
+            codes.append(self._categories.setdefault(category, len(self._categories)) if category else -1)
+        return {
+            "id": np.array([row[0] for row in rows], dtype=np.int64),
+            "priority": np.array([PRIORITY_SCORES.get(row[1], PRIORITY_SCORES["Normal"]) for row in rows],
+                                 dtype=np.float64),
+            "due": _days([row[2] for row in rows]),
+            "created": _days([row[3] for row in rows]),
+            "rework": np.array([REWORK_SCORES.get(row[4], 0.0) for row in rows], dtype=np.float64),
+            "group": np.array(codes, dtype=np.int64),
+            "open": np.ones(len(rows), dtype=bool),
+        }
+
+    def _load(self, conn) -> None:
+        import numpy as np
+
+        seq = CHANGES.latest(conn)
+        rows = conn.execute(_OPEN_TASKS).fetchall()
+        self._categories = {}
+        columns = self._rows_to_columns(rows)
+        columns["urgency"] = np.zeros(len(rows))
+        columns["score"] = np.zeros(len(rows))
+        self._columns = columns
+        self._positions = {task_id: i for i, task_id in enumerate(columns["id"].tolist())}
+        self._seq = seq
+        self._rescore_all()
+        self.loads += 1
+
+    def _scores(self, index, today: int):
+        """Scores for the rows at ``index`` (a slice or positions), group term excluded."""
+        c = self._columns
+        urgency = urgency_scores(c["due"][index], today)
+        score = (WEIGHTS["priority"] * c["priority"][index]
+                 + WEIGHTS["urgency"] * urgency
+                 + WEIGHTS["age"] * age_scores(c["created"][index], today)
+                 + WEIGHTS["rework"] * c["rework"][index])
+        return urgency, score
+
+    def _group_term(self, index):
+        import numpy as np
+
+        groups = self._columns["group"][index]
+        return np.where(groups >= 0, self._group_means[np.clip(groups, 0, None)], 0.0)
+
+    def _compute_group_means(self):
+        import numpy as np
+
+        c = self._columns
+        member = c["open"] & (c["group"] >= 0)
+        size = max(len(self._categories), 1)
+        totals = np.bincount(c["group"][member], weights=c["urgency"][member], minlength=size)
+        counts = np.bincount(c["group"][member], minlength=size)
+        return WEIGHTS["group"] * totals / np.maximum(counts, 1)
+
+    def _rescore_all(self) -> None:
+        import numpy as np
+
+        c = self._columns
+        self._day = _today()
+        c["urgency"], c["score"] = self._scores(slice(None), self._day)
+        if self.grouped:
+            self._group_means = self._compute_group_means()
+            c["score"] = c["score"] + self._group_term(slice(None))
+        c["score"][~c["open"]] = -np.inf
+        self._rebuild_top()
+
+    def _rebuild_top(self) -> None:
+        import numpy as np
+
+        scores, ids = self._columns["score"], self._columns["id"]
+        candidates = np.nonzero(np.isfinite(scores))[0]
+        if len(candidates) > self.top_n:
+            cutoff = np.partition(scores[candidates], len(candidates) - self.top_n)[len(candidates) - self.top_n]
+            candidates = candidates[scores[candidates] >= cutoff]
+        best = candidates[np.lexsort((ids[candidates], -scores[candidates]))][:self.top_n]
+        # Heap entries are (score, -id), so on equal scores the lower id ranks higher
+        self._top = [(float(scores[i]), -int(ids[i])) for i in best.tolist()]
+        heapq.heapify(self._top)
+        self._top_ids = {-key for _, key in self._top}
+        self.top_rebuilds += 1
+
+    # Incremental updates
+
+    def _apply(self, conn, changed: List[int]) -> None:
+        import numpy as np
+
+        rows = []
+        for start in range(0, len(changed), CHANGE_BATCH_SIZE):
+            chunk = changed[start:start + CHANGE_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(chunk))
+            rows.extend(conn.execute(f"{_OPEN_TASKS} AND id IN ({placeholders})", chunk).fetchall())
+
+        c = self._columns
+        fresh = self._rows_to_columns(rows)
+        new_rows = [i for i, task_id in enumerate(fresh["id"].tolist()) if task_id not in self._positions]
+        if new_rows:
+            for name, values in fresh.items():
+                c[name] = np.concatenate([c[name], values[new_rows]])
+            for name in ("urgency", "score"):
+                c[name] = np.concatenate([c[name], np.full(len(new_rows), -np.inf)])
+            for i, task_id in enumerate(fresh["id"][new_rows].tolist(), start=len(self._positions)):
+                self._positions[task_id] = i
+
+        positions = np.array([self._positions[task_id] for task_id in fresh["id"].tolist()], dtype=np.int64)
+        for name in ("priority", "due", "created", "rework", "group", "open"):
+            c[name][positions] = fresh[name]
+        # Tasks that are no longer open (completed or deleted) drop out
+        still_open = set(fresh["id"].tolist())
+        closed = np.array([self._positions[task_id] for task_id in changed
+                           if task_id in self._positions and task_id not in still_open], dtype=np.int64)
+        c["open"][closed] = False
+
+        touched = np.concatenate([positions, closed])
+        old_scores = c["score"][touched].copy()
+        c["urgency"][positions], c["score"][positions] = self._scores(positions, self._day)
+        c["urgency"][closed] = 0.0
+        if self.grouped:
+            means = self._compute_group_means()
+            if not np.allclose(means[:len(self._group_means)], self._group_means) \
+                    or len(means) != len(self._group_means):
+                # A group's urgency moved, which shifts every task in it
+                self._rescore_all()
+                return
+            c["score"][positions] += self._group_term(positions)
+        c["score"][closed] = -np.inf
+        self._patch_top(touched, old_scores)
+
+    def _patch_top(self, touched, old_scores) -> None:
+        """Fold changed scores into the heap, or rebuild it if one may have been displaced."""
+        c = self._columns
+        changed_top = False
+        for position, old in zip(touched.tolist(), old_scores.tolist()):
+            task_id, score = int(c["id"][position]), float(c["score"][position])
+            if task_id in self._top_ids:
+                if score < old:
+                    # Something outside the heap may now rank above it
+                    self._rebuild_top()
+                    return
+                self._top = [(score if key == -task_id else s, key) for s, key in self._top]
+                changed_top = True
+            elif score != float("-inf"):
+                if len(self._top) < self.top_n:
+                    heapq.heappush(self._top, (score, -task_id))
+                    self._top_ids.add(task_id)
+                elif (score, -task_id) > self._top[0]:
+                    _, evicted = heapq.heappushpop(self._top, (score, -task_id))
+                    self._top_ids.discard(-evicted)
+                    self._top_ids.add(task_id)
+        if changed_top:
+            heapq.heapify(self._top)
+        self.patches += 1
+
+    def _sync(self, conn) -> None:
+        if self._columns is None:
+            self._load(conn)
+            return
+        if _today() != self._day:
+            self._rescore_all()
+        changes = CHANGES.changed_since(conn, self._seq)
+        if changes is None:
+            # Changes we haven't seen were trimmed from the log
+            self._load(conn)
+            return
+        latest, changed = changes
+        if latest <= self._seq:
+            return
+        self._seq = latest
+        if len(changed) > RELOAD_FRACTION * max(len(self._positions), 1):
+            self._load(conn)
+        else:
+            self._apply(conn, changed)
+
+    # Reads
+
+    def top(self, n: int = 10) -> List[Dict[str, Any]]:
+        """The ``n`` best open tasks (at most ``top_n``), each with its score breakdown."""
+        started = time.perf_counter()
+        with self._lock:
+            with db.get_manager(self.db_path).read() as conn:
+                self._sync(conn)
+            best = sorted(self._top, reverse=True)[:n]
+            results = [dict(self._explain(self._positions[-key]), id=-key, score=score)
+                       for score, key in best]
+            self.last_sync_ms = (time.perf_counter() - started) * 1000
+            synced = self._seq
+        CHANGES.trim(db.get_manager(self.db_path), synced, CHANGE_LOG_MAX_ROWS)
+        return results
+
+    def _explain(self, position: int) -> Dict[str, Any]:
+        c = self._columns
+        today = self._day
+        parts = {
+            "priority": WEIGHTS["priority"] * float(c["priority"][position]),
+            "urgency": WEIGHTS["urgency"] * float(c["urgency"][position]),
+            "age": WEIGHTS["age"] * float(age_scores(c["created"][position:position + 1], today)[0]),
+            "rework": WEIGHTS["rework"] * float(c["rework"][position]),
+        }
+        if self.grouped:
+            parts["group"] = float(self._group_term(slice(position, position + 1))[0])
+        due = c["due"][position]
+        parts["days_left"] = None if due != due else int(due - today)
+        return parts
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "open_tasks": int(self._columns["open"].sum()) if self._columns is not None else 0,
+                "loads": self.loads,
+                "patches": self.patches,
+                "top_rebuilds": self.top_rebuilds,
+                "last_sync_ms": self.last_sync_ms,
+            }
+
+
+def reasons(result: Dict[str, Any]) -> List[str]:
+    """Short explanation of a ``FocusRanking.top`` result, biggest factor first."""
+    days_left = result.get("days_left")
+    labels = {
+        "priority": "high priority" if result["priority"] >= WEIGHTS["priority"] else "priority",
+        "urgency": ("no due date" if days_left is None
+                    else f"overdue by {-days_left} days" if days_left < 0
+                    else "due today" if days_left == 0
+                    else f"due in {days_left} days"),
+        "age": "waiting a while",
+        "rework": "needs rework",
+        "group": "related urgent work",
+    }
+    parts = [(result.get(name) or 0.0, name) for name in labels]
+    return [labels[name] for value, name in sorted(parts, reverse=True) if value > 0]
+
+
+@db.per_db_singleton(key=lambda grouped=False: grouped)
+def get_ranking(db_path: str, grouped: bool = False) -> FocusRanking:
+    """Return the shared ranking for ``db_path``; open tasks load on first read."""
+    return FocusRanking(db_path, grouped)
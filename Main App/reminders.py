@@ -0,0 +1,379 @@
+"""Due-soon and overdue reminders for open tasks.
+
+Each task gets at most two reminders, recorded in ``reminder_sent``: one
+when its due date is ``DUE_SOON_DAYS`` away and one the day after it is
+due. Moving the due date re-arms both (trigger ``tasks_reminder_reset``).
+
+The scheduler never scans the task table. Every ``RESCAN_SECONDS`` it reads
+just the tasks whose next reminder falls before the following rescan, as
+two range scans on the partial index ``idx_tasks_reminder_due``, and keeps
+their fire times on a heap; in between it sleeps until the earliest one.
+Tasks added or edited in the app are pushed onto the heap through
+``schedule()`` so they don't wait for the next rescan.
+
+Reminders are claimed in batches with ``UPDATE ... RETURNING`` before they
+are sent, so the app and a standalone scheduler can run side by side
+without sending anything twice::
+
+    python reminders.py run tasks.db --sink file:reminders.jsonl
+    python reminders.py check tasks.db --sink log
+
+Where reminders go is up to the sink: a log, a JSON-lines file, or a local
+SMTP server (``python -m aiosmtpd -n`` is enough for development).
+"""
+import argparse
+import datetime
+import heapq
+import json
+import logging
+import os
+import queue
+import smtplib
+import sqlite3
+import threading
+import time
+from email.message import EmailMessage
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import db
+import schema
+from schema import REMINDER_DUE_SOON, REMINDER_NONE, REMINDER_OVERDUE
+
+DUE_SOON_DAYS = 1
+RESCAN_SECONDS = 10 * 60
+CLAIM_BATCH_SIZE = 500
+DEFAULT_SINK = "log"
+
+logger = logging.getLogger("reminders")
+
+_UPCOMING = """
+    SELECT id, due_date, reminder_sent FROM tasks
+    WHERE status = 'Pending' AND reminder_sent = ? AND due_date <= ?
+    UNION ALL
+    SELECT id, due_date, reminder_sent FROM tasks
+    WHERE status = 'Pending' AND reminder_sent = ? AND due_date < ?
+"""
+
+
+class Reminder:
+    """One reminder that has been claimed and is ready to send"""
+
+    def __init__(self, task_id: int, title: str, due_date: str, level: int):
+        self.task_id = task_id
+        self.title = title
+        self.due_date = due_date
+        self.level = level
+
+    @property
+    def kind(self) -> str:
+        return "overdue" if self.level == REMINDER_OVERDUE else "due soon"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"task_id": self.task_id, "title": self.title, "due_date": self.due_date, "kind": self.kind}
+
+    def __str__(self):
+        return f"Task #{self.task_id} \"{self.title}\" is {self.kind} (due {self.due_date})"
+
+
+class LogSink:
+    def __init__(self, log: logging.Logger = logger):
+        self.log = log
+
+    def send(self, reminders: List[Reminder]) -> None:
+        for reminder in reminders:
+            self.log.warning("%s", reminder)
+
+
+class FileSink:
+    """Appends one JSON object per reminder to ``path``"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, reminders: List[Reminder]) -> None:
+        sent_at = datetime.datetime.now().isoformat(timespec="seconds")
+        lines = "".join(json.dumps(dict(r.as_dict(), sent_at=sent_at)) + "\n" for r in reminders)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+class SmtpSink:
+    """Sends each batch as one email through a local SMTP server"""
+
+    def __init__(self, host: str = "localhost", port: int = 1025,
+                 sender: str = "tasks@localhost", recipient: str = "team@localhost"):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipient = recipient
+
+    def send(self, reminders: List[Reminder]) -> None:
+        message = EmailMessage()
+        message["Subject"] = f"{len(reminders)} task reminder{'s' if len(reminders) != 1 else ''}"
+        message["From"] = self.sender
+        message["To"] = self.recipient
+        message.set_content("\n".join(str(r) for r in reminders))
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            smtp.send_message(message)
+
+
+def make_sink(spec: str, base_dir: Optional[str] = None):
+    """Build a sink from ``log``, ``file:PATH`` or ``smtp://HOST[:PORT]``.
+
+    A relative ``PATH`` is taken relative to ``base_dir`` when given.
+    """
+    if spec == "log":
+        return LogSink()
+    if spec.startswith("file:"):
+        path = spec[len("file:"):]
+        return FileSink(os.path.join(base_dir, path) if base_dir else path)
+    if spec.startswith("smtp://"):
+        host, _, port = spec[len("smtp://"):].partition(":")
+        return SmtpSink(host or "localhost", int(port or 1025))
+    raise ValueError(f"Unknown reminder sink: {spec!r}")
+
+
+def _midnight(day: datetime.date) -> float:
+    return datetime.datetime.combine(day, datetime.time.min).timestamp()
+
+
+def next_fire_time(due_date: str, reminder_sent: int, due_soon_days: int = DUE_SOON_DAYS) -> Optional[float]:
+    """When the next reminder for a task falls due, or None if none is left."""
+    try:
+        due = datetime.date.fromisoformat(due_date)
+    except (TypeError, ValueError):
+        return None
+    if reminder_sent < REMINDER_DUE_SOON:
+        return _midnight(due - datetime.timedelta(days=due_soon_days))
+    if reminder_sent < REMINDER_OVERDUE:
+        return _midnight(due + datetime.timedelta(days=1))
+    return None
+
+
+def upcoming(conn: sqlite3.Connection, until: float,
+             due_soon_days: int = DUE_SOON_DAYS) -> List[Tuple[float, int]]:
+    """``(fire_time, task_id)`` for every open task with a reminder due by ``until``."""
+    last_day = datetime.date.fromtimestamp(until)
+    soon = (last_day + datetime.timedelta(days=due_soon_days)).isoformat()
+    entries = []
+    for task_id, due_date, sent in conn.execute(
+        _UPCOMING, (REMINDER_NONE, soon, REMINDER_DUE_SOON, last_day.isoformat())
+    ):
+        fire_at = next_fire_time(due_date, sent, due_soon_days)
+        if fire_at is not None and fire_at <= until:
+            entries.append((fire_at, task_id))
+    return entries
+
+
+def claim(conn: sqlite3.Connection, task_ids: List[int], today: datetime.date,
+          due_soon_days: int = DUE_SOON_DAYS) -> List[Reminder]:
+    """Mark the reminders due for ``task_ids`` as sent and return them.
+
+    Tasks that were completed, rescheduled or already reminded in the
+    meantime are skipped.
+    """
+    soon = (today + datetime.timedelta(days=due_soon_days)).isoformat()
+    level = f"CASE WHEN due_date < ? THEN {REMINDER_OVERDUE} ELSE {REMINDER_DUE_SOON} END"
+    placeholders = ", ".join("?" * len(task_ids))
+    rows = conn.execute(f"""
+        UPDATE tasks SET reminder_sent = {level}
+        WHERE id IN ({placeholders}) AND status = 'Pending'
+          AND due_date <= ? AND reminder_sent < {level}
+        RETURNING id, title, due_date, reminder_sent
+    """, (today.isoformat(), *task_ids, soon, today.isoformat())).fetchall()
+    return [Reminder(*row) for row in rows]
+
+
+def _unclaim(conn: sqlite3.Connection, reminders: List[Reminder]) -> None:
+    conn.executemany(
+        "UPDATE tasks SET reminder_sent = ? WHERE id = ? AND reminder_sent = ?",
+        [(r.level - 1, r.task_id, r.level) for r in reminders],
+    )
+
+
+class ReminderScheduler:
+    """Background thread that sends reminders as tasks come due.
+
+    ``schedule()`` hands over tasks that were just added or edited; the
+    thread itself only ever reads the upcoming window from the index.
+    """
+
+    def __init__(self, db_path: str, sink, due_soon_days: int = DUE_SOON_DAYS,
+                 rescan_interval: float = RESCAN_SECONDS):
+        self.db_path = db_path
+        self.sink = sink
+        self.due_soon_days = due_soon_days
+        self.rescan_interval = rescan_interval
+        self._queue: "queue.Queue[List[int]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._heap: List[Tuple[float, int]] = []
+        self.sent = {"due soon": 0, "overdue": 0}
+        self.rescans = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.next_wake: Optional[float] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="reminder-scheduler", daemon=True)
+                self._thread.start()
+
+    def schedule(self, task_ids: Iterable[int]) -> None:
+        task_ids = [task_id for task_id in task_ids if task_id is not None]
+        if task_ids:
+            self._queue.put(task_ids)
+
+    def _rescan(self, manager: db.ConnectionManager, now: float) -> float:
+        with manager.read() as conn:
+            heap = upcoming(conn, now + self.rescan_interval, self.due_soon_days)
+        heapq.heapify(heap)
+        self._heap = heap
+        with self._stats_lock:
+            self.rescans += 1
+        return now + self.rescan_interval
+
+    def _push(self, manager: db.ConnectionManager, task_ids: List[int], until: float,
+              after: float = float("-inf")) -> None:
+        placeholders = ", ".join("?" * len(task_ids))
+        with manager.read() as conn:
+            rows = conn.execute(
+                f"SELECT id, due_date, reminder_sent FROM tasks WHERE id IN ({placeholders}) AND status = 'Pending'",
+                task_ids,
+            ).fetchall()
+        for task_id, due_date, sent in rows:
+            fire_at = next_fire_time(due_date, sent or REMINDER_NONE, self.due_soon_days)
+            if fire_at is not None and after < fire_at <= until:
+                heapq.heappush(self._heap, (fire_at, task_id))
+
+    def _fire(self, manager: db.ConnectionManager, task_ids: List[int]) -> List[Reminder]:
+        today = datetime.date.today()
+        sent: List[Reminder] = []
+        for start in range(0, len(task_ids), CLAIM_BATCH_SIZE):
+            batch = task_ids[start:start + CLAIM_BATCH_SIZE]
+            reminders = manager.run_write(lambda conn: claim(conn, batch, today, self.due_soon_days))
+            if not reminders:
+                continue
+            try:
+                self.sink.send(reminders)
+            except Exception:
+                # Give the reminders back so the next rescan retries them
+                manager.run_write(lambda conn: _unclaim(conn, reminders))
+                raise
+            sent.extend(reminders)
+            with self._stats_lock:
+                for reminder in reminders:
+                    self.sent[reminder.kind] += 1
+        return sent
+
+    def run_pending(self, now: Optional[float] = None) -> List[Reminder]:
+        """Send every reminder that is due now, on the calling thread."""
+        manager = db.get_manager(self.db_path)
+        now = time.time() if now is None else now
+        with manager.read() as conn:
+            due = [task_id for _, task_id in upcoming(conn, now, self.due_soon_days)]
+        return self._fire(manager, due)
+
+    def _run(self) -> None:
+        manager = db.get_manager(self.db_path)
+        next_rescan = time.time()
+        while True:
+            try:
+                if time.time() >= next_rescan:
+                    next_rescan = self._rescan(manager, time.time())
+                wake = min(self._heap[0][0], next_rescan) if self._heap else next_rescan
+                with self._stats_lock:
+                    self.next_wake = wake
+                try:
+                    task_ids = self._queue.get(timeout=max(wake - time.time(), 0))
+                    while True:
+                        try:
+                            task_ids.extend(self._queue.get_nowait())
+                        except queue.Empty:
+                            break
+                    self._push(manager, list(dict.fromkeys(task_ids)), next_rescan)
+                except queue.Empty:
+                    pass
+
+                now = time.time()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap)[1])
+                if due:
+                    due = list(dict.fromkeys(due))
+                    self._fire(manager, due)
+                    # Queue the overdue reminder for tasks that just got the due-soon one
+                    self._push(manager, due, next_rescan, after=now)
+            except Exception as e:
+                # A broken sink or a locked database shouldn't kill the thread
+                with self._stats_lock:
+                    self.failures += 1
+                    self.last_error = str(e)
+                next_rescan = time.time() + self.rescan_interval
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "sent": dict(self.sent),
+                "scheduled": len(self._heap),
+                "rescans": self.rescans,
+                "next_wake": self.next_wake,
+                "failures": self.failures,
+                "last_error": self.last_error,
+            }
+
+
+@db.per_db_singleton
+def get_scheduler(db_path: str, sink_spec: str = DEFAULT_SINK) -> ReminderScheduler:
+    """Return the running scheduler for ``db_path``, starting it on first use.
+
+    There is one scheduler per database, so ``sink_spec`` only counts on
+    the first call. A relative ``file:`` sink is written next to the
+    database, not to whatever directory the app was started from.
+    """
+    sink = make_sink(sink_spec, base_dir=os.path.dirname(os.path.realpath(db_path)))
+    scheduler = ReminderScheduler(db_path, sink)
+    scheduler.start()
+    return scheduler
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Send due-soon and overdue task reminders")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("run", "keep running and send reminders as tasks come due"),
+                            ("check", "send the reminders that are due now and exit")):
+        sub = subparsers.add_parser(name, help=help_text)
+        schema.add_db_argument(sub)
+        sub.add_argument("--sink", default=DEFAULT_SINK, help="log, file:PATH or smtp://HOST[:PORT]")
+        sub.add_argument("--due-soon-days", type=int, default=DUE_SOON_DAYS,
+                         help="days before the due date to send the first reminder")
+    args = schema.parse_cli_args(parser, argv)
+
+    logging.basicConfig(format="%(asctime)s %(message)s", level=logging.INFO)
+    try:
+        sink = make_sink(args.sink)
+    except ValueError as e:
+        parser.error(str(e))
+    scheduler = ReminderScheduler(args.db, sink, due_soon_days=args.due_soon_days)
+    if args.command == "check":
+        sent = scheduler.run_pending()
+        print(f"Sent {len(sent)} reminders")
+        return
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(60)
+            stats = scheduler.stats()
+            if stats["last_error"]:
+                logger.error("Last error: %s", stats["last_error"])
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,943 @@
+"""Database schema setup for the task manager.
+
+The schema is versioned with ``PRAGMA user_version``. Each migration has a
+number; ``migrate()`` applies the pending ones in order, each in its own
+transaction that also bumps ``user_version``, so an interrupted upgrade
+resumes from the last step that committed.
+
+Schema work only needs to happen once per database file, so the result is
+remembered at module level, which survives Streamlit reruns.
+"""
+import argparse
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+REBUILD_BATCH_SIZE = 5000
+DEFAULT_DB = "tasks.db"
+
+_bootstrapped = set()
+_bootstrap_lock = threading.Lock()
+
+TASKS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        title TEXT NOT NULL,
+        description TEXT,
+        category TEXT,
+        status TEXT DEFAULT 'Pending',
+        start_date TEXT,
+        due_date TEXT,
+        priority TEXT DEFAULT 'Normal',
+        document_path TEXT,
+        verification_status TEXT,
+        verification_comments TEXT,
+        verification_evidence_path TEXT,
+        verified_at TEXT,
+        reminder_sent INTEGER DEFAULT 0
+    )
+'''
+
+
+class Migration:
+    """A numbered schema change.
+
+    ``apply`` runs inside the transaction that records the new version.
+    ``prepare``, if given, runs before that transaction in autocommit mode,
+    for long copy work that should commit in batches instead of holding the
+    write lock for the whole step.
+    """
+
+    def __init__(self, version: int, description: str,
+                 apply: Callable[[sqlite3.Connection], None],
+                 prepare: Optional[Callable[[sqlite3.Connection], None]] = None):
+        self.version = version
+        self.description = description
+        self.apply = apply
+        self.prepare = prepare
+
+    def __repr__(self):
+        return f"Migration({self.version}, {self.description!r})"
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [col[1] for col in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def rebuild_table_prepare(conn: sqlite3.Connection, table: str, create_sql: str,
+                          batch_size: int = REBUILD_BATCH_SIZE) -> None:
+    """Copy ``table`` into ``{table}_new`` in batches.
+
+    Triggers mirror writes that land on ``table`` during the copy, so rows
+    already copied stay current. ``rebuild_table_swap`` finishes the job.
+    """
+    new_table = f"{table}_new"
+    conn.execute(f"DROP TABLE IF EXISTS {new_table}")
+    _drop_rebuild_triggers(conn, table)
+    conn.execute(create_sql.format(name=new_table))
+
+    columns = [c for c in table_columns(conn, new_table) if c in table_columns(conn, table)]
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"NEW.{c}" for c in columns)
+    conn.execute(f"""
+        CREATE TRIGGER {table}_rebuild_ai AFTER INSERT ON {table} BEGIN
+            INSERT OR REPLACE INTO {new_table} ({column_list}) VALUES ({new_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER {table}_rebuild_au AFTER UPDATE ON {table} BEGIN
+            DELETE FROM {new_table} WHERE id = OLD.id;
+            INSERT OR REPLACE INTO {new_table} ({column_list}) VALUES ({new_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER {table}_rebuild_ad AFTER DELETE ON {table} BEGIN
+            DELETE FROM {new_table} WHERE id = OLD.id;
+        END
+    """)
+
+    last_id = -1
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(f"""
+                SELECT MAX(id), COUNT(*) FROM (
+                    SELECT id FROM {table} WHERE id > ? ORDER BY id LIMIT ?
+                )
+            """, (last_id, batch_size)).fetchone()
+            if not row[1]:
+                conn.execute("COMMIT")
+                break
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {new_table} ({column_list})
+                SELECT {column_list} FROM {table} WHERE id > ? AND id <= ?
+            """, (last_id, row[0]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        last_id = row[0]
+
+
+def rebuild_table_swap(conn: sqlite3.Connection, table: str) -> None:
+    """Replace ``table`` with the copy built by ``rebuild_table_prepare``."""
+    _drop_rebuild_triggers(conn, table)
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+
+def _drop_rebuild_triggers(conn: sqlite3.Connection, table: str) -> None:
+    for suffix in ("ai", "au", "ad"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {table}_rebuild_{suffix}")
+
+
+# Migrations ---------------------------------------------------------------
+
+def _create_tasks(conn: sqlite3.Connection) -> None:
+    """Create the tasks table, or add columns missing from pre-versioning DBs."""
+    conn.execute(TASKS_TABLE_SQL.format(name="tasks"))
+    columns = table_columns(conn, "tasks")
+    legacy_columns = {
+        'title': 'TEXT',
+        'description': 'TEXT',
+        'start_date': 'TEXT',
+        'due_date': 'TEXT',
+        'priority': 'TEXT DEFAULT "Normal"',
+        'category': 'TEXT DEFAULT "Other"',
+        'status': 'TEXT DEFAULT "Pending"',
+        'document_path': 'TEXT',
+        'verification_status': 'TEXT',
+        'verification_comments': 'TEXT',
+        'verification_evidence_path': 'TEXT',
+        'verified_at': 'TEXT',
+        'reminder_sent': 'INTEGER DEFAULT 0',
+        # Nullable for now; migration 2 rebuilds the table to make it NOT NULL
+        'created_at': 'TEXT'
+    }
+    for column, col_type in legacy_columns.items():
+        if column not in columns:
+            conn.execute(f"ALTER TABLE tasks ADD COLUMN {column} {col_type}")
+
+
+def _created_at_needs_rebuild(conn: sqlite3.Connection) -> bool:
+    for col in conn.execute("PRAGMA table_info(tasks)"):
+        if col[1] == 'created_at':
+            return not col[3]
+    return True
+
+
+def _prepare_created_at(conn: sqlite3.Connection) -> None:
+    if not _created_at_needs_rebuild(conn):
+        return
+    # Backfill in batches before the copy so the NOT NULL constraint holds
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        changed = conn.execute("""
+            UPDATE tasks SET created_at = datetime('now')
+            WHERE id IN (SELECT id FROM tasks WHERE created_at IS NULL LIMIT ?)
+        """, (REBUILD_BATCH_SIZE,)).rowcount
+        conn.execute("COMMIT")
+        if not changed:
+            break
+    rebuild_table_prepare(conn, "tasks", TASKS_TABLE_SQL)
+
+
+def _apply_created_at(conn: sqlite3.Connection) -> None:
+    if not _created_at_needs_rebuild(conn):
+        return
+    # Rows inserted between prepare and now were mirrored by the triggers
+    conn.execute("UPDATE tasks_new SET created_at = datetime('now') WHERE created_at IS NULL")
+    rebuild_table_swap(conn, "tasks")
+
+
+def _add_list_indexes(conn: sqlite3.Connection) -> None:
+    """Index the task list and analytics access patterns."""
+    # LIKE 'Verified%' can't use an index; a generated flag can
+    if 'is_verified' not in [col[1] for col in conn.execute("PRAGMA table_xinfo(tasks)")]:
+        conn.execute("""
+            ALTER TABLE tasks ADD COLUMN is_verified INTEGER
+            GENERATED ALWAYS AS (
+                verification_status IS NOT NULL AND verification_status LIKE 'Verified%'
+            ) VIRTUAL
+        """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_due ON tasks(status, due_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_verified_due ON tasks(is_verified, due_date)")
+    # Covering indexes: the analytics queries never touch the table itself
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tasks_verified_at
+        ON tasks(verified_at, verification_status, title)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tasks_verification_stats
+        ON tasks(status, verification_status, verification_evidence_path)
+    """)
+
+
+def _add_fulltext_search(conn: sqlite3.Connection) -> None:
+    """Full-text index over tasks, kept in sync by triggers."""
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title, description, verification_comments,
+            content='tasks', content_rowid='id',
+            prefix='2 3'
+        )
+    """)
+    # Matches in the title count most, comments least
+    conn.execute("INSERT INTO tasks_fts(tasks_fts, rank) VALUES('rank', 'bm25(10.0, 5.0, 1.0)')")
+    _create_fts_triggers(conn)
+    rebuild_fts(conn)
+
+
+def _create_fts_triggers(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts(rowid, title, description, verification_comments)
+            VALUES (new.id, new.title, new.description, new.verification_comments);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts(tasks_fts, rowid, title, description, verification_comments)
+            VALUES ('delete', old.id, old.title, old.description, old.verification_comments);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_au
+        AFTER UPDATE OF title, description, verification_comments ON tasks BEGIN
+            INSERT INTO tasks_fts(tasks_fts, rowid, title, description, verification_comments)
+            VALUES ('delete', old.id, old.title, old.description, old.verification_comments);
+            INSERT INTO tasks_fts(rowid, title, description, verification_comments)
+            VALUES (new.id, new.title, new.description, new.verification_comments);
+        END
+    """)
+
+
+def rebuild_fts(conn: sqlite3.Connection) -> None:
+    """Rebuild the full-text index from the tasks table."""
+    conn.execute("INSERT INTO tasks_fts(tasks_fts) VALUES('rebuild')")
+
+
+# How much one tasks row contributes to each task_stats counter
+TASK_STATS_CONTRIBUTIONS = {
+    'total': "1",
+    'completed': "({row}.status IS 'Completed')",
+    'verified': "COALESCE({row}.verification_status LIKE 'Verified%', 0)",
+    'approved': "({row}.verification_status IS 'Verified - Approved')",
+    'needs_revision': "({row}.verification_status IS 'Verified - Needs Revision')",
+    'rejected': "({row}.verification_status IS 'Verified - Rejected')",
+    'with_evidence': "({row}.verification_evidence_path IS NOT NULL)",
+}
+
+
+def _add_task_stats(conn: sqlite3.Connection) -> None:
+    """Single-row rollup of the dashboard counters, maintained by triggers."""
+    counters = ",\n".join(f"{name} INTEGER NOT NULL DEFAULT 0" for name in TASK_STATS_CONTRIBUTIONS)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS task_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            {counters}
+        )
+    """)
+    _create_task_stats_triggers(conn)
+    rebuild_task_stats(conn)
+
+
+def _create_task_stats_triggers(conn: sqlite3.Connection) -> None:
+    def delta(sign: str, row: str) -> str:
+        return ", ".join(
+            f"{name} = {name} {sign} {expr.format(row=row)}"
+            for name, expr in TASK_STATS_CONTRIBUTIONS.items()
+        )
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS task_stats_ai AFTER INSERT ON tasks BEGIN
+            UPDATE task_stats SET {delta('+', 'NEW')} WHERE id = 1;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS task_stats_ad AFTER DELETE ON tasks BEGIN
+            UPDATE task_stats SET {delta('-', 'OLD')} WHERE id = 1;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS task_stats_au
+        AFTER UPDATE OF status, verification_status, verification_evidence_path ON tasks BEGIN
+            UPDATE task_stats SET {delta('-', 'OLD')} WHERE id = 1;
+            UPDATE task_stats SET {delta('+', 'NEW')} WHERE id = 1;
+        END
+    """)
+
+
+def task_stats_scan_sql() -> str:
+    """Full-table aggregate computing what task_stats should contain."""
+    sums = ", ".join(
+        f"COALESCE(SUM({expr.format(row='tasks')}), 0) AS {name}"
+        for name, expr in TASK_STATS_CONTRIBUTIONS.items()
+    )
+    return f"SELECT {sums} FROM tasks"
+
+
+def rebuild_task_stats(conn: sqlite3.Connection) -> None:
+    """Recompute task_stats from the tasks table."""
+    names = ", ".join(TASK_STATS_CONTRIBUTIONS)
+    conn.execute(f"""
+        INSERT OR REPLACE INTO task_stats (id, {names})
+        SELECT 1, * FROM ({task_stats_scan_sql()})
+    """)
+
+
+# Upper edges, in hours, of the time-to-complete / time-to-verify histogram
+# bins stored in task_daily_stats; the last bin is open-ended
+DURATION_BIN_EDGES_HOURS = [1, 4, 24, 72, 168, 336, 720]
+DURATION_BIN_LABELS = ["<1h", "1-4h", "4-24h", "1-3d", "3-7d", "7-14d", "14-30d", "30d+"]
+
+
+def _duration_bin_sql(start: str, end: str) -> str:
+    hours = f"((julianday({end}) - julianday({start})) * 24)"
+    cases = " ".join(
+        f"WHEN {hours} < {edge} THEN {i}" for i, edge in enumerate(DURATION_BIN_EDGES_HOURS)
+    )
+    return f"(CASE {cases} ELSE {len(DURATION_BIN_EDGES_HOURS)} END)"
+
+
+def _daily_contributions(row: str, sign: str) -> List[Tuple[str, str, Dict[str, str]]]:
+    """Return ``(day, condition, {column: value})`` for what one tasks row adds
+    to task_daily_stats. ``row`` is ``NEW``/``OLD`` in triggers or ``tasks``."""
+    ttc_bin = _duration_bin_sql(f"{row}.created_at", f"{row}.completed_at")
+    ttv_bin = _duration_bin_sql(f"COALESCE({row}.completed_at, {row}.created_at)", f"{row}.verified_at")
+    bins = range(len(DURATION_BIN_LABELS))
+    return [
+        (f"date({row}.created_at)", f"{row}.created_at IS NOT NULL",
+         {"created": f"{sign}1"}),
+        (f"date({row}.completed_at)", f"{row}.completed_at IS NOT NULL",
+         {"completed": f"{sign}1",
+          **{f"ttc_bin{i}": f"{sign}({ttc_bin} = {i})" for i in bins}}),
+        (f"date({row}.verified_at)",
+         f"{row}.verified_at IS NOT NULL AND {row}.verification_status LIKE 'Verified%'",
+         {"verified": f"{sign}1",
+          **{f"ttv_bin{i}": f"{sign}({ttv_bin} = {i})" for i in bins}}),
+        # A task is overdue from the day after its due date until it is completed;
+        # storing +1/-1 deltas lets the daily overdue count be a running sum
+        (f"date({row}.due_date, '+1 day')",
+         f"{row}.due_date IS NOT NULL AND ({row}.completed_at IS NULL "
+         f"OR date({row}.completed_at) > date({row}.due_date))",
+         {"overdue_delta": f"{sign}1"}),
+        (f"date({row}.completed_at)",
+         f"{row}.due_date IS NOT NULL AND date({row}.completed_at) > date({row}.due_date)",
+         {"overdue_delta": "-1" if sign == "+" else "+1"}),
+    ]
+
+
+def _daily_upsert(day: str, condition: str, values: Dict[str, str], source: str = "") -> str:
+    columns = ", ".join(values)
+    exprs = ", ".join(values.values())
+    updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in values)
+    if source:
+        # Aggregate form used to rebuild from the tasks table
+        exprs = ", ".join(f"SUM({e})" for e in values.values())
+        return f"""
+            INSERT INTO task_daily_stats (day, {columns})
+            SELECT {day}, {exprs} FROM {source} WHERE {condition} AND {day} IS NOT NULL
+            GROUP BY 1
+            ON CONFLICT(day) DO UPDATE SET {updates}
+        """
+    return f"""
+        INSERT INTO task_daily_stats (day, {columns})
+        SELECT {day}, {exprs} WHERE {condition} AND {day} IS NOT NULL
+        ON CONFLICT(day) DO UPDATE SET {updates};
+    """
+
+
+def _backfill_completed_at(conn: sqlite3.Connection) -> None:
+    # Best guess for tasks completed before completed_at existed: when they
+    # were verified, else their due date (if already past), else now. A NULL
+    # would leave them open, and overdue, in the trends forever
+    conn.execute("""
+        UPDATE tasks SET completed_at = COALESCE(
+            verified_at, min(datetime(due_date), datetime('now')), datetime('now'))
+        WHERE status = 'Completed' AND completed_at IS NULL
+    """)
+
+
+def _add_daily_stats(conn: sqlite3.Connection) -> None:
+    """Record completion time and keep per-day trend buckets up to date."""
+    if 'completed_at' not in table_columns(conn, "tasks"):
+        conn.execute("ALTER TABLE tasks ADD COLUMN completed_at TEXT")
+    _backfill_completed_at(conn)
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS tasks_completed_at_ai
+        AFTER INSERT ON tasks
+        WHEN NEW.status = 'Completed' AND NEW.completed_at IS NULL BEGIN
+            UPDATE tasks SET completed_at = datetime('now') WHERE id = NEW.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS tasks_completed_at_au
+        AFTER UPDATE OF status ON tasks
+        WHEN NEW.status IS NOT OLD.status BEGIN
+            UPDATE tasks SET completed_at =
+                CASE WHEN NEW.status = 'Completed' THEN datetime('now') END
+            WHERE id = NEW.id;
+        END
+    """)
+
+    bins = len(DURATION_BIN_LABELS)
+    bin_columns = ",\n".join(
+        f"{kind}_bin{i} INTEGER NOT NULL DEFAULT 0" for kind in ("ttc", "ttv") for i in range(bins)
+    )
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS task_daily_stats (
+            day TEXT PRIMARY KEY,
+            created INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            verified INTEGER NOT NULL DEFAULT 0,
+            overdue_delta INTEGER NOT NULL DEFAULT 0,
+            {bin_columns}
+        ) WITHOUT ROWID
+    """)
+    _create_daily_stats_triggers(conn)
+    rebuild_daily_stats(conn)
+
+
+def _create_daily_stats_triggers(conn: sqlite3.Connection) -> None:
+    def body(row: str, sign: str) -> str:
+        return "\n".join(_daily_upsert(*c) for c in _daily_contributions(row, sign))
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS task_daily_stats_ai AFTER INSERT ON tasks BEGIN
+            {body('NEW', '+')}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS task_daily_stats_ad AFTER DELETE ON tasks BEGIN
+            {body('OLD', '-')}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS task_daily_stats_au
+        AFTER UPDATE OF created_at, completed_at, verified_at, verification_status, due_date
+        ON tasks BEGIN
+            {body('OLD', '-')}
+            {body('NEW', '+')}
+        END
+    """)
+
+
+def rebuild_daily_stats(conn: sqlite3.Connection) -> None:
+    """Recompute task_daily_stats from the tasks table."""
+    conn.execute("DELETE FROM task_daily_stats")
+    for day, condition, values in _daily_contributions("tasks", "+"):
+        conn.execute(_daily_upsert(day, condition, values, source="tasks"))
+
+
+def _add_external_id(conn: sqlite3.Connection) -> None:
+    """Stable id from other tools, so imports can upsert."""
+    if 'external_id' not in table_columns(conn, "tasks"):
+        conn.execute("ALTER TABLE tasks ADD COLUMN external_id TEXT")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_external_id ON tasks(external_id)")
+
+
+# Columns holding a path into the attachment store
+ATTACHMENT_COLUMNS = ("document_path", "verification_evidence_path")
+
+
+def _create_attachment_refs_triggers(conn: sqlite3.Connection) -> None:
+    def add(row: str) -> str:
+        return "".join(f"""
+            INSERT INTO attachment_refs (path, refcount) SELECT {row}.{column}, 1
+            WHERE {row}.{column} IS NOT NULL
+            ON CONFLICT(path) DO UPDATE SET refcount = refcount + 1;""" for column in ATTACHMENT_COLUMNS)
+
+    def remove(row: str) -> str:
+        return "".join(f"""
+            UPDATE attachment_refs SET refcount = refcount - 1 WHERE path = {row}.{column};
+            DELETE FROM attachment_refs WHERE path = {row}.{column} AND refcount <= 0;"""
+                       for column in ATTACHMENT_COLUMNS)
+
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS attachment_refs_ai AFTER INSERT ON tasks BEGIN {add('NEW')} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS attachment_refs_ad AFTER DELETE ON tasks BEGIN {remove('OLD')} END")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS attachment_refs_au
+        AFTER UPDATE OF {", ".join(ATTACHMENT_COLUMNS)} ON tasks BEGIN {remove('OLD')} {add('NEW')} END
+    """)
+
+
+def _create_event_attachment_refs_trigger(conn: sqlite3.Connection) -> None:
+    # Evidence named in the verification history stays referenced while the
+    # task exists
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS attachment_refs_events_ai
+        AFTER INSERT ON verification_events WHEN NEW.evidence_path IS NOT NULL BEGIN
+            INSERT INTO attachment_refs (path, refcount) VALUES (NEW.evidence_path, 1)
+            ON CONFLICT(path) DO UPDATE SET refcount = refcount + 1;
+        END
+    """)
+
+
+def _create_event_attachment_refs_release_trigger(conn: sqlite3.Connection) -> None:
+    # A deleted task's events stay in the log, but stop referencing their
+    # evidence so the sweeper can reclaim the files
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS attachment_refs_events_task_ad
+        AFTER DELETE ON tasks BEGIN
+            UPDATE attachment_refs SET refcount = refcount - (
+                SELECT COUNT(*) FROM verification_events
+                WHERE task_id = OLD.id AND evidence_path = attachment_refs.path
+            )
+            WHERE path IN (SELECT evidence_path FROM verification_events WHERE task_id = OLD.id);
+            DELETE FROM attachment_refs WHERE refcount <= 0
+                AND path IN (SELECT evidence_path FROM verification_events WHERE task_id = OLD.id);
+        END
+    """)
+
+
+def rebuild_attachment_refs(conn: sqlite3.Connection) -> None:
+    """Recount attachment references from tasks and the verification history
+    of tasks that still exist."""
+    conn.execute("DELETE FROM attachment_refs")
+    sources = [
+        f"SELECT {column} AS path FROM tasks WHERE {column} IS NOT NULL" for column in ATTACHMENT_COLUMNS
+    ]
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'verification_events'").fetchone():
+        sources.append("""
+            SELECT e.evidence_path AS path FROM verification_events AS e JOIN tasks ON tasks.id = e.task_id
+            WHERE e.evidence_path IS NOT NULL
+        """)
+    union = " UNION ALL ".join(sources)
+    conn.execute(f"INSERT INTO attachment_refs (path, refcount) SELECT path, COUNT(*) FROM ({union}) GROUP BY path")
+
+
+def _add_attachment_refs(conn: sqlite3.Connection) -> None:
+    """Reference counts for stored attachments, kept current by triggers.
+
+    A path with no row here is not referenced by any task.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS attachment_refs (
+            path TEXT PRIMARY KEY,
+            refcount INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    _create_attachment_refs_triggers(conn)
+    rebuild_attachment_refs(conn)
+
+
+def _add_task_embeddings(conn: sqlite3.Connection) -> None:
+    """Sentence embeddings of each task's text (see ``embeddings.py``)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS task_embeddings (
+            task_id INTEGER PRIMARY KEY,
+            model TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            dim INTEGER NOT NULL,
+            vector BLOB NOT NULL,
+            updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS task_embeddings_ad AFTER DELETE ON tasks BEGIN
+            DELETE FROM task_embeddings WHERE task_id = OLD.id;
+        END
+    """)
+
+
+def _add_embedding_changes(conn: sqlite3.Connection) -> None:
+    """Log of task_embeddings changes, so in-memory vector indexes can
+    apply just the delta instead of reloading every vector."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS task_embedding_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER NOT NULL
+        )
+    """)
+    for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS task_embedding_changes_{event[0].lower()}
+            AFTER {event} ON task_embeddings BEGIN
+                INSERT INTO task_embedding_changes (task_id) VALUES ({row}.task_id);
+            END
+        """)
+
+
+def _create_category_index(conn: sqlite3.Connection) -> None:
+    # Serves the category filter in due-date order, like idx_tasks_status_due
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_category_due ON tasks(category, due_date)")
+
+
+def _release_legacy_categories(conn: sqlite3.Connection) -> None:
+    # Pre-versioning databases added category with DEFAULT "Other", and the
+    # app never let anyone pick one, so those values are placeholders the
+    # categorizer may replace
+    conn.execute("""
+        UPDATE tasks SET category_auto = 1
+        WHERE category_auto = 0 AND (category IS NULL OR category = 'Other')
+    """)
+
+
+def _add_categories(conn: sqlite3.Connection) -> None:
+    """Learned task categories (see ``categories.py``) and the category filter index."""
+    if 'category_auto' not in table_columns(conn, "tasks"):
+        # 1 when category was filled in by the categorizer, which may then
+        # overwrite it; anything set by hand is left alone
+        conn.execute("ALTER TABLE tasks ADD COLUMN category_auto INTEGER NOT NULL DEFAULT 0")
+        _release_legacy_categories(conn)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS task_categories (
+            id INTEGER PRIMARY KEY,
+            label TEXT NOT NULL,
+            model TEXT NOT NULL,
+            centroid BLOB NOT NULL,
+            size INTEGER NOT NULL
+        )
+    """)
+    _create_category_index(conn)
+
+
+# reminder_sent levels, see reminders.py
+REMINDER_NONE, REMINDER_DUE_SOON, REMINDER_OVERDUE = 0, 1, 2
+
+
+def _create_reminder_index(conn: sqlite3.Connection) -> None:
+    # Only open tasks get reminders, so finished ones stay out of the index
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tasks_reminder_due
+        ON tasks(reminder_sent, due_date) WHERE status = 'Pending'
+    """)
+
+
+def _add_reminders(conn: sqlite3.Connection) -> None:
+    """Index for the reminder scheduler, and re-arm reminders when a due date moves."""
+    conn.execute("UPDATE tasks SET reminder_sent = 0 WHERE reminder_sent IS NULL")
+    _create_reminder_index(conn)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS tasks_reminder_reset
+        AFTER UPDATE OF due_date ON tasks
+        WHEN NEW.due_date IS NOT OLD.due_date AND NEW.reminder_sent != {REMINDER_NONE}
+        BEGIN
+            UPDATE tasks SET reminder_sent = {REMINDER_NONE} WHERE id = NEW.id;
+        END
+    """)
+
+
+# Columns the focus ranking (ranking.py) reads
+RANKING_COLUMNS = ("status", "priority", "due_date", "created_at", "verification_status", "category")
+
+
+def _add_task_changes(conn: sqlite3.Connection) -> None:
+    """Log of tasks whose ranking inputs changed, so the focus ranking can
+    rescore just those instead of every open task."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS task_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER NOT NULL
+        )
+    """)
+    columns = ", ".join(RANKING_COLUMNS)
+    for event, row in (("INSERT", "NEW"), (f"UPDATE OF {columns}", "NEW"), ("DELETE", "OLD")):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS task_changes_{event[0].lower()}
+            AFTER {event} ON tasks BEGIN
+                INSERT INTO task_changes (task_id) VALUES ({row}.id);
+            END
+        """)
+
+
+def _add_verification_events(conn: sqlite3.Connection) -> None:
+    """Append-only history of verification outcomes.
+
+    The tasks columns verification_status, verification_comments,
+    verification_evidence_path and verified_at become a copy of each
+    task's latest event, kept by trigger, so list reads don't touch the log.
+    Events outlive their task, for the audit export; only the references
+    to their evidence files end with it.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS verification_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER NOT NULL,
+            ts TEXT NOT NULL DEFAULT (datetime('now')),
+            status TEXT NOT NULL,
+            comments TEXT,
+            evidence_path TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_verification_events_task_ts ON verification_events(task_id, ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_verification_events_ts ON verification_events(ts)")
+    # Seed the history with each task's current outcome
+    conn.execute("""
+        INSERT INTO verification_events (task_id, ts, status, comments, evidence_path)
+        SELECT id, COALESCE(verified_at, created_at), verification_status,
+               verification_comments, verification_evidence_path
+        FROM tasks WHERE verification_status LIKE 'Verified%'
+        ORDER BY COALESCE(verified_at, created_at), id
+    """)
+    for event in ("UPDATE", "DELETE"):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS verification_events_no_{event.lower()}
+            BEFORE {event} ON verification_events BEGIN
+                SELECT RAISE(ABORT, 'verification_events is append-only');
+            END
+        """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS verification_events_ai
+        AFTER INSERT ON verification_events BEGIN
+            UPDATE tasks SET
+                verification_status = NEW.status,
+                verification_comments = NEW.comments,
+                verification_evidence_path = NEW.evidence_path,
+                verified_at = NEW.ts
+            WHERE id = NEW.task_id;
+        END
+    """)
+    _create_event_attachment_refs_trigger(conn)
+    _create_event_attachment_refs_release_trigger(conn)
+    rebuild_attachment_refs(conn)
+
+
+MIGRATIONS = [
+    Migration(1, "Create tasks table / add missing legacy columns", _create_tasks),
+    Migration(2, "Rebuild tasks so created_at is NOT NULL (batched copy)",
+              _apply_created_at, prepare=_prepare_created_at),
+    Migration(3, "Add is_verified flag and task list / analytics indexes", _add_list_indexes),
+    Migration(4, "Add FTS5 index over title, description and verification comments",
+              _add_fulltext_search),
+    Migration(5, "Add task_stats rollup maintained by triggers", _add_task_stats),
+    Migration(6, "Add completed_at and task_daily_stats trend buckets", _add_daily_stats),
+    Migration(7, "Add external_id for import upserts", _add_external_id),
+    Migration(8, "Add attachment_refs reference counts", _add_attachment_refs),
+    Migration(9, "Add task_embeddings vector store", _add_task_embeddings),
+    Migration(10, "Add task_embedding_changes log for vector indexes", _add_embedding_changes),
+    Migration(11, "Add task_categories and the category filter index", _add_categories),
+    Migration(12, "Add the reminder index and reset reminders on due date changes", _add_reminders),
+    Migration(13, "Add task_changes log for the focus ranking", _add_task_changes),
+    Migration(14, "Add the append-only verification_events history", _add_verification_events),
+]
+
+# Triggers that keep derived tables in step with tasks, grouped with the
+# function that creates them and the rebuild that catches the table up.
+# Bulk loads may drop them and restore them afterwards.
+MAINTENANCE_TRIGGERS = [
+    (("tasks_fts_ai", "tasks_fts_ad", "tasks_fts_au"), _create_fts_triggers, rebuild_fts),
+    (("task_stats_ai", "task_stats_ad", "task_stats_au"), _create_task_stats_triggers, rebuild_task_stats),
+    (("task_daily_stats_ai", "task_daily_stats_ad", "task_daily_stats_au"),
+     _create_daily_stats_triggers, rebuild_daily_stats),
+    (("attachment_refs_ai", "attachment_refs_ad", "attachment_refs_au"),
+     _create_attachment_refs_triggers, rebuild_attachment_refs),
+    (("attachment_refs_events_ai",), _create_event_attachment_refs_trigger, rebuild_attachment_refs),
+    (("attachment_refs_events_task_ad",), _create_event_attachment_refs_release_trigger, rebuild_attachment_refs),
+]
+
+# The blob sweeper deletes files nothing references, so a bulk load keeps
+# the reference counts live instead of catching them up afterwards
+KEPT_DURING_BULK_LOAD = (
+    "attachment_refs_ai", "attachment_refs_ad", "attachment_refs_au",
+    "attachment_refs_events_ai", "attachment_refs_events_task_ad",
+)
+
+# Secondary indexes a bulk load may drop; building them once after the load
+# is a sort instead of a random B-tree insert per row and per index.
+# idx_tasks_external_id stays, since upserts need it.
+LIST_INDEXES = (
+    "idx_tasks_due_date", "idx_tasks_status_due", "idx_tasks_verified_due",
+    "idx_tasks_verified_at", "idx_tasks_verification_stats", "idx_tasks_category_due",
+    "idx_tasks_reminder_due",
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def pending_migrations(conn: sqlite3.Connection) -> List[Migration]:
+    version = current_version(conn)
+    return [m for m in MIGRATIONS if m.version > version]
+
+
+def migrate(conn: sqlite3.Connection, dry_run: bool = False) -> List[Migration]:
+    """Apply pending migrations in order and return the ones applied.
+
+    With ``dry_run`` nothing is changed; the pending plan is returned.
+    """
+    plan = pending_migrations(conn)
+    if dry_run or not plan:
+        return plan
+
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None  # manage transactions explicitly
+    applied = []
+    try:
+        for migration in plan:
+            if migration.prepare is not None:
+                migration.prepare(conn)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process may have applied it while we waited for the lock
+                if current_version(conn) >= migration.version:
+                    conn.execute("COMMIT")
+                    continue
+                migration.apply(conn)
+                conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            applied.append(migration)
+    finally:
+        conn.isolation_level = previous_isolation
+    return applied
+
+
+def drop_maintenance(conn: sqlite3.Connection) -> None:
+    """Stop maintaining derived tables and list indexes, e.g. for a bulk load.
+
+    Attachment reference counts stay maintained (KEPT_DURING_BULK_LOAD).
+    """
+    for names, _, _ in MAINTENANCE_TRIGGERS:
+        for name in names:
+            if name not in KEPT_DURING_BULK_LOAD:
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    for name in LIST_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def missing_maintenance(conn: sqlite3.Connection) -> List[str]:
+    """Names of maintenance triggers and list indexes that don't exist."""
+    existing = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('trigger', 'index')"
+    )}
+    expected = [name for names, _, _ in MAINTENANCE_TRIGGERS for name in names] + list(LIST_INDEXES)
+    return [name for name in expected if name not in existing]
+
+
+def restore_maintenance(conn: sqlite3.Connection) -> None:
+    """Recreate the missing maintenance triggers and list indexes, and
+    rebuild the derived tables those triggers keep.
+
+    Run this in the same transaction so no write slips in between the
+    rebuild and the triggers coming back.
+    """
+    missing = set(missing_maintenance(conn))
+    _add_list_indexes(conn)
+    _create_category_index(conn)
+    _create_reminder_index(conn)
+    for names, create, rebuild in MAINTENANCE_TRIGGERS:
+        if missing.intersection(names):
+            create(conn)
+            rebuild(conn)
+
+
+def bootstrap(db_path: str) -> List[Migration]:
+    """Bring the schema of ``db_path`` up to date once per process.
+
+    Later calls for the same file return immediately, unless the file has
+    been removed in the meantime.
+    """
+    key = os.path.realpath(db_path)
+    if key in _bootstrapped and os.path.exists(key):
+        return []
+
+    with _bootstrap_lock:
+        if key in _bootstrapped and os.path.exists(key):
+            return []
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        try:
+            applied = migrate(conn)
+            # A bulk load that died before restoring its triggers leaves the
+            # derived tables stale; repair that once per process
+            if missing_maintenance(conn):
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    restore_maintenance(conn)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        finally:
+            conn.close()
+        _bootstrapped.add(key)
+        return applied
+
+
+def add_db_argument(parser: argparse.ArgumentParser, positional: bool = True) -> None:
+    """Add the database path argument the command-line tools share."""
+    if positional:
+        parser.add_argument("db", nargs="?", default=DEFAULT_DB, help="path to the SQLite database")
+    else:
+        parser.add_argument("--db", default=DEFAULT_DB, help="path to the SQLite database")
+
+
+def parse_cli_args(parser: argparse.ArgumentParser, argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse a tool's arguments and bring the schema of ``args.db`` up to date."""
+    args = parser.parse_args(argv)
+    bootstrap(args.db)
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Apply task manager schema migrations")
+    add_db_argument(parser)
+    parser.add_argument("--dry-run", action="store_true", help="print the plan without changing anything")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        print(f"{args.db}: at version {current_version(conn)}, latest is {LATEST_VERSION}")
+        plan = migrate(conn, dry_run=args.dry_run)
+    finally:
+        conn.close()
+
+    verb = "Would apply" if args.dry_run else "Applied"
+    if not plan:
+        print("Nothing to do.")
+    for migration in plan:
+        print(f"{verb} {migration.version}: {migration.description}")
+
+
+if __name__ == "__main__":
+    main()
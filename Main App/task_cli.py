@@ -0,0 +1,410 @@
+"""Command-line tools for the task manager database.
+
+Streams tasks in and out of the ``tasks`` table as NDJSON (one JSON object
+per line) or CSV. Files are read and written one row at a time and rows are
+written in fixed-size batches, so memory use does not grow with file size::
+
+    python task_cli.py import tasks.ndjson --db tasks.db --upsert
+    python task_cli.py export backup.csv --db tasks.db
+
+For large loads, ``--defer-indexes`` drops the list indexes and the
+full-text and analytics triggers, loads the rows, then rebuilds all of them
+in one pass. It is the default for input files over
+``DEFER_INDEXES_MIN_BYTES``; ``--no-defer-indexes`` turns it off.
+"""
+import argparse
+import csv
+import datetime
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import db
+import ranking
+import schema
+import verification_log
+
+DEFAULT_BATCH_SIZE = 10000
+MAX_REPORTED_ERRORS = 20
+# Inputs this large (roughly 100k tasks) load with --defer-indexes unless told otherwise
+DEFER_INDEXES_MIN_BYTES = 16 * 1024 * 1024
+
+# Columns that travel between tools; attachment paths are local to this
+# install and the derived columns are recomputed
+IMPORT_COLUMNS = [
+    "external_id", "title", "description", "category", "status", "priority",
+    "start_date", "due_date", "created_at", "completed_at",
+    "verification_status", "verification_comments", "verified_at",
+]
+EXPORT_COLUMNS = ["id"] + IMPORT_COLUMNS
+STATUSES = ("Pending", "Completed")
+DATE_COLUMNS = ("start_date", "due_date")
+TIMESTAMP_COLUMNS = ("created_at", "completed_at", "verified_at")
+
+
+class RowError(ValueError):
+    """A row that can't be imported, with its position in the input"""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+class SkippedRows:
+    """The rows an import skipped: how many, and the first ``limit`` errors.
+
+    Memory stays the same however many rows of a large file are bad.
+    """
+
+    def __init__(self, limit: int = MAX_REPORTED_ERRORS):
+        self.limit = limit
+        self.errors: List[RowError] = []
+        self.count = 0
+
+    def append(self, error: RowError) -> None:
+        self.count += 1
+        if len(self.errors) < self.limit:
+            self.errors.append(error)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[RowError]:
+        return iter(self.errors)
+
+
+def detect_format(path: str, explicit: Optional[str]) -> str:
+    if explicit:
+        return explicit
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".ndjson", ".jsonl", ".json"):
+        return "ndjson"
+    raise SystemExit(f"Can't tell the format of {path!r}; pass --format")
+
+
+def read_records(path: str, fmt: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(line_number, record)`` from an NDJSON or CSV file ('-' = stdin)."""
+    stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(stream)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(stream, start=1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield line_number, RowError(line_number, f"invalid JSON ({e.msg})")
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _clean(value: Any) -> Any:
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def validate_record(line: int, record: Dict[str, Any]) -> Tuple:
+    """Normalize one input record into a tuple of IMPORT_COLUMNS.
+
+    Columns the record leaves out are None: an insert fills in defaults
+    (``insert_params``), an upsert keeps what the task already has.
+    """
+    if isinstance(record, RowError):
+        raise record
+    if not isinstance(record, dict):
+        raise RowError(line, "expected an object")
+
+    values = {column: _clean(record.get(column)) for column in IMPORT_COLUMNS}
+    if not values["title"]:
+        raise RowError(line, "title is required")
+    if values["status"] is not None and values["status"] not in STATUSES:
+        raise RowError(line, f"status {values['status']!r} is not one of {', '.join(STATUSES)}")
+    if values["priority"] is not None and values["priority"] not in ranking.PRIORITY_SCORES:
+        raise RowError(line, f"priority {values['priority']!r} is not one of {', '.join(ranking.PRIORITY_SCORES)}")
+
+    for column in DATE_COLUMNS:
+        if values[column] is not None:
+            try:
+                values[column] = datetime.date.fromisoformat(str(values[column])[:10]).isoformat()
+            except ValueError:
+                raise RowError(line, f"{column} {values[column]!r} is not a YYYY-MM-DD date")
+
+    for column in TIMESTAMP_COLUMNS:
+        if values[column] is not None:
+            try:
+                parsed = datetime.datetime.fromisoformat(str(values[column]).replace("Z", "+00:00"))
+            except ValueError:
+                raise RowError(line, f"{column} {values[column]!r} is not an ISO timestamp")
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+            # Same format SQLite's datetime('now') produces
+            values[column] = parsed.strftime("%Y-%m-%d %H:%M:%S")
+
+    if values["external_id"] is not None:
+        values["external_id"] = str(values["external_id"])
+    return tuple(values[column] for column in IMPORT_COLUMNS)
+
+
+def batches(rows: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Values a new task gets for columns its record leaves out
+INSERT_DEFAULTS = {"status": "Pending", "priority": "Normal", "verification_status": "Not Verified"}
+
+
+def insert_sql() -> str:
+    """INSERT of one row that does nothing if its external_id is already taken.
+
+    Unlike ``INSERT OR IGNORE``, a skipped row doesn't use up an
+    AUTOINCREMENT id. See ``insert_params``.
+    """
+    columns = ", ".join(IMPORT_COLUMNS)
+    placeholders = ", ".join("?" * len(IMPORT_COLUMNS))
+    return f"""
+        INSERT INTO tasks ({columns}) SELECT {placeholders}
+        WHERE NOT EXISTS (SELECT 1 FROM tasks WHERE external_id = ?)
+    """
+
+
+# An update leaves these to the verification history, which is append-only;
+# the row's outcome is recorded as an event instead
+VERIFICATION_COLUMNS = ("verification_status", "verification_comments", "verified_at")
+UPDATE_COLUMNS = [c for c in IMPORT_COLUMNS[1:] if c not in VERIFICATION_COLUMNS]
+
+
+def insert_params(row: Tuple, now: str) -> Tuple:
+    """The row with defaults filled in (``created_at`` is ``now``), then its external_id."""
+    values = dict(zip(IMPORT_COLUMNS, row))
+    for column, default in INSERT_DEFAULTS.items():
+        if values[column] is None:
+            values[column] = default
+    if values["created_at"] is None:
+        values["created_at"] = now
+    params = tuple(values[column] for column in IMPORT_COLUMNS)
+    return params + params[:1]
+
+
+def update_sql() -> str:
+    """UPDATE by external_id returning the task id; see ``update_params``.
+
+    Columns the record leaves out (None) keep their stored value, so an
+    upsert never resets a creation or completion time.
+    """
+    updates = ", ".join(f"{c} = COALESCE(?, {c})" for c in UPDATE_COLUMNS)
+    return f"UPDATE tasks SET {updates} WHERE external_id = ? RETURNING id"
+
+
+def update_params(row: Tuple) -> Tuple:
+    values = dict(zip(IMPORT_COLUMNS, row))
+    return tuple(values[c] for c in UPDATE_COLUMNS) + (values["external_id"],)
+
+
+def write_batch(conn, batch: List[Tuple[int, Tuple]], upsert: bool, errors: SkippedRows,
+                now: Optional[str] = None) -> int:
+    """Write validated ``(line, row)`` pairs; returns how many rows were written.
+
+    With ``upsert``, rows whose external_id exists update that task. The
+    UPDATE goes first because ``INSERT ... ON CONFLICT`` would use up an
+    AUTOINCREMENT id for every row that turns out to be an update. Rows
+    without an external_id are always inserted.
+
+    A verification outcome in a row is appended to the task's history
+    (dated ``verified_at``, else ``now``), which also sets the task's
+    verification columns.
+    """
+    now = now or datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    insert, update = insert_sql(), update_sql()
+    status_at, comments_at, verified_at = (IMPORT_COLUMNS.index(c) for c in VERIFICATION_COLUMNS)
+    written = 0
+    for line, row in batch:
+        updated = conn.execute(update, update_params(row)).fetchone() if upsert and row[0] is not None else None
+        if updated is not None:
+            task_id = updated[0]
+        else:
+            cursor = conn.execute(insert, insert_params(row, now))
+            if not cursor.rowcount:
+                errors.append(RowError(line, f"external_id {row[0]!r} already exists (use --upsert to update it)"))
+                continue
+            task_id = cursor.lastrowid
+        written += 1
+        if (row[status_at] or "").startswith("Verified"):
+            verification_log.record_imported(conn, task_id, row[status_at], row[comments_at],
+                                             row[verified_at] or now)
+    return written
+
+
+def import_tasks(manager: db.ConnectionManager, records: Iterable[Tuple[int, Dict[str, Any]]],
+                 batch_size: int = DEFAULT_BATCH_SIZE, upsert: bool = False,
+                 defer_indexes: bool = False, errors: Optional[SkippedRows] = None) -> int:
+    """Write records in batches, one transaction per batch.
+
+    Invalid rows, and without ``upsert`` rows whose external_id already
+    exists, are skipped and appended to ``errors``. Returns the number of
+    rows written.
+    """
+    if errors is None:
+        errors = SkippedRows()
+    now = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+    def valid_rows():
+        for line, record in records:
+            try:
+                yield line, validate_record(line, record)
+            except RowError as e:
+                errors.append(e)
+
+    written = 0
+    if defer_indexes:
+        with manager.write() as conn:
+            schema.drop_maintenance(conn)
+    try:
+        for batch in batches(valid_rows(), batch_size):
+            with manager.write() as conn:
+                written += write_batch(conn, batch, upsert, errors, now)
+    finally:
+        if defer_indexes:
+            # The rebuild also covers anything other writers did meanwhile
+            with manager.write() as conn:
+                schema.restore_maintenance(conn)
+    return written
+
+
+def should_defer_indexes(path: str, requested: Optional[bool]) -> bool:
+    """Defer index upkeep when asked to, or by default for large input files."""
+    if requested is not None:
+        return requested
+    return path != "-" and os.path.getsize(path) >= DEFER_INDEXES_MIN_BYTES
+
+
+def export_rows(manager: db.ConnectionManager, fetch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Tuple]:
+    """Yield every task as a tuple of EXPORT_COLUMNS, from one consistent snapshot."""
+    columns = ", ".join(EXPORT_COLUMNS)
+    with manager.read() as conn:
+        conn.execute("BEGIN")
+        try:
+            cursor = conn.execute(f"SELECT {columns} FROM tasks ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.execute("COMMIT")
+
+
+def write_records(rows: Iterable[Tuple], stream: io.TextIOBase, fmt: str) -> int:
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(stream)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            writer.writerow(["" if value is None else value for value in row])
+            count += 1
+    else:
+        for row in rows:
+            stream.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False))
+            stream.write("\n")
+            count += 1
+    return count
+
+
+def report(action: str, count: int, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else float("inf")
+    print(f"{action} {count:,} tasks in {elapsed:.2f}s ({rate:,.0f} rows/s)", file=sys.stderr)
+
+
+def cmd_import(args) -> int:
+    fmt = detect_format(args.path, args.format)
+    manager = db.get_manager(args.db)
+    errors = SkippedRows()
+    started = time.perf_counter()
+    written = import_tasks(
+        manager, read_records(args.path, fmt),
+        batch_size=args.batch_size, upsert=args.upsert,
+        defer_indexes=should_defer_indexes(args.path, args.defer_indexes), errors=errors,
+    )
+    report("Imported", written, started)
+    if errors:
+        print(f"Skipped {len(errors):,} rows", file=sys.stderr)
+    for error in errors:
+        print(f"skipped {error}", file=sys.stderr)
+    if len(errors) > len(errors.errors):
+        print(f"... and {len(errors) - len(errors.errors):,} more skipped rows", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def cmd_export(args) -> int:
+    fmt = detect_format(args.path, args.format)
+    manager = db.get_manager(args.db)
+    started = time.perf_counter()
+    if args.path == "-":
+        count = write_records(export_rows(manager), sys.stdout, fmt)
+    else:
+        # Write to a uniquely named file next to the target and rename, so a
+        # failed export never leaves a truncated backup behind and two
+        # exports never write to the same file
+        directory = os.path.dirname(os.path.abspath(args.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+                count = write_records(export_rows(manager), f, fmt)
+            os.replace(tmp_path, args.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    report("Exported", count, started)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Task manager command-line tools")
+    schema.add_db_argument(parser, positional=False)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="stream tasks from NDJSON or CSV into the database")
+    import_parser.add_argument("path", help="input file, or - for stdin")
+    import_parser.add_argument("--format", choices=["ndjson", "csv"], help="defaults to the file extension")
+    import_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per transaction")
+    import_parser.add_argument("--upsert", action="store_true",
+                               help="update tasks whose external_id already exists instead of failing")
+    import_parser.add_argument("--defer-indexes", action=argparse.BooleanOptionalAction, default=None,
+                               help="drop list indexes and search/analytics triggers during the load, rebuild "
+                                    "afterwards (default: only for input files over "
+                                    f"{DEFER_INDEXES_MIN_BYTES // 2**20} MB)")
+    import_parser.set_defaults(func=cmd_import)
+
+    export_parser = subparsers.add_parser("export", help="stream all tasks to NDJSON or CSV")
+    export_parser.add_argument("path", help="output file, or - for stdout")
+    export_parser.add_argument("--format", choices=["ndjson", "csv"], help="defaults to the file extension")
+    export_parser.set_defaults(func=cmd_export)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = schema.parse_cli_args(build_parser(), argv)
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
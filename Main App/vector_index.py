@@ -0,0 +1,291 @@
+"""In-memory nearest-neighbour index over the stored task embeddings.
+
+The vectors from ``task_embeddings`` are L2-normalized, so cosine
+similarity is a dot product and scoring every task is one matrix-vector
+product followed by an ``argpartition`` top-k. That exact scan is fine up to
+a few tens of thousands of tasks; past ``IVF_MIN_ROWS`` an IVF index is
+built in the background (k-means centroids with each cluster's vectors
+stored contiguously) and a query only scans the ``IVF_PROBES`` clusters
+closest to it.
+
+The index is loaded once per process and kept in step with the database
+through ``task_embedding_changes``: before each query the rows changed
+since the last sync are applied as a small exact "delta" on top of the
+base matrix, and the base is only reloaded when the delta grows too big or
+the change log has been pruned. Once the log passes ``CHANGE_LOG_MAX_ROWS``,
+the rows this index has applied are trimmed.
+"""
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import db
+import embeddings
+from model_registry import SENTENCE_MODEL
+
+IVF_MIN_ROWS = 50_000
+IVF_PROBES = 16
+IVF_TRAIN_SAMPLE_PER_LIST = 30
+IVF_MAX_ITER = 25
+ASSIGN_CHUNK_ROWS = 65_536
+# Reload the base matrix once this many tasks are served from the delta
+DELTA_MAX_ROWS = 20_000
+DELTA_MAX_FRACTION = 0.05
+# Rows task_embedding_changes may reach before the applied ones are trimmed
+CHANGE_LOG_MAX_ROWS = 10_000
+
+CHANGES = db.ChangeLog("task_embedding_changes")
+
+
+def top_k(scores, k: int):
+    """Indices of the ``k`` highest scores, best first."""
+    import numpy as np
+
+    if k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class _Base:
+    """Immutable snapshot of the vectors, optionally with an IVF layout.
+
+    With IVF, rows are permuted so each list is the slice
+    ``offsets[i]:offsets[i + 1]`` of ``matrix``.
+    """
+
+    def __init__(self, task_ids, matrix, centroids=None, offsets=None):
+        self.task_ids = task_ids
+        self.matrix = matrix
+        self.centroids = centroids
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.task_ids)
+
+    def candidates(self, query, probes: int):
+        """Return ``(positions, scores)``; ``positions`` is None for a full scan."""
+        import numpy as np
+
+        if self.centroids is None:
+            return None, self.matrix @ query
+        lists = top_k(self.centroids @ query, probes)
+        positions = np.concatenate([
+            np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists
+        ]) if len(lists) else np.empty(0, dtype=np.int64)
+        scores = np.concatenate([
+            self.matrix[self.offsets[i]:self.offsets[i + 1]] @ query for i in lists
+        ]) if len(lists) else np.empty(0, dtype=np.float32)
+        return positions, scores
+
+
+def build_ivf(base: _Base, n_lists: Optional[int] = None, seed: int = 0) -> _Base:
+    """Cluster ``base`` with k-means and return it in IVF layout."""
+    import numpy as np
+    from sklearn.cluster import KMeans
+
+    n = len(base)
+    n_lists = n_lists or max(int(np.sqrt(n)), 1)
+    rng = np.random.default_rng(seed)
+    sample_size = min(n, n_lists * IVF_TRAIN_SAMPLE_PER_LIST)
+    sample = base.matrix[rng.choice(n, sample_size, replace=False)]
+    kmeans = KMeans(n_clusters=n_lists, n_init=1, max_iter=IVF_MAX_ITER, random_state=seed).fit(sample)
+    centroids = kmeans.cluster_centers_.astype(np.float32)
+    centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+    # Assign by inner product, the same measure queries are probed with
+    assignments = np.empty(n, dtype=np.int64)
+    for start in range(0, n, ASSIGN_CHUNK_ROWS):
+        block = base.matrix[start:start + ASSIGN_CHUNK_ROWS]
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+    order = np.argsort(assignments, kind="stable")
+    offsets = np.zeros(n_lists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignments, minlength=n_lists), out=offsets[1:])
+    return _Base(base.task_ids[order], np.ascontiguousarray(base.matrix[order]), centroids, offsets)
+
+
+class SemanticIndex:
+    """Process-wide vector index for one database, synced before every query.
+
+    ``mode`` is ``"auto"`` (IVF once there are ``IVF_MIN_ROWS`` vectors),
+    ``"exact"`` or ``"ivf"``.
+    """
+
+    def __init__(self, db_path: str, model_name: str = SENTENCE_MODEL, mode: str = "auto"):
+        self.db_path = db_path
+        self.model_name = model_name
+        self.mode = mode
+        self._lock = threading.RLock()
+        self._base: Optional[_Base] = None
+        self._seq = 0
+        self._delta: Dict[int, Any] = {}
+        self._delta_ids = None
+        self._delta_matrix = None
+        self._overridden: Set[int] = set()
+        self._mask = None
+        self._ivf_thread: Optional[threading.Thread] = None
+        self.loads = 0
+        self.queries = 0
+        self.last_query_ms = 0.0
+        self.ivf_build_seconds: Optional[float] = None
+
+    # Syncing
+
+    def _load(self, conn) -> None:
+        seq = CHANGES.latest(conn)
+        task_ids, matrix = embeddings.load_matrix(conn, self.model_name)
+        self._base = _Base(task_ids, matrix)
+        self._seq = seq
+        self._delta = {}
+        self._overridden = set()
+        self._refresh_delta()
+        self.loads += 1
+        self._maybe_build_ivf()
+
+    def _sync(self, conn) -> None:
+        import numpy as np
+
+        if self._base is None:
+            self._load(conn)
+            return
+        changes = CHANGES.changed_since(conn, self._seq)
+        if changes is None:
+            # Changes we haven't seen were pruned from the log
+            self._load(conn)
+            return
+        latest, changed = changes
+        if latest <= self._seq:
+            return
+
+        current = {}
+        for start in range(0, len(changed), embeddings.REINDEX_BATCH_SIZE):
+            chunk = changed[start:start + embeddings.REINDEX_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(chunk))
+            for task_id, vector in conn.execute(
+                f"SELECT task_id, vector FROM task_embeddings WHERE model = ? AND task_id IN ({placeholders})",
+                [self.model_name, *chunk],
+            ):
+                current[task_id] = np.frombuffer(vector, dtype=np.float32)
+        for task_id in changed:
+            self._overridden.add(task_id)
+            if task_id in current:
+                self._delta[task_id] = current[task_id]
+            else:
+                self._delta.pop(task_id, None)
+        self._seq = latest
+
+        if len(self._overridden) > max(DELTA_MAX_ROWS, DELTA_MAX_FRACTION * len(self._base)):
+            self._load(conn)
+        else:
+            self._refresh_delta()
+
+    def _refresh_delta(self) -> None:
+        import numpy as np
+
+        dim = self._base.matrix.shape[1] if len(self._base) else 0
+        ids = list(self._delta)
+        self._delta_ids = np.array(ids, dtype=np.int64)
+        self._delta_matrix = np.stack([self._delta[i] for i in ids]) if ids \
+            else np.empty((0, dim), dtype=np.float32)
+        self._mask = np.isin(self._base.task_ids, list(self._overridden)) if self._overridden else None
+
+    def _maybe_build_ivf(self) -> None:
+        wants_ivf = self.mode == "ivf" or (self.mode == "auto" and len(self._base) >= IVF_MIN_ROWS)
+        if not wants_ivf or self._base.centroids is not None or len(self._base) == 0:
+            return
+        if self._ivf_thread is not None and self._ivf_thread.is_alive():
+            return
+        base = self._base
+
+        def _build():
+            started = time.perf_counter()
+            ivf = build_ivf(base)
+            with self._lock:
+                # Exact search keeps serving until the layout is ready
+                if self._base is base:
+                    self._base = ivf
+                    self._refresh_delta()
+                    self.ivf_build_seconds = time.perf_counter() - started
+
+        self._ivf_thread = threading.Thread(target=_build, name="ivf-build", daemon=True)
+        self._ivf_thread.start()
+
+    # Queries
+
+    def search(self, query, k: int = 10, exclude: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """Return up to ``k`` ``(task_id, cosine_similarity)`` pairs, best first."""
+        import numpy as np
+
+        started = time.perf_counter()
+        exclude = set(exclude)
+        query = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            with db.get_manager(self.db_path).read() as conn:
+                self._sync(conn)
+            base = self._base
+            wanted = k + len(exclude)
+
+            results: List[Tuple[int, float]] = []
+            if len(base):
+                positions, scores = base.candidates(query, IVF_PROBES)
+                if self._mask is not None:
+                    hidden = self._mask if positions is None else self._mask[positions]
+                    scores = np.where(hidden, -np.inf, scores)
+                best = top_k(scores, wanted)
+                ids = base.task_ids if positions is None else base.task_ids[positions]
+                results.extend(zip(ids[best].tolist(), scores[best].tolist()))
+            if len(self._delta_ids):
+                scores = self._delta_matrix @ query
+                best = top_k(scores, wanted)
+                results.extend(zip(self._delta_ids[best].tolist(), scores[best].tolist()))
+            synced = self._seq
+        CHANGES.trim(db.get_manager(self.db_path), synced, CHANGE_LOG_MAX_ROWS)
+
+        results = [(task_id, score) for task_id, score in results
+                   if task_id not in exclude and score != -np.inf]
+        results.sort(key=lambda pair: -pair[1])
+        self.queries += 1
+        self.last_query_ms = (time.perf_counter() - started) * 1000
+        return results[:k]
+
+    def search_text(self, text: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Encode ``text`` with the sentence model and search for it."""
+        return self.search(embeddings.encode([text])[0], k)
+
+    def similar(self, task_id: int, k: int = 5) -> List[Tuple[int, float]]:
+        """Tasks closest to ``task_id``; empty if it has no embedding yet."""
+        import numpy as np
+
+        with db.get_manager(self.db_path).read() as conn:
+            row = conn.execute(
+                "SELECT vector FROM task_embeddings WHERE task_id = ? AND model = ?",
+                (task_id, self.model_name),
+            ).fetchone()
+        if row is None:
+            return []
+        return self.search(np.frombuffer(row[0], dtype=np.float32), k, exclude=[task_id])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            base = self._base
+            # Tasks in the delta hide their base row, if they have one
+            hidden = int(self._mask.sum()) if self._mask is not None else 0
+            return {
+                "vectors": (len(base) if base is not None else 0) - hidden + len(self._delta),
+                "delta": len(self._delta),
+                "ivf_lists": len(base.centroids) if base is not None and base.centroids is not None else 0,
+                "ivf_build_seconds": self.ivf_build_seconds,
+                "loads": self.loads,
+                "queries": self.queries,
+                "last_query_ms": self.last_query_ms,
+            }
+
+
+@db.per_db_singleton
+def get_index(db_path: str) -> SemanticIndex:
+    """Return the shared semantic index for ``db_path``; vectors load on first query."""
+    return SemanticIndex(db_path)
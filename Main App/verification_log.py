@@ -0,0 +1,198 @@
+"""Verification history of each task.
+
+Every verification outcome is appended to ``verification_events``, which
+triggers keep from being updated or deleted. A task's events outlive the
+task, so the audit export still covers it; its evidence files are
+released when it is deleted, though, so deleted tasks' events may name
+files that no longer exist. A trigger copies the latest
+event onto the task's own verification columns, so the task list never
+reads the log.
+
+``timeline`` reads one task's events through
+``idx_verification_events_task_ts`` and folds runs of the same outcome into
+one entry; ``group_timelines`` does the same for a page of tasks read in
+one query. The whole log for a date range streams out of one snapshot::
+
+    python verification_log.py export audit.csv --db tasks.db --from 2025-01-01 --to 2025-07-01
+"""
+import argparse
+import csv
+import datetime
+import io
+import itertools
+import json
+import os
+import sys
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import db
+import queries
+import schema
+
+OUTCOMES = ["Verified - Approved", "Verified - Needs Revision", "Verified - Rejected"]
+EVENT_COLUMNS = ("id", "task_id", "title", "ts", "status", "comments", "evidence_path")
+FETCH_SIZE = 5000
+
+
+def record(conn, task_id: int, status: str, comments: str,
+           evidence_path: Optional[str] = None) -> int:
+    """Append one verification outcome; returns the event id."""
+    return conn.execute(
+        "INSERT INTO verification_events (task_id, status, comments, evidence_path) VALUES (?, ?, ?, ?)",
+        (task_id, status, comments, evidence_path),
+    ).lastrowid
+
+
+# SQL form of can_verify(), for statements that pick the tasks themselves
+VERIFIABLE = "status = 'Completed' AND verification_status IS NOT 'Verified - Approved'"
+
+
+def record_many(conn, task_ids: Iterable[int], status: str, comments: str) -> int:
+    """Append the same outcome for many tasks; returns how many were recorded.
+
+    Like the single-task form, only tasks that ``can_verify`` are recorded;
+    ids of other tasks, or of tasks that no longer exist, are skipped.
+    """
+    return conn.executemany(f"""
+        INSERT INTO verification_events (task_id, status, comments)
+        SELECT id, ?, ? FROM tasks WHERE id = ? AND {VERIFIABLE}
+    """, [(status, comments, task_id) for task_id in task_ids]).rowcount
+
+
+def record_imported(conn, task_id: int, status: str, comments: Optional[str], ts: str) -> bool:
+    """Append an outcome carried by an imported row, dated ``ts``.
+
+    Importing the same file again doesn't repeat the event. Returns whether
+    one was added.
+    """
+    return conn.execute("""
+        INSERT INTO verification_events (task_id, ts, status, comments)
+        SELECT ?, ?, ?, ?
+        WHERE NOT EXISTS (SELECT 1 FROM verification_events WHERE task_id = ? AND ts = ? AND status = ?)
+    """, (task_id, ts, status, comments, task_id, ts, status)).rowcount > 0
+
+
+def evidence_paths(conn, task_ids: List[int]) -> List[str]:
+    """Evidence files named anywhere in these tasks' histories."""
+    paths: List[str] = []
+    for start in range(0, len(task_ids), FETCH_SIZE):
+        chunk = task_ids[start:start + FETCH_SIZE]
+        paths.extend(row[0] for row in conn.execute(f"""
+            SELECT DISTINCT evidence_path FROM verification_events
+            WHERE task_id IN ({', '.join('?' * len(chunk))}) AND evidence_path IS NOT NULL
+        """, chunk))
+    return paths
+
+
+def can_verify(task: Dict) -> bool:
+    """Completed tasks can be (re)verified until they are approved."""
+    return task['status'] == 'Completed' and task['verification_status'] != 'Verified - Approved'
+
+
+def compact(events: Iterable[Dict]) -> List[Dict]:
+    """Fold runs of the same outcome in ``events`` (oldest first) into one entry.
+
+    Each entry has the outcome's ``status``, ``first_at``/``last_at``, how
+    many ``events`` it covers, and the latest ``comments`` and
+    ``evidence_path`` given during it.
+    """
+    entries: List[Dict] = []
+    for event in events:
+        if entries and entries[-1]["status"] == event["status"]:
+            entry = entries[-1]
+            entry["last_at"] = event["ts"]
+            entry["events"] += 1
+            entry["comments"] = event["comments"] or entry["comments"]
+            entry["evidence_path"] = event["evidence_path"] or entry["evidence_path"]
+        else:
+            entries.append({"status": event["status"], "first_at": event["ts"], "last_at": event["ts"],
+                            "events": 1, "comments": event["comments"], "evidence_path": event["evidence_path"]})
+    return entries
+
+
+def group_timelines(events: Iterable[Dict]) -> Dict[int, List[Dict]]:
+    """Compact the events of several tasks, ordered by task then time, per task id."""
+    return {task_id: compact(task_events)
+            for task_id, task_events in itertools.groupby(events, key=lambda event: event["task_id"])}
+
+
+def timeline(conn, task_id: int) -> List[Dict]:
+    """One task's compacted history, oldest first."""
+    cursor = conn.execute(queries.VERIFICATION_TIMELINE, (task_id,))
+    columns = [d[0] for d in cursor.description]
+    return compact(dict(zip(columns, row)) for row in cursor)
+
+
+def export_events(manager: db.ConnectionManager, start: Optional[str] = None, end: Optional[str] = None,
+                  fetch_size: int = FETCH_SIZE) -> Iterator[Tuple]:
+    """Yield the events with ``start <= ts < end`` as EVENT_COLUMNS tuples, from one snapshot."""
+    with manager.read() as conn:
+        conn.execute("BEGIN")
+        try:
+            cursor = conn.execute(queries.VERIFICATION_EVENTS_RANGE, (start or "", end or "9999"))
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.execute("COMMIT")
+
+
+def write_events(rows: Iterable[Tuple], stream: io.TextIOBase, fmt: str) -> int:
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(stream)
+        writer.writerow(EVENT_COLUMNS)
+        for row in rows:
+            writer.writerow(["" if value is None else value for value in row])
+            count += 1
+    else:
+        for row in rows:
+            stream.write(json.dumps(dict(zip(EVENT_COLUMNS, row)), ensure_ascii=False))
+            stream.write("\n")
+            count += 1
+    return count
+
+
+def _day(value: str) -> str:
+    try:
+        return datetime.date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD date: {value!r}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Verification audit log")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="write verification events to CSV or JSON lines")
+    export_parser.add_argument("path", help="output file, or - for stdout")
+    schema.add_db_argument(export_parser, positional=False)
+    export_parser.add_argument("--from", dest="start", type=_day, help="first day to include")
+    export_parser.add_argument("--to", dest="end", type=_day, help="day to stop before")
+    export_parser.add_argument("--format", choices=["csv", "jsonl"],
+                               help="defaults to the file extension, else csv")
+    args = schema.parse_cli_args(parser, argv)
+
+    fmt = args.format or ("jsonl" if args.path.endswith((".jsonl", ".json")) else "csv")
+    rows = export_events(db.get_manager(args.db), args.start, args.end)
+
+    if args.path == "-":
+        count = write_events(rows, sys.stdout, fmt)
+    else:
+        # Write next to the target and swap in, so a failed export leaves no partial file
+        directory = os.path.dirname(os.path.abspath(args.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as stream:
+                count = write_events(rows, stream, fmt)
+            os.replace(tmp_path, args.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    print(f"Exported {count} verification events", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
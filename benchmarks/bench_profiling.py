@@ -0,0 +1,75 @@
+"""Cost of the rerun profiler, off and on.
+
+Times three hot paths with profiling disabled and inside
+``profiling.record()``:
+
+* an instrumented method call, against the same undecorated method;
+* a point SELECT on a ``db`` connection;
+* a cached ``QueryCache.query`` hit.
+
+Usage::
+
+    python benchmarks/bench_profiling.py --calls 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Main App"))
+
+import db  # noqa: E402
+import profiling  # noqa: E402
+import queries  # noqa: E402
+import query_cache  # noqa: E402
+import schema  # noqa: E402
+
+
+class Plain:
+    def noop(self):
+        pass
+
+
+@profiling.instrument
+class Instrumented:
+    def noop(self):
+        pass
+
+
+def per_call_ns(function, calls: int) -> float:
+    started = time.perf_counter_ns()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter_ns() - started) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100_000, help="calls per measurement")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="task_manager_bench_"), "tasks.db")
+    schema.bootstrap(db_path)
+    manager = db.get_manager(db_path)
+    manager.run_write(lambda conn: conn.execute("INSERT INTO tasks (title, status) VALUES ('bench', 'Pending')"))
+    cache = query_cache.get_cache(db_path)
+    conn = db.connect(db_path, readonly=True)
+
+    paths = [
+        ("method call", Instrumented().noop, Plain().noop),
+        ("point select", lambda: conn.execute(queries.SELECT_TASK_BY_ID, (1,)).fetchone(), None),
+        ("cached query", lambda: cache.query(queries.SELECT_TASK_BY_ID, (1,)), None),
+    ]
+    for name, function, baseline in paths:
+        if baseline is not None:
+            print(f"{name:13} plain:     {per_call_ns(baseline, args.calls):8.0f} ns")
+        print(f"{name:13} disabled:  {per_call_ns(function, args.calls):8.0f} ns")
+        # Keep the ring buffer from wrapping into a different steady state
+        with profiling.record("bench") as recorder:
+            recording = per_call_ns(function, min(args.calls, profiling.SPAN_BUFFER_SIZE // 4))
+        print(f"{name:13} recording: {recording:8.0f} ns ({recorder.recorded} spans)")
+
+
+if __name__ == "__main__":
+    main()
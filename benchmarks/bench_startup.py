@@ -0,0 +1,70 @@
+"""Startup benchmark for the Streamlit task manager.
+
+Reports two numbers:
+
+* cold start: a fresh interpreter importing and running the app script once,
+  which is what the first visitor after a deploy pays;
+* rerun: executing the script again in the same process, which is what
+  every widget interaction pays.
+
+The script is executed in Streamlit's "bare" mode (no server), so widgets
+return their defaults. Usage::
+
+    python benchmarks/bench_startup.py --reruns 20
+"""
+import argparse
+import os
+import runpy
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Main App")
+APP_SCRIPT = os.path.join(APP_DIR, "AI_agent_task_manager.py")
+
+
+def run_script_once() -> float:
+    """Execute the app script as Streamlit would and return elapsed seconds."""
+    started = time.perf_counter()
+    runpy.run_path(APP_SCRIPT, run_name="__main__")
+    return time.perf_counter() - started
+
+
+def measure_cold_start() -> float:
+    """Time a single run in a fresh interpreter, imports included."""
+    code = (
+        "import sys, time; t = time.perf_counter(); "
+        f"sys.path.insert(0, {APP_DIR!r}); "
+        f"import runpy; runpy.run_path({APP_SCRIPT!r}, run_name='__main__'); "
+        "print(time.perf_counter() - t)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=20, help="number of warm reruns to time")
+    args = parser.parse_args()
+
+    # Run against a scratch working directory so the benchmark never touches real data
+    workdir = tempfile.mkdtemp(prefix="task_manager_bench_")
+    os.chdir(workdir)
+    sys.path.insert(0, APP_DIR)
+
+    cold = measure_cold_start()
+    print(f"cold start:  {cold * 1000:.1f} ms")
+
+    run_script_once()  # first in-process run pays for imports and schema setup
+    timings = [run_script_once() for _ in range(args.reruns)]
+    print(f"rerun p50:   {statistics.median(timings) * 1000:.1f} ms")
+    print(f"rerun max:   {max(timings) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Semantic search latency: exact scan vs. IVF, with recall.
+
+Builds ``--rows`` synthetic unit vectors (drawn around ``--topics`` random
+centres, so they cluster like real task text does) and times
+``--queries`` top-k lookups against the exact index and the IVF layout
+``vector_index`` switches to past ``IVF_MIN_ROWS``. Recall@k is measured
+against the exact results.
+
+Usage::
+
+    python benchmarks/bench_vector_search.py --rows 500000 --dim 384
+
+Needs numpy and scikit-learn (both in requirements.txt).
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Main App"))
+
+import numpy as np  # noqa: E402
+
+import vector_index  # noqa: E402
+
+
+def synthetic_vectors(rows: int, dim: int, topics: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((topics, dim), dtype=np.float32)
+    vectors = centres[rng.integers(0, topics, rows)] + 0.6 * rng.standard_normal((rows, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def time_queries(base, queries: np.ndarray, k: int):
+    results = []
+    started = time.perf_counter()
+    for query in queries:
+        positions, scores = base.candidates(query, vector_index.IVF_PROBES)
+        best = vector_index.top_k(scores, k)
+        ids = base.task_ids if positions is None else base.task_ids[positions]
+        results.append(set(ids[best].tolist()))
+    return (time.perf_counter() - started) / len(queries) * 1000, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=2_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.rows, args.dim, args.topics)
+    base = vector_index._Base(np.arange(1, args.rows + 1, dtype=np.int64), vectors)
+    queries = synthetic_vectors(args.queries, args.dim, args.topics, seed=1)
+
+    exact_ms, exact = time_queries(base, queries, args.k)
+    print(f"exact: {exact_ms:.2f} ms/query over {args.rows:,} vectors")
+
+    started = time.perf_counter()
+    ivf = vector_index.build_ivf(base)
+    print(f"IVF build: {time.perf_counter() - started:.1f}s, {len(ivf.centroids)} lists")
+    ivf_ms, approximate = time_queries(ivf, queries, args.k)
+    recall = np.mean([len(a & e) / args.k for a, e in zip(approximate, exact)])
+    print(f"IVF ({vector_index.IVF_PROBES} probes): {ivf_ms:.2f} ms/query, recall@{args.k} {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
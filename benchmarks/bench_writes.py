@@ -0,0 +1,97 @@
+"""Write throughput: group commit vs. one commit per call.
+
+Simulates bursty multi-user load with ``--threads`` concurrent writers, each
+inserting ``--writes`` tasks, and compares three paths:
+
+* connect-per-call: a fresh ``sqlite3.connect`` and commit for every write,
+  which is how the app used to write;
+* commit-per-call: the shared writer connection, one transaction per write;
+* group-commit: ``ConnectionManager.submit``, where the writer thread commits
+  whatever is pending as one transaction.
+
+Usage::
+
+    python benchmarks/bench_writes.py --threads 16 --writes 200 --synchronous FULL
+
+With WAL and ``synchronous=NORMAL`` a commit does not fsync, so the gain is
+mostly in lock contention; with ``FULL`` every commit saved is an fsync.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Main App"))
+
+import db  # noqa: E402
+import schema  # noqa: E402
+
+INSERT = "INSERT INTO tasks (title, description, verification_status) VALUES (?, ?, 'Not Verified')"
+
+
+def connect_per_call(db_path, manager, title):
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute(INSERT, (title, "benchmark"))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def commit_per_call(db_path, manager, title):
+    with manager.write() as conn:
+        conn.execute(INSERT, (title, "benchmark"))
+
+
+def group_commit(db_path, manager, title):
+    manager.run_write(lambda conn: conn.execute(INSERT, (title, "benchmark")))
+
+
+def run(write, threads: int, writes: int) -> float:
+    """Return writes per second for ``write`` on a fresh database."""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="task_manager_writes_"), "tasks.db")
+    schema.bootstrap(db_path)
+    manager = db.ConnectionManager(db_path)
+
+    def worker(worker_id):
+        for i in range(writes):
+            write(db_path, manager, f"task {worker_id}-{i}")
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with manager.read() as conn:
+        count = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+    assert count == threads * writes, f"expected {threads * writes} rows, found {count}"
+    return count / elapsed, manager.stats()["group_commit"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16, help="concurrent writers")
+    parser.add_argument("--writes", type=int, default=200, help="writes per writer")
+    parser.add_argument("--synchronous", default=db.SYNCHRONOUS, choices=["OFF", "NORMAL", "FULL"],
+                        help="synchronous pragma for the pooled connections (FULL fsyncs every commit)")
+    args = parser.parse_args()
+    db.SYNCHRONOUS = args.synchronous
+
+    for name, write in [("connect-per-call", connect_per_call),
+                        ("commit-per-call", commit_per_call),
+                        ("group-commit", group_commit)]:
+        rate, group_stats = run(write, args.threads, args.writes)
+        line = f"{name:>17}: {rate:8.0f} writes/s"
+        if group_stats["commits"]:
+            line += f"  ({group_stats['avg_group_size']:.1f} writes per commit)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
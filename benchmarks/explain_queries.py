@@ -0,0 +1,47 @@
+"""Check that every read the app issues is served by an index.
+
+Builds a scratch database with ``--rows`` tasks (1M by default), runs
+``EXPLAIN QUERY PLAN`` on each statement from ``queries.all_read_queries()``
+and exits non-zero if any plan scans ``tasks`` without an index or sorts
+through a temporary B-tree. ``tests/test_query_plans.py`` runs the same
+check on a smaller fixture. Usage::
+
+    python benchmarks/explain_queries.py --rows 1000000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from fixtures import build_fixture, explained_reads, plan_problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="number of tasks in the fixture")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="task_manager_explain_"), "tasks.db")
+    started = time.perf_counter()
+    build_fixture(db_path, args.rows)
+    print(f"built {args.rows:,} row fixture in {time.perf_counter() - started:.1f}s")
+
+    conn = sqlite3.connect(db_path)
+    failures = 0
+    for name, sql, params in explained_reads():
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        problems = plan_problems(plan)
+        status = "FAIL" if problems else "ok"
+        print(f"[{status}] {name}: " + " | ".join(row[-1] for row in plan))
+        failures += bool(problems)
+    conn.close()
+
+    if failures:
+        print(f"{failures} queries fall back to a full scan or sort")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Scratch databases and query-plan checks shared by benchmarks and tests.
+
+``build_fixture`` fills a migrated database with random tasks; the
+benchmarks use a million rows, the test suite a few thousand.
+``plan_problems`` flags the ``EXPLAIN QUERY PLAN`` lines that mean a full
+scan or an unindexed sort.
+"""
+import os
+import random
+import sqlite3
+import sys
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Main App"))
+
+import analytics  # noqa: E402
+import queries  # noqa: E402
+import reminders  # noqa: E402
+import schema  # noqa: E402
+
+STATUSES = ["Pending", "Completed"]
+VERIFICATIONS = [
+    "Not Verified", "Verified - Approved", "Verified - Needs Revision", "Verified - Rejected"
+]
+
+
+def build_fixture(db_path: str, rows: int, batch_size: int = 50000) -> None:
+    """Create a migrated database filled with ``rows`` random tasks."""
+    conn = sqlite3.connect(db_path)
+    schema.migrate(conn)
+    rng = random.Random(42)
+
+    def generate(count):
+        for i in range(count):
+            verification = rng.choice(VERIFICATIONS)
+            verified = verification != "Not Verified"
+            yield (
+                f"Task {i}",
+                f"Description for task {i}",
+                rng.choice(STATUSES),
+                f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                verification,
+                f"2025-06-{rng.randint(1, 28):02d} 12:00:00" if verified else None,
+            )
+
+    rows_iter = generate(rows)
+    while True:
+        batch = [row for _, row in zip(range(batch_size), rows_iter)]
+        if not batch:
+            break
+        conn.executemany("""
+            INSERT INTO tasks (title, description, status, due_date, verification_status, verified_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, batch)
+        conn.commit()
+    conn.close()
+
+
+def plan_problems(plan_rows) -> list:
+    """Return the plan lines that indicate a full scan or an unindexed sort."""
+    problems = []
+    for row in plan_rows:
+        detail = row[-1]
+        if detail.split()[:2] == ["SCAN", "tasks"] and "INDEX" not in detail:
+            problems.append(detail)
+        elif "USE TEMP B-TREE" in detail:
+            problems.append(detail)
+    return problems
+
+
+def explained_reads() -> List[Tuple[str, str, List]]:
+    """Every read the app issues: the UI's queries plus the trend and reminder scans."""
+    start, end = analytics.trend_window()
+    return queries.all_read_queries() + [
+        ("daily trends", analytics.DAILY_TRENDS, [start, end]),
+        ("overdue before window", analytics.OVERDUE_BEFORE, [start]),
+        ("reminder rescan", reminders._UPCOMING, [0, end, 1, end]),
+    ]
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "Main App"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import schema  # noqa: E402
+
+
+def pytest_addoption(parser):
+    parser.addoption("--fixture-rows", type=int, default=5000,
+                     help="tasks in the query-plan fixture; benchmarks/explain_queries.py uses 1M")
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A freshly migrated, empty database."""
+    path = str(tmp_path / "tasks.db")
+    schema.bootstrap(path)
+    return path
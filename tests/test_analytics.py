@@ -0,0 +1,46 @@
+import datetime
+import sqlite3
+
+import analytics
+import db
+
+
+def test_trend_window_covers_the_last_days():
+    assert analytics.trend_window(7, today=datetime.date(2024, 3, 10)) == ("2024-03-04", "2024-03-10")
+
+
+def test_daily_series_fills_gaps_and_runs_the_overdue_sum():
+    rows = [
+        {"day": "2024-03-04", "created": 2, "completed": 0, "verified": 0, "overdue_delta": 1},
+        {"day": "2024-03-06", "created": 0, "completed": 1, "verified": 1, "overdue_delta": -1},
+    ]
+    series = analytics.trend_series(rows, 3, "2024-03-03", "2024-03-06")
+    assert [point["period"] for point in series] == ["2024-03-03", "2024-03-04", "2024-03-05", "2024-03-06"]
+    assert [point["overdue"] for point in series] == [3, 4, 4, 3]
+    assert [point["created"] for point in series] == [0, 2, 0, 0]
+    assert series[-1]["completed"] == series[-1]["verified"] == 1
+
+
+def test_weekly_series_sums_by_monday_and_keeps_the_last_overdue():
+    rows = [
+        {"day": "2024-03-03", "created": 1, "overdue_delta": 1},  # Sunday
+        {"day": "2024-03-04", "created": 2, "overdue_delta": 1},  # Monday
+        {"day": "2024-03-10", "created": 3, "overdue_delta": -2},
+    ]
+    series = analytics.trend_series(rows, 0, "2024-03-01", "2024-03-11", period="week")
+    assert [(p["period"], p["created"], p["overdue"]) for p in series] == [
+        ("2024-02-26", 1, 1), ("2024-03-04", 5, 0), ("2024-03-11", 0, 0),
+    ]
+
+
+def test_reconcile_reports_and_repairs_drift(db_path):
+    manager = db.get_manager(db_path)
+    manager.run_write(lambda conn: conn.execute(
+        "INSERT INTO tasks (title, status, created_at) VALUES ('t', 'Completed', '2024-03-04 10:00:00')"
+    ))
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    assert analytics.reconcile(conn) == {}
+    conn.execute("UPDATE task_daily_stats SET created = created + 5 WHERE day = '2024-03-04'")
+    assert analytics.reconcile(conn, dry_run=True)["daily_buckets"] == ["2024-03-04"]
+    assert analytics.reconcile(conn)["daily_buckets"] == ["2024-03-04"]
+    assert analytics.reconcile(conn) == {}
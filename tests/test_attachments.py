@@ -0,0 +1,99 @@
+import io
+import os
+import threading
+import time
+
+import attachments
+import db
+
+OLD = 1_000_000_000
+
+
+def store(root, content, name="evidence.pdf"):
+    return attachments.store(str(root), io.BytesIO(content), name)
+
+
+def age(path):
+    os.utime(path, (OLD, OLD))
+
+
+def test_identical_uploads_share_one_blob(tmp_path):
+    first = store(tmp_path, b"report")
+    assert store(tmp_path, b"report", "copy.PDF") == first
+    assert first.endswith(".pdf") and open(first, "rb").read() == b"report"
+    assert os.listdir(os.path.join(tmp_path, "tmp")) == []
+
+
+def test_store_recreates_a_blob_deleted_after_the_first_upload(tmp_path):
+    path = store(tmp_path, b"report")
+    os.remove(path)
+    assert store(tmp_path, b"report") == path
+    assert open(path, "rb").read() == b"report"
+
+
+def test_release_keeps_referenced_and_recently_reused_blobs(db_path, tmp_path):
+    kept, reused, orphan = (store(tmp_path, content) for content in (b"kept", b"reused", b"orphan"))
+    for path in (kept, reused, orphan):
+        age(path)
+    db.get_manager(db_path).run_write(
+        lambda conn: conn.execute("INSERT INTO tasks (title, document_path) VALUES ('t', ?)", (kept,))
+    )
+    # A new upload of the same content, whose task has not committed yet
+    store(tmp_path, b"reused")
+
+    with db.get_manager(db_path).read() as conn:
+        assert attachments.release(conn, [kept, reused, orphan, None]) == [orphan]
+    assert os.path.exists(kept) and os.path.exists(reused) and not os.path.exists(orphan)
+
+
+def test_release_waits_for_a_store_reusing_the_blob(db_path, tmp_path):
+    path = store(tmp_path, b"shared")
+    age(path)
+    released = []
+    with attachments._blob_lock:
+        releasing = threading.Thread(target=lambda: released.extend(
+            attachments.release(db.connect(db_path, readonly=True), [path])
+        ))
+        releasing.start()
+        releasing.join(timeout=0.2)
+        # What store() does with the lock held when the content already exists
+        os.utime(path)
+    releasing.join(timeout=5)
+    assert released == [] and os.path.exists(path)
+
+
+def test_sweep_deletes_old_orphans_only(db_path, tmp_path):
+    root = tmp_path / "docs"
+    kept, orphan, fresh = (store(root, content) for content in (b"kept", b"orphan", b"fresh"))
+    age(kept)
+    age(orphan)
+    db.get_manager(db_path).run_write(
+        lambda conn: conn.execute("INSERT INTO tasks (title, document_path) VALUES ('t', ?)", (kept,))
+    )
+    conn = db.connect(db_path, readonly=True)
+    dry = attachments.sweep(conn, str(root), max_deletes_per_second=None, dry_run=True)
+    assert (dry["orphaned"], dry["deleted"]) == (1, 1) and os.path.exists(orphan)
+    result = attachments.sweep(conn, str(root), max_deletes_per_second=None)
+    assert result["deleted"] == 1 and result["reclaimed_bytes"] == len(b"orphan")
+    assert [os.path.exists(p) for p in (kept, orphan, fresh)] == [True, False, True]
+
+
+def test_sweeper_survives_unexpected_errors(db_path, tmp_path, monkeypatch):
+    calls = []
+
+    def flaky_release(conn, paths, grace_seconds=attachments.ORPHAN_GRACE_SECONDS):
+        calls.append(paths)
+        if len(calls) == 1:
+            raise ValueError("boom")
+        return []
+    monkeypatch.setattr(attachments, "release", flaky_release)
+    sweeper = attachments.Sweeper(db_path, str(tmp_path), interval=3600)
+    sweeper.start()
+    sweeper.release(["a"])
+    sweeper.release(["b"])
+    deadline = time.monotonic() + 5
+    while len(calls) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # The second release still ran: the thread outlived the error
+    assert calls == [["a"], ["b"]]
+    assert sweeper.stats()["failures"] == 1 and sweeper.stats()["last_error"] == "boom"
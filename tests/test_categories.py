@@ -0,0 +1,37 @@
+import numpy as np
+
+import categories
+import db
+from model_registry import SENTENCE_MODEL
+
+CENTROIDS = np.eye(3, dtype=np.float32)
+LABELS = ["Finance", "Travel", "Hiring"]
+
+
+def test_cluster_labels_prefer_distinctive_phrases():
+    phrases = [["invoice", "task"], ["invoice", "task"], ["flight", "task"], ["hotel", "flight", "task"], ["task"]]
+    labels = categories.cluster_labels(phrases, [0, 0, 1, 1, 2], 3)
+    assert labels[:2] == ["Invoice", "Flight"]
+    # "task" is in every cluster; the last one still gets a unique label
+    assert labels[2] == "Task" and len(set(labels)) == 3
+
+
+def test_nearest_categories_falls_back_below_the_similarity_floor():
+    vectors = np.array([[0.99, 0.1, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0], [0.1, 0.1, 0.1, 0.98]], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    centroids = np.eye(3, 4, dtype=np.float32)
+    assert categories.nearest_categories(vectors, centroids, LABELS) == ["Finance", "Hiring", categories.FALLBACK_LABEL]
+
+
+def test_categorizer_only_overwrites_automatic_categories(db_path):
+    manager = db.get_manager(db_path)
+    with manager.write() as conn:
+        conn.executemany("INSERT INTO task_categories (id, label, model, centroid, size) VALUES (?, ?, ?, ?, 1)",
+                         [(i, label, SENTENCE_MODEL, CENTROIDS[i].tobytes()) for i, label in enumerate(LABELS)])
+        conn.executemany("INSERT INTO tasks (id, title, category, category_auto) VALUES (?, 't', ?, ?)",
+                         [(1, None, 0), (2, "Other", 1), (3, "Legal", 0)])
+
+    categories.Categorizer(db_path)([1, 2, 3], CENTROIDS[[1, 2, 0]])
+    with manager.read() as conn:
+        rows = conn.execute("SELECT id, category, category_auto FROM tasks ORDER BY id").fetchall()
+    assert rows == [(1, "Travel", 1), (2, "Hiring", 1), (3, "Legal", 0)]
@@ -0,0 +1,102 @@
+import sqlite3
+from concurrent.futures import Future
+
+import pytest
+
+import db
+
+
+def insert(title):
+    return lambda conn: conn.execute("INSERT INTO tasks (title) VALUES (?)", (title,)).lastrowid
+
+
+def fail(conn):
+    conn.execute("INSERT INTO tasks (title) VALUES ('half done')")
+    raise ValueError("bad write")
+
+
+def titles(manager):
+    with manager.read() as conn:
+        return [row[0] for row in conn.execute("SELECT title FROM tasks ORDER BY id")]
+
+
+def commit_group(manager, operations):
+    group = [(operation, Future()) for operation in operations]
+    with manager._writer_lock:
+        manager._commit_group(group)
+    return [future for _, future in group]
+
+
+def test_run_write_raises_the_operations_error_and_keeps_working(db_path):
+    manager = db.ConnectionManager(db_path)
+    with pytest.raises(ValueError, match="bad write"):
+        manager.run_write(fail)
+    assert manager.run_write(insert("after")) == 1
+    assert titles(manager) == ["after"]
+
+
+def test_a_failing_write_is_rolled_back_alone(db_path):
+    manager = db.ConnectionManager(db_path)
+    first, failed, last = commit_group(manager, [insert("first"), fail, insert("last")])
+    assert (first.result(), last.result()) == (1, 2)
+    assert isinstance(failed.exception(), ValueError)
+    assert titles(manager) == ["first", "last"]
+    assert manager.stats()["group_commit"]["writes"] == 3
+
+
+def test_a_broken_group_transaction_fails_every_write(db_path):
+    manager = db.ConnectionManager(db_path)
+
+    def releases_the_savepoint(conn):
+        conn.execute("RELEASE queued_write")
+
+    futures = commit_group(manager, [insert("first"), releases_the_savepoint, insert("last")])
+    errors = [future.exception() for future in futures]
+    assert all(isinstance(error, sqlite3.OperationalError) for error in errors)
+    assert len({id(error) for error in errors}) == 1
+    assert titles(manager) == []
+    assert manager.stats()["group_commit"]["commits"] == 0
+    manager.run_write(insert("later"))
+    assert titles(manager) == ["later"]
+
+
+def test_cancelled_writes_are_skipped(db_path):
+    manager = db.ConnectionManager(db_path)
+    group = [(insert("kept"), Future()), (insert("cancelled"), Future())]
+    group[1][1].cancel()
+    with manager._writer_lock:
+        manager._commit_group(group)
+    assert group[1][1].cancelled() and titles(manager) == ["kept"]
+
+
+def test_per_db_singleton_shares_one_object_per_file_and_key(tmp_path):
+    created = []
+
+    @db.per_db_singleton(key=lambda flavour="plain": flavour)
+    def get_thing(db_path, flavour="plain"):
+        created.append((db_path, flavour))
+        return object()
+
+    path = str(tmp_path / "a.db")
+    assert get_thing(path) is get_thing(str(tmp_path / "." / "a.db")) is get_thing(path, "plain")
+    assert get_thing(path, flavour="spicy") is not get_thing(path)
+    assert get_thing(str(tmp_path / "b.db")) is not get_thing(path)
+    assert len(created) == 3
+
+
+def test_change_log_reports_changes_and_trimmed_gaps(db_path):
+    manager = db.get_manager(db_path)
+    log = db.ChangeLog("task_changes")
+    with manager.read() as conn:
+        assert log.changed_since(conn, 0) == (0, [])
+    manager.run_write(lambda conn: conn.executemany("INSERT INTO tasks (title) VALUES (?)", [("a",), ("b",)]))
+    manager.run_write(lambda conn: conn.execute("UPDATE tasks SET priority = 'High' WHERE id = 1"))
+    with manager.read() as conn:
+        latest, changed = log.changed_since(conn, 0)
+        assert sorted(changed) == [1, 2]
+        assert log.changed_since(conn, latest) == (latest, [])
+
+    log.trim(manager, latest - 1, max_rows=1)
+    with manager.read() as conn:
+        assert log.changed_since(conn, 0) is None
+        assert log.changed_since(conn, latest - 1) == (latest, [1])
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+import db
+import duplicates
+import embeddings
+
+
+def unit(rows):
+    return (rows / np.linalg.norm(rows, axis=1, keepdims=True)).astype(np.float32)
+
+
+def synthetic(n_clusters, n_noise, dim=32, seed=0):
+    """Clusters of three near-identical vectors, among unrelated ones."""
+    rng = np.random.default_rng(seed)
+    centers = unit(rng.standard_normal((n_clusters, dim)))
+    members = np.repeat(centers, 3, axis=0) + 0.03 * rng.standard_normal((3 * n_clusters, dim))
+    matrix = unit(np.vstack([members, rng.standard_normal((n_noise, dim))]))
+    task_ids = np.arange(1, len(matrix) + 1) * 10
+    order = rng.permutation(len(matrix))
+    expected = sorted([int(task_ids[3 * c + k]) for k in range(3)] for c in range(n_clusters))
+    return task_ids[order], matrix[order], expected
+
+
+def brute_force_pairs(task_ids, matrix, threshold):
+    similarity = matrix @ matrix.T
+    rows, cols = np.nonzero(np.triu(similarity >= threshold, k=1))
+    return {tuple(sorted((int(task_ids[r]), int(task_ids[c])))) for r, c in zip(rows, cols)}
+
+
+@pytest.mark.parametrize("n_noise", [200, duplicates.CLUSTER_EXACT_MAX_ROWS + 500])
+def test_clusters_match_exact_comparison(n_noise):
+    if n_noise > duplicates.CLUSTER_EXACT_MAX_ROWS:
+        pytest.importorskip("sklearn", reason="IVF lists are built with scikit-learn's KMeans")
+    task_ids, matrix, expected = synthetic(40, n_noise)
+    pairs = duplicates.duplicate_pairs(task_ids, matrix)
+    found = {(a, b) for a, b, _ in pairs}
+    exact = brute_force_pairs(task_ids, matrix, duplicates.DUPLICATE_THRESHOLD)
+    # With IVF lists a pair split across unprobed lists may be missed, never invented
+    assert found == exact if len(matrix) <= duplicates.CLUSTER_EXACT_MAX_ROWS else found <= exact
+    assert all(a < b and score >= duplicates.DUPLICATE_THRESHOLD for a, b, score in pairs)
+    assert sorted(duplicates.duplicate_clusters(task_ids, matrix)) == expected
+
+
+def test_clusters_join_chains_and_sort_largest_first():
+    a, b = unit(np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]]))
+    # 1-2 and 2-3 are near-duplicates, 1-3 are not: still one cluster
+    chain = unit(np.array([a + 0.0 * b, a + 0.35 * b, a + 0.7 * b]))
+    pair = unit(np.array([[0.0, 0.0, 1.0], [0.0, 0.05, 1.0]]))
+    task_ids = np.array([5, 3, 9, 2, 7])
+    clusters = duplicates.duplicate_clusters(task_ids, np.vstack([chain, pair]), threshold=0.93)
+    assert clusters == [[3, 5, 9], [2, 7]]
+
+
+def test_no_duplicates_gives_no_clusters():
+    assert duplicates.duplicate_clusters(np.array([1, 2]), unit(np.eye(2))) == []
+
+
+class RankedIndex:
+    """Stands in for SemanticIndex: a fixed ranking of (task_id, score)."""
+
+    def __init__(self, ranking):
+        self.ranking = ranking
+        self.searches = []
+
+    def search(self, query, k):
+        self.searches.append(k)
+        return self.ranking[:k]
+
+
+def test_find_duplicates_looks_past_completed_tasks(db_path, monkeypatch):
+    monkeypatch.setattr(embeddings, "encode", lambda texts: np.zeros((len(texts), 4), dtype=np.float32))
+    manager = db.get_manager(db_path)
+    with manager.write() as conn:
+        conn.executemany("INSERT INTO tasks (title, status) VALUES (?, ?)",
+                         [(f"done {i}", "Completed") for i in range(12)] + [("open", "Pending")] * 2)
+    index = RankedIndex([(task_id, 0.99 - task_id / 1000) for task_id in range(1, 15)] + [(99, 0.5)])
+    found = duplicates.find_duplicates(index, manager, "open", "", k=2)
+    assert [task["id"] for task in found] == [13, 14]
+    assert index.searches == [2, 8, 32]
@@ -0,0 +1,66 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+import db
+import embeddings
+from model_registry import SENTENCE_MODEL
+
+
+@pytest.fixture
+def encoded(monkeypatch):
+    """Replace the sentence model with a deterministic hash encoder; records what was encoded."""
+    calls = []
+
+    def encode(texts, batch_size=embeddings.ENCODE_BATCH_SIZE):
+        calls.append(list(texts))
+        rows = [np.frombuffer(hashlib.sha256(text.encode()).digest(), dtype=np.uint8)[:8] for text in texts]
+        vectors = np.array(rows, dtype=np.float32) + 1
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    monkeypatch.setattr(embeddings, "encode", encode)
+    return calls
+
+
+def add_tasks(manager, rows):
+    manager.run_write(lambda conn: conn.executemany("INSERT INTO tasks (title, description) VALUES (?, ?)", rows))
+
+
+def test_only_missing_or_changed_embeddings_are_encoded(db_path, encoded):
+    manager = db.get_manager(db_path)
+    add_tasks(manager, [("Weekly report", ""), ("Weekly report", ""), ("Book flights", "to Berlin")])
+    assert embeddings.embed_tasks(manager, [1, 2, 3]) == 3
+    # Identical texts are encoded once
+    assert encoded == [["Weekly report", "Book flights\nto Berlin"]]
+
+    assert embeddings.embed_tasks(manager, [1, 2, 3]) == 0
+    manager.run_write(lambda conn: conn.execute("UPDATE tasks SET title = 'Monthly report' WHERE id = 2"))
+    assert embeddings.embed_tasks(manager, [1, 2, 3]) == 1
+    assert encoded[-1] == ["Monthly report"]
+
+
+def test_reindex_resumes_and_load_matrix_is_in_id_order(db_path, encoded):
+    manager = db.get_manager(db_path)
+    add_tasks(manager, [(f"Task {i}", "") for i in range(7)])
+    embeddings.embed_tasks(manager, [2, 5])
+    seen = []
+    assert embeddings.reindex(manager, batch_size=3, progress=lambda last, n: seen.append((last, n))) == 5
+    assert seen == [(3, 2), (6, 4), (7, 5)]
+
+    with manager.read() as conn:
+        task_ids, matrix = embeddings.load_matrix(conn)
+        assert conn.execute("SELECT COUNT(*) FROM task_embedding_changes").fetchone()[0] == 0
+    assert task_ids.tolist() == list(range(1, 8)) and matrix.shape == (7, 8)
+    assert np.allclose(matrix[0], embeddings.encode(["Task 0"])[0])
+    with manager.read() as conn:
+        assert embeddings.load_matrix(conn, "other-model")[0].size == 0
+
+
+def test_embeddings_of_deleted_tasks_are_not_saved(db_path, encoded):
+    manager = db.get_manager(db_path)
+    add_tasks(manager, [("Gone soon", "")])
+    stale = [(1, "Gone soon", embeddings.content_hash("Gone soon"))]
+    manager.run_write(lambda conn: conn.execute("DELETE FROM tasks WHERE id = 1"))
+    embeddings._encode_and_save(manager, SENTENCE_MODEL, stale)
+    with manager.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM task_embeddings").fetchone()[0] == 0
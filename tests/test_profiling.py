@@ -0,0 +1,92 @@
+import json
+import threading
+
+import db
+import profiling
+import query_cache
+
+
+@profiling.instrument
+class Service:
+    def __init__(self):
+        self.calls = 0
+
+    def work(self):
+        self.calls += 1
+        return self.calls
+
+    def __repr__(self):
+        return "Service()"
+
+
+def test_instrumented_methods_record_only_inside_record():
+    service = Service()
+    assert service.work() == 1
+    with profiling.record("rerun") as recorder:
+        service.work()
+        with profiling.paused():
+            service.work()
+    service.work()
+    assert [(span.name, span.category) for span in recorder.spans] == [("Service.work", "method")]
+    assert Service.__repr__.__qualname__ == "Service.__repr__" and not hasattr(Service.__repr__, "__wrapped__")
+    with profiling.record("off", enabled=False) as disabled:
+        assert disabled is None and profiling.current() is None
+
+
+def test_the_span_buffer_is_bounded():
+    recorder = profiling.Recorder("rerun", capacity=3)
+    for i in range(5):
+        recorder.add(f"span {i}", "app", i, i + 1)
+    assert [span.name for span in recorder.spans] == ["span 2", "span 3", "span 4"]
+    assert (recorder.recorded, recorder.dropped) == (5, 2)
+
+
+def test_spans_from_several_threads_are_all_counted():
+    recorder = profiling.Recorder("rerun", capacity=100)
+
+    def record_many():
+        for i in range(2_000):
+            recorder.add("span", "app", i, i + 1)
+
+    threads = [threading.Thread(target=record_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (recorder.recorded, recorder.dropped) == (8_000, 7_900)
+
+
+def test_sql_and_cached_reads_are_recorded_and_exported(db_path):
+    manager = db.get_manager(db_path)
+    cache = query_cache.QueryCache(db_path)
+    with profiling.record("rerun") as recorder:
+        manager.run_write(lambda conn: conn.execute("INSERT INTO tasks (title) VALUES ('a')"))
+        cache.query("SELECT title FROM tasks")
+        cache.query("SELECT title FROM tasks")
+    queries = [span for span in recorder.spans if span.category == "query"]
+    assert [span.args["cached"] for span in queries] == [False, True]
+    inserts = [span for span in recorder.spans if span.category == "sql" and span.name.startswith("INSERT")]
+    # The write ran on the writer thread, in the caller's recording
+    assert len(inserts) == 1 and inserts[0].thread != threading.get_ident()
+    summary = {(entry["category"], entry["name"]): entry for entry in recorder.summary()}
+    assert summary[("query", "SELECT title FROM tasks")]["calls"] == 2
+
+    trace = json.loads(json.dumps(profiling.chrome_trace([recorder])))
+    assert trace["traceEvents"][0]["name"] == "rerun"
+    assert len(trace["traceEvents"]) == len(recorder.spans) + 1
+    assert json.loads(json.dumps(recorder.as_dict()))["dropped_spans"] == 0
+
+
+def test_count_statements_includes_queued_writes(db_path):
+    manager = db.get_manager(db_path)
+    with db.count_statements() as counter:
+        manager.run_write(lambda conn: conn.execute("INSERT INTO tasks (title) VALUES ('a')"))
+        with manager.read() as conn:
+            conn.execute("SELECT COUNT(*) FROM tasks").fetchone()
+    assert counter.as_dict() == {"INSERT": 1, "SELECT": 1}
+
+
+def test_sql_label_is_one_short_line():
+    assert profiling.sql_label("SELECT *\n   FROM tasks\n") == "SELECT * FROM tasks"
+    label = profiling.sql_label("SELECT " + ", ".join(f"column_{i}" for i in range(50)))
+    assert len(label) == profiling.SQL_LABEL_CHARS and label.endswith("…")
@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+
+import db
+import queries
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", None),
+    (None, None),
+    ("  -- * ", None),
+    ("audit", '"audit"*'),
+    ("Audit report", '"Audit"* "report"*'),
+    ('quote" OR title:x NEAR(a b)', '"quote"* "OR"* "title"* "x"* "NEAR"* "a"* "b"*'),
+    ("café-2024", '"café"* "2024"*'),
+])
+def test_fts_match_expression(text, expected):
+    assert queries.fts_match_expression(text) == expected
+
+
+@pytest.fixture
+def task_conn(db_path):
+    db.get_manager(db_path).run_write(lambda conn: conn.executemany(
+        "INSERT INTO tasks (title, description, status, due_date) VALUES (?, ?, ?, ?)", [
+            ("Audit report", "for finance", "Pending", "2024-03-01"),
+            ("Auditor meeting", "", "Completed", "2024-03-02"),
+            ("Book travel", "NEAR the office", "Pending", None),
+            ("Pay invoices", "finance", "Pending", "2024-03-01"),
+        ]))
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def titles(conn, query):
+    return [row["title"] for row in conn.execute(*query)]
+
+
+def test_search_is_a_prefix_match_and_never_fts_syntax(task_conn):
+    # Ranked by relevance, so compare as sets
+    assert sorted(titles(task_conn, queries.task_page_query("All", "aud"))) == ["Audit report", "Auditor meeting"]
+    assert titles(task_conn, queries.task_page_query("Pending", "audit")) == ["Audit report"]
+    for text in ['"', "NEAR(", "finance OR", "title:", "a -b", "*"]:
+        task_conn.execute(*queries.task_page_query("All", text)).fetchall()
+    assert task_conn.execute(*queries.task_count_query("All", "finance")).fetchone()["total"] == 2
+
+
+def test_keyset_pages_cover_every_task_once(task_conn):
+    seen, cursor = [], None
+    while True:
+        rows = task_conn.execute(*queries.task_page_query("All", cursor=cursor, page_size=1)).fetchall()
+        seen.append(rows[0]["title"])
+        if len(rows) < 2:
+            break
+        cursor = (rows[0]["due_date"], rows[0]["id"])
+    assert seen == ["Book travel", "Audit report", "Pay invoices", "Auditor meeting"]
@@ -0,0 +1,60 @@
+import contextlib
+import threading
+
+import db
+import query_cache
+
+SELECT_TITLES = "SELECT id, title FROM tasks ORDER BY id"
+
+
+def add_task(db_path, title):
+    db.get_manager(db_path).run_write(lambda conn: conn.execute("INSERT INTO tasks (title) VALUES (?)", (title,)))
+
+
+def test_hits_until_the_database_changes(db_path):
+    cache = query_cache.QueryCache(db_path)
+    add_task(db_path, "a")
+    assert [row["title"] for row in cache.query(SELECT_TITLES)] == ["a"]
+    cache.query(SELECT_TITLES)[0]["title"] = "mutated"
+    assert [row["title"] for row in cache.query(SELECT_TITLES)] == ["a"]
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    add_task(db_path, "b")
+    assert [row["title"] for row in cache.query(SELECT_TITLES)] == ["a", "b"]
+    assert cache.misses == 2
+
+
+def wrap_reads(monkeypatch, cache, after_query):
+    read = cache._manager.read
+
+    @contextlib.contextmanager
+    def reading():
+        with read() as conn:
+            yield conn
+        after_query()
+    monkeypatch.setattr(cache._manager, "read", reading)
+
+
+def test_result_of_a_query_overlapping_a_write_is_not_stored(db_path, monkeypatch):
+    cache = query_cache.QueryCache(db_path)
+    add_task(db_path, "a")
+    wrap_reads(monkeypatch, cache, lambda: add_task(db_path, "b"))
+    assert [row["title"] for row in cache.query(SELECT_TITLES)] == ["a"]
+    assert cache.stats()["entries"] == 0
+
+
+def test_misses_run_without_holding_the_cache_lock(db_path, monkeypatch):
+    cache = query_cache.QueryCache(db_path)
+    add_task(db_path, "a")
+    cache.query(SELECT_TITLES)
+    served = []
+
+    def hit_from_another_thread():
+        other = threading.Thread(target=lambda: served.append(cache.query(SELECT_TITLES)))
+        other.start()
+        other.join(timeout=5)
+        assert not other.is_alive()
+
+    wrap_reads(monkeypatch, cache, hit_from_another_thread)
+    cache.query("SELECT count(*) AS n FROM tasks")
+    assert served and served[0][0]["title"] == "a"
@@ -0,0 +1,39 @@
+import sqlite3
+
+import pytest
+
+import queries
+from fixtures import build_fixture, explained_reads, plan_problems
+
+
+@pytest.fixture(scope="module")
+def fixture_conn(request, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("plans") / "tasks.db")
+    build_fixture(path, request.config.getoption("--fixture-rows"))
+    conn = sqlite3.connect(path)
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("name, sql, params", explained_reads(), ids=[read[0] for read in explained_reads()])
+def test_read_is_served_by_an_index(fixture_conn, name, sql, params):
+    plan = fixture_conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    assert plan_problems(plan) == [], " | ".join(row[-1] for row in plan)
+
+
+def test_every_query_constant_is_explained():
+    explained = {sql for _, sql, _ in explained_reads()}
+    constants = {
+        name for name, value in vars(queries).items()
+        if name.isupper() and isinstance(value, str) and value.lstrip().upper().startswith("SELECT")
+        and "FROM" in value.upper()
+    }
+    assert constants, "no SQL constants found in queries.py"
+    assert {name for name in constants if getattr(queries, name) not in explained} == set()
+
+
+def test_plan_problems_flags_full_scans_and_temp_sorts():
+    assert plan_problems([(2, 0, 0, "SCAN tasks")]) == ["SCAN tasks"]
+    assert plan_problems([(2, 0, 0, "USE TEMP B-TREE FOR ORDER BY")]) == ["USE TEMP B-TREE FOR ORDER BY"]
+    assert plan_problems([(2, 0, 0, "SCAN tasks USING INDEX idx_tasks_due")]) == []
+    assert plan_problems([(2, 0, 0, "SEARCH tasks USING INTEGER PRIMARY KEY (rowid=?)")]) == []
@@ -0,0 +1,47 @@
+import datetime
+
+import pytest
+
+import quick_add
+
+MONDAY = datetime.date(2024, 3, 4)
+SATURDAY = datetime.date(2024, 3, 9)
+
+
+@pytest.mark.parametrize("phrase, today, expected", [
+    ("today", MONDAY, "2024-03-04"),
+    ("Tomorrow", MONDAY, "2024-03-05"),
+    ("friday", MONDAY, "2024-03-08"),
+    ("this friday", MONDAY, "2024-03-08"),
+    # On a Monday, "next friday" skips this week's
+    ("next Friday", MONDAY, "2024-03-15"),
+    # Later in the week, this week's has passed and it's the coming one
+    ("next friday", SATURDAY, "2024-03-15"),
+    ("monday", MONDAY, "2024-03-11"),
+    ("next monday", MONDAY, "2024-03-11"),
+    ("next week", MONDAY, "2024-03-11"),
+    ("next month", datetime.date(2024, 1, 31), "2024-02-29"),
+    ("end of week", MONDAY, "2024-03-08"),
+    ("end of the week", SATURDAY, "2024-03-15"),
+    ("end of month", MONDAY, "2024-03-31"),
+    ("in 3 days", MONDAY, "2024-03-07"),
+    ("in 2 weeks", MONDAY, "2024-03-18"),
+    ("in 1 month", datetime.date(2024, 12, 31), "2025-01-31"),
+    ("2026-01-31", MONDAY, "2026-01-31"),
+    ("2026-02-31", MONDAY, None),
+])
+def test_resolve_phrase(phrase, today, expected):
+    day = quick_add.resolve_phrase(phrase, today)
+    assert (day.isoformat() if day else None) == expected
+
+
+def test_parse_lines_splits_out_dates_and_priority():
+    lines = ["Submit audit report to finance by next Friday, high priority", "",
+             "Plan offsite from tomorrow due in 2 weeks", "urgent: call the bank today"]
+    parsed = [task.as_dict() for task in quick_add.parse_lines(lines, MONDAY)]
+    assert parsed == [
+        {"title": "Submit audit report to finance", "start_date": "2024-03-04",
+         "due_date": "2024-03-15", "priority": "High"},
+        {"title": "Plan offsite", "start_date": "2024-03-05", "due_date": "2024-03-18", "priority": "Normal"},
+        {"title": "Call the bank", "start_date": "2024-03-04", "due_date": "2024-03-04", "priority": "High"},
+    ]
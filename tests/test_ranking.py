@@ -0,0 +1,95 @@
+import datetime
+import random
+
+import pytest
+
+import db
+import ranking
+
+PRIORITIES = list(ranking.PRIORITY_SCORES)
+STATUSES = [None, "Verified - Needs Revision", "Verified - Rejected"]
+
+
+def random_task(rng, today):
+    due = today + datetime.timedelta(days=rng.randint(-10, 20))
+    return (f"task {rng.random():.6f}", rng.choice(PRIORITIES), rng.choice([due.isoformat(), None]),
+            (today - datetime.timedelta(days=rng.randint(0, 60))).isoformat(),
+            rng.choice(STATUSES), rng.choice(["Finance", "Ops", None]))
+
+
+def insert(conn, tasks):
+    conn.executemany("""
+        INSERT INTO tasks (title, priority, due_date, created_at, verification_status, category, status)
+        VALUES (?, ?, ?, ?, ?, ?, 'Pending')
+    """, tasks)
+
+
+def mutate(conn, rng, today):
+    ids = [row[0] for row in conn.execute("SELECT id FROM tasks WHERE status = 'Pending'")]
+    for task_id in rng.sample(ids, min(len(ids), 3)):
+        action = rng.choice(["complete", "priority", "due", "delete"])
+        if action == "complete":
+            conn.execute("UPDATE tasks SET status = 'Completed' WHERE id = ?", (task_id,))
+        elif action == "priority":
+            conn.execute("UPDATE tasks SET priority = ? WHERE id = ?", (rng.choice(PRIORITIES), task_id))
+        elif action == "due":
+            due = today + datetime.timedelta(days=rng.randint(-5, 10))
+            conn.execute("UPDATE tasks SET due_date = ? WHERE id = ?", (due.isoformat(), task_id))
+        else:
+            conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+    insert(conn, [random_task(rng, today) for _ in range(rng.randint(0, 2))])
+
+
+@pytest.mark.parametrize("grouped", [False, True])
+def test_incremental_top_matches_a_full_rescore(db_path, grouped):
+    rng = random.Random(7)
+    today = datetime.date.today()
+    manager = db.get_manager(db_path)
+    manager.run_write(lambda conn: insert(conn, [random_task(rng, today) for _ in range(200)]))
+    incremental = ranking.FocusRanking(db_path, grouped=grouped, top_n=10)
+    incremental.top()
+
+    for _ in range(40):
+        manager.run_write(lambda conn: mutate(conn, rng, today))
+        expected = ranking.FocusRanking(db_path, grouped=grouped, top_n=10).top(10)
+        actual = incremental.top(10)
+        assert [r["id"] for r in actual] == [r["id"] for r in expected]
+        assert [r["score"] for r in actual] == pytest.approx([r["score"] for r in expected])
+    assert incremental.loads == 1 and incremental.patches > 0
+
+
+def test_ties_go_to_the_older_task(db_path):
+    today = datetime.date.today().isoformat()
+    db.get_manager(db_path).run_write(lambda conn: insert(conn, [("same", "High", None, today, None, None)] * 3))
+    assert [r["id"] for r in ranking.FocusRanking(db_path, top_n=2).top(2)] == [1, 2]
+
+
+def test_a_trimmed_change_log_forces_a_reload(db_path):
+    rng = random.Random(3)
+    today = datetime.date.today()
+    manager = db.get_manager(db_path)
+    manager.run_write(lambda conn: insert(conn, [random_task(rng, today) for _ in range(30)]))
+    focus = ranking.FocusRanking(db_path, top_n=5)
+    focus.top()
+    manager.run_write(lambda conn: mutate(conn, rng, today))
+    manager.run_write(lambda conn: conn.execute("DELETE FROM task_changes"))
+    manager.run_write(lambda conn: mutate(conn, rng, today))
+    assert [r["id"] for r in focus.top(5)] == [r["id"] for r in ranking.FocusRanking(db_path, top_n=5).top(5)]
+    assert focus.loads == 2
+
+
+def test_trimming_keeps_the_rows_a_ranking_has_not_applied(db_path, monkeypatch):
+    rng = random.Random(4)
+    today = datetime.date.today()
+    manager = db.get_manager(db_path)
+    manager.run_write(lambda conn: insert(conn, [random_task(rng, today) for _ in range(30)]))
+    focus = ranking.FocusRanking(db_path, top_n=5)
+    focus.top()
+    monkeypatch.setattr(ranking, "CHANGE_LOG_MAX_ROWS", 2)
+    manager.run_write(lambda conn: mutate(conn, rng, today))
+    focus.top()
+    with manager.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM task_changes WHERE seq <= ?", (focus._seq,)).fetchone()[0] == 0
+    manager.run_write(lambda conn: mutate(conn, rng, today))
+    focus.top()
+    assert focus.loads == 1
@@ -0,0 +1,32 @@
+import datetime
+import json
+import os
+
+import db
+import reminders
+
+
+def test_relative_file_sinks_resolve_against_the_base_dir(tmp_path):
+    assert reminders.make_sink("file:out.jsonl", base_dir=str(tmp_path)).path == os.path.join(tmp_path, "out.jsonl")
+    assert reminders.make_sink("file:/abs/out.jsonl", base_dir=str(tmp_path)).path == "/abs/out.jsonl"
+    assert reminders.make_sink("file:out.jsonl").path == "out.jsonl"
+
+
+def test_each_reminder_is_sent_once(db_path, tmp_path):
+    today = datetime.date.today()
+    rows = [("overdue", today - datetime.timedelta(days=3), "Pending"),
+            ("soon", today + datetime.timedelta(days=1), "Pending"),
+            ("later", today + datetime.timedelta(days=30), "Pending"),
+            ("done", today - datetime.timedelta(days=3), "Completed")]
+    db.get_manager(db_path).run_write(lambda conn: conn.executemany(
+        "INSERT INTO tasks (title, due_date, status) VALUES (?, ?, ?)",
+        [(title, due.isoformat(), status) for title, due, status in rows],
+    ))
+    sink = reminders.FileSink(str(tmp_path / "sent.jsonl"))
+    scheduler = reminders.ReminderScheduler(db_path, sink)
+
+    sent = scheduler.run_pending()
+    assert sorted((r.title, r.kind) for r in sent) == [("overdue", "overdue"), ("soon", "due soon")]
+    assert scheduler.run_pending() == []
+    with open(sink.path, encoding="utf-8") as f:
+        assert sorted(json.loads(line)["title"] for line in f) == ["overdue", "soon"]
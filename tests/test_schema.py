@@ -0,0 +1,52 @@
+import sqlite3
+
+import schema
+
+LEGACY_TASKS = """
+    CREATE TABLE tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT, description TEXT, category TEXT DEFAULT "Other",
+        status TEXT DEFAULT "Pending", start_date TEXT, due_date TEXT,
+        priority TEXT DEFAULT "Normal", document_path TEXT, verification_status TEXT
+    )
+"""
+
+
+def legacy_db(tmp_path, rows):
+    conn = sqlite3.connect(str(tmp_path / "legacy.db"), isolation_level=None)
+    conn.execute(LEGACY_TASKS)
+    conn.executemany("INSERT INTO tasks (title, status, category) VALUES (?, ?, ?)", rows)
+    return conn
+
+
+def test_migrates_a_legacy_database_to_the_latest_version(tmp_path):
+    conn = legacy_db(tmp_path, [("a", "Pending", "Other")])
+    applied = schema.migrate(conn)
+    assert [m.version for m in applied] == [m.version for m in schema.MIGRATIONS]
+    assert schema.current_version(conn) == schema.LATEST_VERSION
+    assert schema.missing_maintenance(conn) == []
+    assert schema.migrate(conn) == []
+
+
+def test_legacy_default_categories_can_be_replaced(tmp_path):
+    conn = legacy_db(tmp_path, [("a", "Pending", "Other"), ("b", "Pending", None), ("c", "Pending", "Finance")])
+    schema.migrate(conn)
+    assert conn.execute("SELECT title, category_auto FROM tasks ORDER BY id").fetchall() == [
+        ("a", 1), ("b", 1), ("c", 0),
+    ]
+
+
+def test_completed_legacy_tasks_get_a_completion_day(tmp_path):
+    conn = legacy_db(tmp_path, [])
+    conn.executemany("INSERT INTO tasks (title, status, due_date) VALUES (?, ?, ?)", [
+        ("due", "Completed", "2020-01-05"), ("undated", "Completed", None),
+        ("future", "Completed", "2999-01-01"), ("open", "Pending", "2020-01-05"),
+    ])
+    schema.migrate(conn)
+    completed = dict(conn.execute("SELECT title, completed_at FROM tasks"))
+    assert completed["due"] == "2020-01-05 00:00:00"
+    assert completed["undated"] is not None and completed["future"] < "2999"
+    assert completed["open"] is None
+    assert conn.execute("SELECT completed FROM task_daily_stats WHERE day = '2020-01-05'").fetchone() == (1,)
+    # Only the pending task is still overdue
+    assert conn.execute("SELECT SUM(overdue_delta) FROM task_daily_stats").fetchone() == (1,)
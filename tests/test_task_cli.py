@@ -0,0 +1,158 @@
+import json
+
+import pytest
+
+import db
+import schema
+import task_cli
+
+
+def records(*rows):
+    return list(enumerate(rows, start=1))
+
+
+def task_rows(db_path):
+    with db.get_manager(db_path).read() as conn:
+        return conn.execute("SELECT id, external_id, title FROM tasks ORDER BY id").fetchall()
+
+
+def next_id(db_path):
+    with db.get_manager(db_path).read() as conn:
+        return conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'").fetchone()[0] + 1
+
+
+def test_validate_record_normalizes_dates_and_defaults():
+    row = task_cli.validate_record(
+        1, {"title": " Report ", "due_date": "2025-03-04T10:00:00", "verified_at": "2025-03-04T10:00:00Z"})
+    values = dict(zip(task_cli.IMPORT_COLUMNS, row))
+    assert values["title"] == "Report"
+    assert values["due_date"] == "2025-03-04"
+    assert values["verified_at"] == "2025-03-04 10:00:00"
+    assert values["created_at"] is None and values["status"] is None
+    inserted = dict(zip(task_cli.IMPORT_COLUMNS, task_cli.insert_params(row, "2025-01-01 00:00:00")))
+    assert inserted["created_at"] == "2025-01-01 00:00:00"
+    assert (inserted["status"], inserted["priority"]) == ("Pending", "Normal")
+
+
+@pytest.mark.parametrize("record, message", [
+    ({"description": "no title"}, "title is required"),
+    ({"title": "x", "due_date": "tomorrow"}, "not a YYYY-MM-DD date"),
+    ([1, 2], "expected an object"),
+    ({"title": "x", "status": "Done"}, "status 'Done' is not one of"),
+    ({"title": "x", "priority": "urgent"}, "priority 'urgent' is not one of"),
+])
+def test_validate_record_rejects_bad_rows(record, message):
+    with pytest.raises(task_cli.RowError, match=message):
+        task_cli.validate_record(7, record)
+
+
+def test_duplicate_external_id_is_skipped_not_fatal(db_path):
+    manager = db.get_manager(db_path)
+    task_cli.import_tasks(manager, records({"external_id": "a", "title": "first"}))
+    errors = []
+    written = task_cli.import_tasks(manager, records(
+        {"external_id": "a", "title": "again"}, {"external_id": "b", "title": "new"}), errors=errors)
+    assert written == 1
+    assert [e.line for e in errors] == [1]
+    assert [row[1:] for row in task_rows(db_path)] == [("a", "first"), ("b", "new")]
+
+
+def test_skipped_rows_keep_only_the_first_errors(db_path):
+    errors = task_cli.SkippedRows(limit=3)
+    task_cli.import_tasks(db.get_manager(db_path), records(*[{"description": "no title"}] * 50), errors=errors)
+    assert len(errors) == 50
+    assert [e.line for e in errors] == [1, 2, 3]
+
+
+def test_upsert_updates_in_place_without_using_up_ids(db_path):
+    manager = db.get_manager(db_path)
+    rows = [{"external_id": str(i), "title": f"v1 {i}"} for i in range(50)]
+    task_cli.import_tasks(manager, records(*rows))
+    before = next_id(db_path)
+    written = task_cli.import_tasks(
+        manager, records(*[dict(row, title=row["title"].replace("v1", "v2")) for row in rows]), upsert=True)
+    assert written == 50
+    assert next_id(db_path) == before
+    assert all(title.startswith("v2") for _, _, title in task_rows(db_path))
+
+
+def test_upsert_keeps_timestamps_the_record_leaves_out(db_path):
+    manager = db.get_manager(db_path)
+    task_cli.import_tasks(manager, records({
+        "external_id": "X1", "title": "t", "status": "Completed", "created_at": "2024-01-01T10:00:00",
+        "completed_at": "2024-01-05", "due_date": "2024-01-10"}))
+    task_cli.import_tasks(manager, records(
+        {"external_id": "X1", "title": "renamed", "status": "Completed", "due_date": "2024-01-10"}), upsert=True)
+    with manager.read() as conn:
+        task = conn.execute("SELECT title, created_at, completed_at FROM tasks").fetchone()
+        overdue = conn.execute("SELECT COALESCE(SUM(overdue_delta), 0) FROM task_daily_stats").fetchone()[0]
+    assert task == ("renamed", "2024-01-01 10:00:00", "2024-01-05 00:00:00")
+    assert overdue == 0
+
+
+def test_deferred_import_rebuilds_search_and_stats(db_path):
+    manager = db.get_manager(db_path)
+    task_cli.import_tasks(manager, records({"title": "quarterly report", "status": "Completed"}),
+                          defer_indexes=True)
+    with manager.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM tasks_fts WHERE tasks_fts MATCH 'quarterly'").fetchone()[0] == 1
+        assert conn.execute("SELECT total, completed FROM task_stats").fetchone() == (1, 1)
+
+
+def test_deferred_import_keeps_attachment_refs_maintained(db_path):
+    manager = db.get_manager(db_path)
+    seen = []
+
+    def rows():
+        yield 1, {"title": "first"}
+        with manager.read() as conn:
+            seen.extend(row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'attachment_refs%'"))
+        yield 2, {"title": "second"}
+
+    task_cli.import_tasks(manager, rows(), batch_size=1, defer_indexes=True)
+    assert sorted(seen) == sorted(schema.KEPT_DURING_BULK_LOAD)
+
+
+def test_export_round_trips_and_leaves_no_temp_files(db_path, tmp_path):
+    manager = db.get_manager(db_path)
+    task_cli.import_tasks(manager, records({"external_id": "a", "title": "one"}, {"title": "two"}))
+    out = tmp_path / "out" / "backup.ndjson"
+    out.parent.mkdir()
+    args = task_cli.build_parser().parse_args(["--db", db_path, "export", str(out)])
+    assert args.func(args) == 0
+    exported = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [row["title"] for row in exported] == ["one", "two"]
+    assert [p.name for p in out.parent.iterdir()] == ["backup.ndjson"]
+
+
+def test_failed_export_removes_its_temp_file(db_path, tmp_path, monkeypatch):
+    task_cli.import_tasks(db.get_manager(db_path), records({"title": "one"}))
+
+    def broken(rows, stream, fmt):
+        stream.write("partial")
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(task_cli, "write_records", broken)
+    args = task_cli.build_parser().parse_args(["--db", db_path, "export", str(tmp_path / "backup.csv")])
+    with pytest.raises(RuntimeError):
+        args.func(args)
+    assert list(tmp_path.glob("*.tmp")) == [] and not (tmp_path / "backup.csv").exists()
+
+
+def test_imported_outcomes_are_recorded_once_as_events(db_path):
+    manager = db.get_manager(db_path)
+    row = {"external_id": "a", "title": "t", "status": "Completed",
+           "verification_status": "Verified - Approved", "verification_comments": "ok",
+           "verified_at": "2025-05-01 09:00:00"}
+    task_cli.import_tasks(manager, records(row))
+    task_cli.import_tasks(manager, records(row), upsert=True)
+    # A later outcome is appended; an import can't rewrite the columns directly
+    task_cli.import_tasks(manager, records(dict(row, verification_status="Verified - Rejected",
+                                                verified_at="2025-06-01 09:00:00")), upsert=True)
+    task_cli.import_tasks(manager, records(dict(row, verification_status="Not Verified")), upsert=True)
+    with manager.read() as conn:
+        events = conn.execute("SELECT ts, status FROM verification_events ORDER BY id").fetchall()
+        task = conn.execute("SELECT verification_status, verified_at FROM tasks").fetchone()
+    assert events == [("2025-05-01 09:00:00", "Verified - Approved"), ("2025-06-01 09:00:00", "Verified - Rejected")]
+    assert task == events[-1][::-1]
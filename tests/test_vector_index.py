@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+import db
+import vector_index
+from model_registry import SENTENCE_MODEL
+
+DIM = 8
+
+
+def unit(seed):
+    vector = np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def save_vectors(manager, vectors):
+    with manager.write() as conn:
+        for task_id, vector in vectors.items():
+            conn.execute("INSERT OR IGNORE INTO tasks (id, title) VALUES (?, ?)", (task_id, f"Task {task_id}"))
+            conn.execute("""
+                INSERT OR REPLACE INTO task_embeddings (task_id, model, content_hash, dim, vector)
+                VALUES (?, ?, '', ?, ?)
+            """, (task_id, SENTENCE_MODEL, DIM, vector.tobytes()))
+
+
+@pytest.fixture
+def index(db_path):
+    return vector_index.SemanticIndex(db_path, mode="exact")
+
+
+def test_search_matches_brute_force_after_incremental_updates(db_path, index):
+    manager = db.get_manager(db_path)
+    vectors = {task_id: unit(task_id) for task_id in range(1, 101)}
+    save_vectors(manager, vectors)
+    index.search(unit(0), 5)
+    # Edit some tasks and add new ones; these are served from the delta
+    changes = {task_id: unit(1000 + task_id) for task_id in [*range(1, 11), *range(101, 106)]}
+    save_vectors(manager, changes)
+    vectors.update(changes)
+
+    query = unit(7)
+    expected = sorted(vectors, key=lambda task_id: -float(vectors[task_id] @ query))[:5]
+    assert [task_id for task_id, _ in index.search(query, 5)] == expected
+    assert index.loads == 1
+
+
+def test_stats_count_each_vector_once(db_path, index):
+    manager = db.get_manager(db_path)
+    save_vectors(manager, {task_id: unit(task_id) for task_id in range(1, 31)})
+    index.search(unit(0), 1)
+    save_vectors(manager, {task_id: unit(100 + task_id) for task_id in range(1, 6)})
+    index.search(unit(0), 1)
+    assert index.stats()["delta"] == 5
+    assert index.stats()["vectors"] == 30
+
+
+def test_change_log_is_trimmed_to_the_synced_seq(db_path, index):
+    manager = db.get_manager(db_path)
+    save_vectors(manager, {task_id: unit(task_id) for task_id in range(1, 31)})
+    index.search(unit(0), 1)
+    save_vectors(manager, {31: unit(31)})
+    vector_index.CHANGES.trim(manager, index._seq, max_rows=10)
+    with manager.read() as conn:
+        # Only the change the index hasn't applied yet is kept
+        assert conn.execute("SELECT task_id FROM task_embedding_changes").fetchall() == [(31,)]
+    # A reader that missed the trimmed rows reloads instead of applying a partial delta
+    other = vector_index.SemanticIndex(db_path, mode="exact")
+    assert other.stats()["vectors"] == 0
+    other.search(unit(0), 1)
+    assert other.stats()["vectors"] == 31
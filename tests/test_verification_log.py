@@ -0,0 +1,106 @@
+import sqlite3
+
+import pytest
+
+import db
+import queries
+import schema
+import verification_log
+
+
+def add_task(conn, title="Task", status="Completed"):
+    return conn.execute("INSERT INTO tasks (title, status) VALUES (?, ?)", (title, status)).lastrowid
+
+
+def test_can_verify_only_completed_and_not_approved():
+    assert verification_log.can_verify({"status": "Completed", "verification_status": "Not Verified"})
+    assert verification_log.can_verify({"status": "Completed", "verification_status": "Verified - Rejected"})
+    assert not verification_log.can_verify({"status": "Pending", "verification_status": "Not Verified"})
+    assert not verification_log.can_verify({"status": "Completed", "verification_status": "Verified - Approved"})
+
+
+def test_compact_folds_runs_of_the_same_outcome():
+    events = [
+        {"ts": "1", "status": "Verified - Rejected", "comments": "no", "evidence_path": None},
+        {"ts": "2", "status": "Verified - Rejected", "comments": "", "evidence_path": "a.png"},
+        {"ts": "3", "status": "Verified - Approved", "comments": "ok", "evidence_path": None},
+    ]
+    history = verification_log.compact(events)
+    assert [(e["status"], e["first_at"], e["last_at"], e["events"]) for e in history] == [
+        ("Verified - Rejected", "1", "2", 2), ("Verified - Approved", "3", "3", 1),
+    ]
+    # The latest non-empty comment and evidence of a run win
+    assert history[0]["comments"] == "no" and history[0]["evidence_path"] == "a.png"
+
+
+def test_record_updates_task_columns_and_log_is_append_only(db_path):
+    with db.get_manager(db_path).write() as conn:
+        task_id = add_task(conn)
+        verification_log.record(conn, task_id, "Verified - Needs Revision", "fix it", "e.png")
+        verification_log.record(conn, task_id, "Verified - Approved", "good")
+        row = conn.execute("SELECT verification_status, verification_comments, verification_evidence_path "
+                           "FROM tasks WHERE id = ?", (task_id,)).fetchone()
+    # The task's columns are the latest event, evidence included
+    assert row == ("Verified - Approved", "good", None)
+
+    with db.get_manager(db_path).write() as conn:
+        with pytest.raises(sqlite3.DatabaseError):
+            conn.execute("UPDATE verification_events SET status = 'x'")
+
+
+def test_group_timelines_matches_per_task_timeline(db_path):
+    manager = db.get_manager(db_path)
+    with manager.write() as conn:
+        ids = [add_task(conn, f"Task {i}") for i in range(3)]
+        for task_id in ids[:2]:
+            verification_log.record(conn, task_id, "Verified - Rejected", "no")
+            verification_log.record(conn, task_id, "Verified - Approved", "yes")
+    with manager.read() as conn:
+        cursor = conn.execute(*queries.verification_timelines_query(ids))
+        columns = [d[0] for d in cursor.description]
+        grouped = verification_log.group_timelines(dict(zip(columns, row)) for row in cursor)
+        assert set(grouped) == set(ids[:2])
+        for task_id in ids[:2]:
+            assert grouped[task_id] == verification_log.timeline(conn, task_id)
+
+
+def test_record_many_skips_tasks_that_cannot_be_verified(db_path):
+    manager = db.get_manager(db_path)
+    with manager.write() as conn:
+        completed = add_task(conn, "done")
+        pending = add_task(conn, "open", status="Pending")
+        approved = add_task(conn, "approved")
+        verification_log.record(conn, approved, "Verified - Approved", "fine")
+        recorded = verification_log.record_many(
+            conn, [completed, pending, approved, 9999], "Verified - Rejected", "bulk")
+        statuses = dict(conn.execute("SELECT id, verification_status FROM tasks"))
+    assert recorded == 1
+    assert statuses[completed] == "Verified - Rejected"
+    assert statuses[pending] not in verification_log.OUTCOMES
+    assert statuses[approved] == "Verified - Approved"
+
+
+def test_deleting_a_task_keeps_its_history_but_releases_evidence(db_path):
+    manager = db.get_manager(db_path)
+    with manager.write() as conn:
+        task_id = add_task(conn)
+        kept = add_task(conn, "shares evidence")
+        verification_log.record(conn, task_id, "Verified - Rejected", "no", "old.png")
+        verification_log.record(conn, task_id, "Verified - Approved", "yes", "new.png")
+        verification_log.record(conn, kept, "Verified - Approved", "yes", "new.png")
+        assert sorted(verification_log.evidence_paths(conn, [task_id])) == ["new.png", "old.png"]
+        conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        assert conn.execute("SELECT COUNT(*) FROM verification_events").fetchone()[0] == 3
+        refs = conn.execute("SELECT path, refcount FROM attachment_refs ORDER BY path").fetchall()
+        schema.rebuild_attachment_refs(conn)
+        assert conn.execute("SELECT path, refcount FROM attachment_refs ORDER BY path").fetchall() == refs
+    # new.png is still the evidence of the other task (its event and its column)
+    assert refs == [("new.png", 2)]
+    assert [row[1] for row in verification_log.export_events(manager)] == [task_id, task_id, kept]
+
+
+def test_events_cannot_be_deleted(db_path):
+    with db.get_manager(db_path).write() as conn:
+        verification_log.record(conn, add_task(conn), "Verified - Approved", "ok")
+        with pytest.raises(sqlite3.DatabaseError, match="append-only"):
+            conn.execute("DELETE FROM verification_events")